@@ -1 +1,3 @@
 from .test_csv_loader import *
+from .test_backtesting import *
+from .test_cta_engine import *
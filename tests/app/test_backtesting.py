@@ -0,0 +1,918 @@
+"""
+Test if cta strategy backtesting works fine
+"""
+import multiprocessing
+import tempfile
+import unittest
+from ast import literal_eval
+from pathlib import Path
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from vnpy.app.cta_strategy import backtesting
+from vnpy.app.cta_strategy.backtesting import (
+    BacktestingEngine,
+    OptimizationSetting,
+    calculate_batch_statistics,
+    init_shared_history,
+    optimize
+)
+from vnpy.app.cta_strategy.performance import calculate_daily_pnl, calculate_statistics
+from vnpy.app.cta_strategy.base import BacktestingMode, StopOrderStatus
+from vnpy.app.cta_strategy.history import HistoryStream, SharedHistory
+from vnpy.app.cta_strategy.result_store import OptimizationResultStore
+from vnpy.app.cta_strategy.strategies.double_ma_strategy import DoubleMaStrategy
+from vnpy.app.cta_strategy.template import CtaTemplate
+from vnpy.trader.constant import Direction, Exchange, Interval, Status
+from vnpy.trader.object import BarData, OrderData, TickData, TradeData
+
+
+def generate_bars(
+    count: int,
+    start: datetime = datetime(2019, 1, 1, 9),
+    step: timedelta = timedelta(minutes=1)
+):
+    np.random.seed(0)
+    prices = 1000 + np.random.randn(count).cumsum() * 5
+
+    bars = []
+    for i, price in enumerate(prices):
+        bar = BarData(
+            gateway_name="DB",
+            symbol="rb1910",
+            exchange=Exchange.SHFE,
+            datetime=start + step * i,
+            interval=Interval.MINUTE,
+            open_price=price,
+            high_price=price + 2,
+            low_price=price - 2,
+            close_price=price + 1,
+            volume=i,
+            open_interest=i * 2,
+        )
+        bars.append(bar)
+    return bars
+
+
+class MemoryBacktestingEngine(BacktestingEngine):
+    """
+    Backtesting engine with history data given in memory.
+    """
+
+    def __init__(self, bars):
+        super().__init__()
+        self.bars = bars
+        self.output = lambda msg: None
+
+        self.set_parameters(
+            vt_symbol="rb1910.SHFE",
+            interval="1m",
+            start=bars[0].datetime,
+            end=bars[-1].datetime,
+            rate=0.0001,
+            slippage=1,
+            size=10,
+            pricetick=1,
+            capital=1_000_000,
+        )
+        self.add_strategy(DoubleMaStrategy, {})
+
+    def load_data(self, stream=False, prefetch=2, end=None):
+        end = end or self.get_end()
+        self.history_data = [
+            bar for bar in self.bars if self.start <= bar.datetime <= end
+        ]
+
+
+class GridStrategy(CtaTemplate):
+    """
+    Strategy keeping lots of resting limit and stop orders.
+    """
+
+    grid_count = 20
+    parameters = ["grid_count"]
+
+    def __init__(self, cta_engine, strategy_name, vt_symbol, setting):
+        super().__init__(cta_engine, strategy_name, vt_symbol, setting)
+        self.bar_count = 0
+        self.records = []
+
+    def on_init(self):
+        self.load_bar(1)
+
+    def on_bar(self, bar: BarData):
+        if not self.trading:
+            return
+
+        self.bar_count += 1
+        if not self.bar_count % 50:
+            self.cancel_all()
+
+        for i in range(1, 3):
+            self.buy(bar.close_price - i * 2, 1)
+            self.short(bar.close_price + i * 2, 1)
+
+        if not self.bar_count % 3:
+            self.buy(bar.close_price + 3, 1, stop=True)
+            self.short(bar.close_price - 3, 1, stop=True)
+
+    def on_order(self, order: OrderData):
+        self.records.append(("order", order.vt_orderid, order.status))
+
+    def on_trade(self, trade: TradeData):
+        self.records.append(("trade", trade.vt_orderid, trade.price))
+
+        # Cancel some resting orders within callback
+        if not self.bar_count % 7:
+            self.cancel_order(f"BACKTESTING.{int(trade.orderid) + 1}")
+
+    def on_stop_order(self, stop_order):
+        self.records.append(("stop", stop_order.stop_orderid, stop_order.status))
+
+
+class ScanBacktestingEngine(MemoryBacktestingEngine):
+    """
+    Reference implementation which scans all active orders on every bar.
+    """
+
+    def cross_limit_order(self):
+        for order in list(self.active_limit_orders.values()):
+            if order.vt_orderid not in self.active_limit_orders:
+                continue
+
+            if order.status == Status.SUBMITTING:
+                order.status = Status.NOTTRADED
+                self.strategy.on_order(order)
+
+            long_cross = (
+                order.direction == Direction.LONG
+                and order.price >= self.bar.low_price
+            )
+            short_cross = (
+                order.direction == Direction.SHORT
+                and order.price <= self.bar.high_price
+            )
+            if not long_cross and not short_cross:
+                continue
+
+            order.traded = order.volume
+            order.status = Status.ALLTRADED
+            self.strategy.on_order(order)
+            self.active_limit_orders.pop(order.vt_orderid)
+
+            self.trade_count += 1
+            if long_cross:
+                trade_price = min(order.price, self.bar.open_price)
+                pos_change = order.volume
+            else:
+                trade_price = max(order.price, self.bar.open_price)
+                pos_change = -order.volume
+
+            trade = TradeData(
+                symbol=order.symbol,
+                exchange=order.exchange,
+                orderid=order.orderid,
+                tradeid=str(self.trade_count),
+                direction=order.direction,
+                offset=order.offset,
+                price=trade_price,
+                volume=order.volume,
+                gateway_name=self.gateway_name,
+            )
+            trade.datetime = self.datetime
+
+            self.strategy.pos += pos_change
+            self.strategy.on_trade(trade)
+            self.trades[trade.vt_tradeid] = trade
+
+    def cross_stop_order(self):
+        for stop_order in list(self.active_stop_orders.values()):
+            if stop_order.stop_orderid not in self.active_stop_orders:
+                continue
+
+            long_cross = (
+                stop_order.direction == Direction.LONG
+                and stop_order.price <= self.bar.high_price
+            )
+            short_cross = (
+                stop_order.direction == Direction.SHORT
+                and stop_order.price >= self.bar.low_price
+            )
+            if not long_cross and not short_cross:
+                continue
+
+            self.limit_order_count += 1
+            order = OrderData(
+                symbol=self.symbol,
+                exchange=self.exchange,
+                orderid=str(self.limit_order_count),
+                direction=stop_order.direction,
+                offset=stop_order.offset,
+                price=stop_order.price,
+                volume=stop_order.volume,
+                status=Status.ALLTRADED,
+                gateway_name=self.gateway_name,
+            )
+            order.datetime = self.datetime
+            self.limit_orders[order.vt_orderid] = order
+
+            self.trade_count += 1
+            if long_cross:
+                trade_price = max(stop_order.price, self.bar.open_price)
+                pos_change = order.volume
+            else:
+                trade_price = min(stop_order.price, self.bar.open_price)
+                pos_change = -order.volume
+
+            trade = TradeData(
+                symbol=order.symbol,
+                exchange=order.exchange,
+                orderid=order.orderid,
+                tradeid=str(self.trade_count),
+                direction=order.direction,
+                offset=order.offset,
+                price=trade_price,
+                volume=order.volume,
+                gateway_name=self.gateway_name,
+            )
+            trade.datetime = self.datetime
+            self.trades[trade.vt_tradeid] = trade
+
+            stop_order.vt_orderid = order.vt_orderid
+            stop_order.status = StopOrderStatus.TRIGGERED
+            self.active_stop_orders.pop(stop_order.stop_orderid)
+
+            self.strategy.on_stop_order(stop_order)
+            self.strategy.on_order(order)
+
+            self.strategy.pos += pos_change
+            self.strategy.on_trade(trade)
+
+
+def sum_close_price(_):
+    history = backtesting.shared_history
+    return sum(bar.close_price for bar in history.get_view())
+
+
+class TestSharedHistory(unittest.TestCase):
+
+    def create_history(self, bars):
+        return SharedHistory(
+            BacktestingMode.BAR,
+            "rb1910",
+            Exchange.SHFE,
+            Interval.MINUTE,
+            bars[0].datetime,
+            bars[-1].datetime,
+            bars
+        )
+
+    def test_bar(self):
+        bars = generate_bars(25000)
+        view = self.create_history(bars).get_view()
+
+        self.assertEqual(len(view), len(bars))
+        self.assertEqual(list(view), bars)
+        self.assertEqual(view[-1], bars[-1])
+        self.assertEqual(list(view[100:200]), bars[100:200])
+        self.assertEqual(list(view[100:][10:20]), bars[110:120])
+
+    def test_tick(self):
+        start = datetime(2019, 1, 1, 9)
+        ticks = [
+            TickData(
+                gateway_name="DB",
+                symbol="rb1910",
+                exchange=Exchange.SHFE,
+                datetime=start + timedelta(seconds=i),
+                name="螺纹钢1910",
+                last_price=3000 + i,
+                bid_price_1=2999 + i,
+                ask_price_1=3001 + i,
+            )
+            for i in range(100)
+        ]
+        history = SharedHistory(
+            BacktestingMode.TICK,
+            "rb1910",
+            Exchange.SHFE,
+            None,
+            start,
+            start + timedelta(minutes=2),
+            ticks
+        )
+
+        self.assertEqual(list(history.get_view()), ticks)
+
+    def test_load_data(self):
+        bars = generate_bars(1000)
+        history = self.create_history(bars)
+
+        engine = BacktestingEngine()
+        engine.output = lambda msg: None
+        engine.set_parameters(
+            vt_symbol="rb1910.SHFE",
+            interval="1m",
+            start=bars[0].datetime,
+            end=bars[-1].datetime,
+            rate=0,
+            slippage=0,
+            size=10,
+            pricetick=1,
+        )
+
+        init_shared_history(history)
+        try:
+            engine.load_data()
+        finally:
+            init_shared_history(None)
+
+        self.assertEqual(list(engine.history_data), bars)
+
+    def test_pool(self):
+        bars = generate_bars(1000)
+        history = self.create_history(bars)
+
+        pool = multiprocessing.Pool(
+            2,
+            initializer=init_shared_history,
+            initargs=(history,)
+        )
+        results = pool.map(sum_close_price, range(4))
+        pool.close()
+        pool.join()
+
+        expected = sum(bar.close_price for bar in bars)
+        for result in results:
+            self.assertAlmostEqual(result, expected)
+
+
+class StreamBacktestingEngine(MemoryBacktestingEngine):
+    """
+    Backtesting engine loading history data chunks from memory.
+    """
+
+    def __init__(self, bars):
+        super().__init__(bars)
+        self.loaded_ranges = []
+
+    def load_data(self, stream: bool = False, prefetch: int = 2, end=None):
+        BacktestingEngine.load_data(self, stream, prefetch, end)
+
+    def load_chunk(self, start, end, cache=True):
+        self.loaded_ranges.append((start, end))
+        return [bar for bar in self.bars if start <= bar.datetime < end]
+
+
+class TestHistoryStream(unittest.TestCase):
+
+    def test_iter(self):
+        bars = generate_bars(1000)
+        ranges = [(i, i + 100, (i + 100) / 1000) for i in range(0, 1000, 100)]
+        messages = []
+
+        stream = HistoryStream(ranges, lambda start, end: bars[start:end], messages.append)
+        self.assertEqual(list(stream), bars)
+        self.assertEqual(stream.count, len(bars))
+        self.assertEqual(len(messages), 11)
+
+        # Iterate again after stopped early
+        self.assertEqual(next(iter(stream)), bars[0])
+        self.assertEqual(list(stream), bars)
+
+    def test_error(self):
+        def load_func(start, end):
+            if start:
+                raise ValueError("load failed")
+            return [start]
+
+        stream = HistoryStream([(0, 1, 0.5), (1, 2, 1)], load_func, lambda msg: None)
+        with self.assertRaises(ValueError):
+            list(stream)
+
+    def test_run_backtesting(self):
+        bars = generate_bars(3 * 24 * 100, step=timedelta(minutes=20))
+
+        engine = StreamBacktestingEngine(bars)
+        engine.load_data()
+        engine.run_backtesting()
+
+        stream_engine = StreamBacktestingEngine(bars)
+        stream_engine.load_data(stream=True)
+        self.assertIsInstance(stream_engine.history_data, HistoryStream)
+        self.assertFalse(stream_engine.loaded_ranges)
+
+        stream_engine.run_backtesting()
+
+        self.assertGreater(len(stream_engine.loaded_ranges), 3)
+        self.assertTrue(stream_engine.trades)
+        self.assertEqual(stream_engine.loaded_ranges, engine.loaded_ranges)
+        self.assertEqual(
+            [(t.datetime, t.price) for t in stream_engine.trades.values()],
+            [(t.datetime, t.price) for t in engine.trades.values()]
+        )
+        self.assertEqual(stream_engine.strategy.pos, engine.strategy.pos)
+
+
+class TestOrderMatching(unittest.TestCase):
+
+    def run_engine(self, engine_class):
+        bars = generate_bars(1000, step=timedelta(minutes=10))
+        engine = engine_class(bars)
+        engine.add_strategy(GridStrategy, {})
+        engine.load_data()
+        engine.run_backtesting()
+        return engine
+
+    def test_cross_order(self):
+        engine = self.run_engine(MemoryBacktestingEngine)
+        reference = self.run_engine(ScanBacktestingEngine)
+
+        self.assertGreater(len(engine.trades), 100)
+        self.assertEqual(engine.strategy.records, reference.strategy.records)
+        self.assertEqual(
+            [(t.vt_tradeid, t.vt_orderid, t.price) for t in engine.trades.values()],
+            [(t.vt_tradeid, t.vt_orderid, t.price) for t in reference.trades.values()]
+        )
+        self.assertEqual(engine.strategy.pos, reference.strategy.pos)
+
+        # Index only keeps active orders
+        self.assertEqual(
+            sum(len(index) for index in engine.limit_indexes.values()),
+            len(engine.active_limit_orders)
+        )
+        self.assertEqual(
+            sum(len(index) for index in engine.stop_indexes.values()),
+            len(engine.active_stop_orders)
+        )
+
+
+class TestPerformance(unittest.TestCase):
+
+    def test_calculate_daily_pnl(self):
+        arrays = calculate_daily_pnl(
+            close_prices=np.array([100.0, 110, 105, 120]),
+            trade_days=np.array([0, 1, 1, 3]),
+            trade_prices=np.array([100.0, 108, 111, 119]),
+            trade_volumes=np.array([2.0, -1, 3, -4]),
+            size=10,
+            rate=0.001,
+            slippage=1,
+        )
+
+        np.testing.assert_array_equal(arrays["start_pos"], [0, 2, 4, 4])
+        np.testing.assert_array_equal(arrays["end_pos"], [2, 4, 4, 0])
+        np.testing.assert_array_equal(arrays["trade_count"], [1, 2, 0, 1])
+        np.testing.assert_allclose(arrays["holding_pnl"], [0, 2 * 10 * 10, 4 * -5 * 10, 4 * 15 * 10])
+        np.testing.assert_allclose(arrays["trading_pnl"], [0, -1 * 2 * 10 + 3 * -1 * 10, 0, -4 * 1 * 10])
+        np.testing.assert_allclose(arrays["turnover"], [2000, 1080 + 3330, 0, 4760])
+        np.testing.assert_allclose(arrays["slippage"], [20, 40, 0, 40])
+        np.testing.assert_allclose(
+            arrays["net_pnl"],
+            arrays["total_pnl"] - arrays["turnover"] * 0.001 - arrays["slippage"]
+        )
+
+    def test_calculate_statistics_batch(self):
+        np.random.seed(1)
+        net_pnl = np.random.randn(50, 200) * 1000
+        commission = np.random.rand(50, 200)
+        trade_count = np.random.randint(0, 5, (50, 200))
+
+        batch = calculate_statistics(
+            net_pnl, commission, commission, commission, trade_count, 100_000
+        )
+
+        for ix in range(len(net_pnl)):
+            result = calculate_statistics(
+                net_pnl[ix], commission[ix], commission[ix], commission[ix], trade_count[ix], 100_000
+            )
+            for key, value in result.items():
+                expected = value if key == "total_days" else batch[key][ix]
+                np.testing.assert_allclose(value, expected, err_msg=key)
+
+
+class TestOptimization(unittest.TestCase):
+
+    def setUp(self):
+        self.bars = generate_bars(6000, step=timedelta(minutes=10))
+        self.engine = MemoryBacktestingEngine(self.bars)
+
+        self.optimization_setting = OptimizationSetting()
+        self.optimization_setting.add_parameter("fast_window", 5, 15, 5)
+        self.optimization_setting.add_parameter("slow_window", 20, 40, 10)
+        self.optimization_setting.set_target("total_net_pnl")
+
+    def run_serial(self, setting: dict):
+        engine = MemoryBacktestingEngine(self.bars)
+        engine.add_strategy(DoubleMaStrategy, setting)
+        engine.load_data()
+        engine.run_backtesting()
+        engine.calculate_result()
+        statistics = engine.calculate_statistics(output=False)
+        return statistics["total_net_pnl"]
+
+    def test_optimize_shared_history(self):
+        self.engine.load_data()
+        init_shared_history(self.engine.create_shared_history())
+
+        try:
+            setting = {"fast_window": 5, "slow_window": 20}
+            result = optimize(
+                "total_net_pnl",
+                DoubleMaStrategy,
+                setting,
+                self.engine.vt_symbol,
+                self.engine.interval,
+                self.engine.start,
+                self.engine.rate,
+                self.engine.slippage,
+                self.engine.size,
+                self.engine.pricetick,
+                self.engine.capital,
+                self.engine.end,
+                self.engine.mode,
+            )
+        finally:
+            init_shared_history(None)
+
+        self.assertNotEqual(result[1], 0)
+        self.assertAlmostEqual(result[1], self.run_serial(setting))
+
+    def test_run_batch_backtesting(self):
+        settings = self.optimization_setting.generate_setting()
+
+        self.engine.load_data()
+        engines = self.engine.run_batch_backtesting(settings)
+
+        for setting, engine in zip(settings, engines):
+            self.assertEqual(engine.strategy.fast_window, setting["fast_window"])
+
+            engine.calculate_result()
+            statistics = engine.calculate_statistics(output=False)
+            self.assertAlmostEqual(statistics["total_net_pnl"], self.run_serial(setting))
+
+    def test_calculate_batch_statistics(self):
+        settings = self.optimization_setting.generate_setting()
+
+        self.engine.load_data()
+        engines = self.engine.run_batch_backtesting(settings)
+        batch_statistics = calculate_batch_statistics(engines)
+
+        for engine, statistics in zip(engines, batch_statistics):
+            expected = engine.calculate_statistics(output=False)
+            self.assertEqual(statistics.keys(), expected.keys())
+
+            for key, value in expected.items():
+                self.assertNotIsInstance(value, (np.ndarray, np.generic), msg=key)
+                self.assertIs(type(statistics[key]), type(value), msg=key)
+
+                if isinstance(value, float):
+                    self.assertAlmostEqual(statistics[key], value, msg=key)
+                else:
+                    self.assertEqual(statistics[key], value, msg=key)
+
+    def test_run_optimization(self):
+        results = self.engine.run_optimization(
+            self.optimization_setting,
+            output=False,
+            batch_size=2
+        )
+
+        self.assertEqual(len(results), 9)
+        for setting, target_value, _ in results:
+            self.assertAlmostEqual(target_value, self.run_serial(literal_eval(setting)))
+
+    def test_optimization_callback(self):
+        progress = []
+
+        def callback(results, finished, total):
+            progress.append((len(results), finished, total))
+
+        self.engine.max_tasks = 1
+        self.engine.optimization_callback = callback
+        results = self.engine.run_optimization(
+            self.optimization_setting,
+            output=False,
+            batch_size=2
+        )
+
+        self.assertEqual(len(results), 9)
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1][1:], (9, 9))
+        self.assertEqual(sum(p[0] for p in progress), 9)
+
+    def test_stop_optimization(self):
+        def callback(results, finished, total):
+            self.engine.stop_optimization()
+
+        self.engine.max_tasks = 1
+        self.engine.optimization_callback = callback
+        results = self.engine.run_optimization(
+            self.optimization_setting,
+            output=False,
+            batch_size=2
+        )
+
+        # Only the first batch is finished before stopped
+        self.assertTrue(self.engine.optimization_cancelled)
+        self.assertTrue(0 < len(results) < 9)
+
+    def stop_after_loading(self):
+        load_data = self.engine.load_data
+
+        def stop_load_data(*args, **kwargs):
+            load_data(*args, **kwargs)
+            self.engine.stop_optimization()
+
+        self.engine.load_data = stop_load_data
+
+    def test_stop_during_loading(self):
+        self.stop_after_loading()
+        results = self.engine.run_optimization(self.optimization_setting, output=False)
+
+        self.assertTrue(self.engine.optimization_cancelled)
+        self.assertEqual(results, [])
+
+        # Flag is reset when next optimization starts
+        del self.engine.load_data
+        results = self.engine.run_optimization(self.optimization_setting, output=False)
+        self.assertFalse(self.engine.optimization_cancelled)
+        self.assertEqual(len(results), 9)
+
+    def test_stop_halving_optimization(self):
+        messages = []
+
+        def callback(results, finished, total):
+            self.engine.stop_optimization()
+
+        self.engine.output = messages.append
+        self.engine.max_tasks = 1
+        self.engine.optimization_callback = callback
+        end = self.engine.end
+        results = self.engine.run_halving_optimization(
+            self.optimization_setting,
+            eta=3,
+            output=False,
+            batch_size=2
+        )
+
+        # Next round is not started after stopped
+        rounds = [msg for msg in messages if msg.startswith("第")]
+        self.assertEqual(len(rounds), 1)
+        self.assertTrue(0 < len(results) < 9)
+        self.assertEqual(self.engine.end, end)
+
+    def test_stop_walk_forward(self):
+        self.stop_after_loading()
+        window_results = self.engine.run_walk_forward(
+            self.optimization_setting, 15, 7, output=False, batch_size=2
+        )
+        self.assertEqual(window_results, [])
+
+    def test_stop_ga_optimization(self):
+        self.stop_after_loading()
+        results = self.engine.run_ga_optimization(
+            self.optimization_setting,
+            population_size=8,
+            ngen_size=2
+        )
+        self.assertTrue(self.engine.optimization_cancelled)
+        self.assertEqual(results, [])
+
+    def test_run_halving_optimization(self):
+        end = self.engine.end
+        results = self.engine.run_halving_optimization(
+            self.optimization_setting,
+            eta=3,
+            output=False
+        )
+
+        self.assertEqual(self.engine.end, end)
+        self.assertEqual(len(results), 3)
+        for setting, target_value, _ in results:
+            self.assertAlmostEqual(target_value, self.run_serial(literal_eval(setting)))
+
+    def test_get_walk_forward_windows(self):
+        self.engine.start = datetime(2019, 1, 1, 9)
+        self.engine.end = datetime(2019, 2, 1, 15)
+
+        windows = self.engine.get_walk_forward_windows(10, 7)
+        self.assertEqual(len(windows), 4)
+        self.assertEqual(windows[0], (
+            datetime(2019, 1, 1, 9),
+            datetime(2019, 1, 11),
+            datetime(2019, 1, 11),
+            datetime(2019, 1, 18),
+        ))
+        self.assertEqual(windows[1][0], datetime(2019, 1, 8))
+        self.assertEqual(windows[-1][3], self.engine.end)
+
+        windows = self.engine.get_walk_forward_windows(10, 7, anchored=True)
+        for in_start, in_end, out_start, out_end in windows:
+            self.assertEqual(in_start, self.engine.start)
+            self.assertEqual(in_end, out_start)
+
+    def test_run_walk_forward(self):
+        window_results = self.engine.run_walk_forward(
+            self.optimization_setting, 15, 7, output=False, batch_size=2
+        )
+        self.assertEqual(len(window_results), 4)
+
+        # In-sample value is the best of settings run in in-sample period
+        result = window_results[1]
+        values = []
+        for setting in self.optimization_setting.generate_setting():
+            engine = MemoryBacktestingEngine(self.bars)
+            engine.start = result["in_sample_start"]
+            engine.end = result["in_sample_end"]
+            engine.add_strategy(DoubleMaStrategy, setting)
+            engine.load_data()
+            engine.run_backtesting()
+            engine.calculate_result()
+            values.append(engine.calculate_statistics(output=False)["total_net_pnl"])
+        self.assertAlmostEqual(result["in_sample_value"], max(values))
+
+        # Out-of-sample daily results are stitched without overlap
+        df = self.engine.daily_df
+        self.assertTrue(df.index.is_unique)
+        self.assertEqual(df.index[0], result["in_sample_start"].date() + timedelta(days=15 - 7))
+
+        out_start = window_results[0]["out_sample_start"]
+        trades = [trade for trades in df["trades"] for trade in trades]
+        self.assertTrue(trades)
+        self.assertTrue(all(trade.datetime >= out_start for trade in trades))
+
+        total_net_pnl = sum(
+            result["statistics"]["total_net_pnl"] for result in window_results
+        )
+        statistics = self.engine.calculate_statistics(output=False)
+        self.assertAlmostEqual(statistics["total_net_pnl"], total_net_pnl)
+        self.assertEqual(statistics["end_date"], self.bars[-1].datetime.date())
+
+    def test_run_out_of_sample(self):
+        messages = []
+        self.engine.output = messages.append
+
+        history = self.engine.create_shared_history()
+        view = history.get_view()
+        timestamps = history.get_arrays()["datetime"]
+        setting = {"fast_window": 5, "slow_window": 20}
+
+        # Backtesting starts from start_ix even if less than 10 days before it
+        start_ix = history.get_index(datetime(2019, 1, 4), "left")
+        engine = self.engine.run_out_of_sample(setting, view, timestamps, start_ix, len(view))
+
+        self.assertEqual(engine.daily_df.index[0], date(2019, 1, 4))
+        self.assertTrue(any("初始化数据不足" in msg for msg in messages))
+
+        # Strategy is initialized with 10 days before start_ix if enough
+        messages.clear()
+        start_ix = history.get_index(datetime(2019, 1, 20), "left")
+        engine = self.engine.run_out_of_sample(setting, view, timestamps, start_ix, len(view))
+
+        self.assertEqual(engine.daily_df.index[0], date(2019, 1, 20))
+        self.assertFalse(any("初始化数据不足" in msg for msg in messages))
+
+    def test_run_ga_optimization(self):
+        results = self.engine.run_ga_optimization(
+            self.optimization_setting,
+            population_size=8,
+            ngen_size=2
+        )
+
+        self.assertTrue(results)
+        for setting, target_value, _ in results:
+            self.assertAlmostEqual(target_value, self.run_serial(setting))
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.store = OptimizationResultStore(
+            str(Path(self.folder.name).joinpath("result.db"))
+        )
+
+        self.engine = MemoryBacktestingEngine(generate_bars(6000, step=timedelta(minutes=10)))
+        self.engine.result_store = self.store
+
+        self.optimization_setting = OptimizationSetting()
+        self.optimization_setting.add_parameter("fast_window", 5, 15, 5)
+        self.optimization_setting.add_parameter("slow_window", 20, 30, 10)
+        self.optimization_setting.set_target("sharpe_ratio")
+
+    def tearDown(self):
+        self.store.db.close()
+        self.folder.cleanup()
+
+    def test_save_result(self):
+        task = self.engine.get_result_task()
+        self.assertEqual(task, self.engine.get_result_task())
+
+        statistics = {"sharpe_ratio": np.float64(1.5), "start_date": datetime(2019, 1, 1).date()}
+        self.store.save_result(task, {"a": 1, "b": 2}, statistics)
+        self.store.save_result(task, {"b": 3, "a": 1}, {"sharpe_ratio": 2})
+
+        self.assertEqual(self.store.get_result(task, {"b": 2, "a": 1})["sharpe_ratio"], 1.5)
+        self.assertEqual(len(self.store.load_results(task)), 2)
+        self.assertEqual(self.store.query_results(task, "sharpe_ratio", 1)[0][1], 2)
+        self.assertEqual(self.store.get_all_tasks()[0]["task"], task)
+
+        self.engine.slippage = 2
+        self.assertNotEqual(task, self.engine.get_result_task())
+
+    def test_save_statistics(self):
+        self.engine.load_data()
+        self.engine.add_strategy(DoubleMaStrategy, {})
+        self.engine.run_backtesting()
+        self.engine.calculate_result()
+        statistics = self.engine.calculate_statistics(output=False)
+        statistics["max_ddpercent"] = np.array(statistics["max_ddpercent"])
+
+        task = self.engine.get_result_task()
+        self.store.save_result(task, {}, statistics)
+        result = self.store.get_result(task, {})
+
+        for key, value in statistics.items():
+            if isinstance(value, date):
+                self.assertEqual(result[key], value.isoformat(), msg=key)
+            else:
+                self.assertIsInstance(result[key], (int, float), msg=key)
+                self.assertAlmostEqual(result[key], value, msg=key)
+
+        with self.assertRaises(TypeError):
+            self.store.save_result(task, {}, {"sharpe_ratio": object()})
+
+    def test_resume_optimization(self):
+        results = self.engine.run_optimization(self.optimization_setting, output=False)
+
+        task = self.engine.get_result_task()
+        self.assertEqual(len(self.store.load_results(task)), len(results))
+
+        # Settings evaluated are not run again
+        self.engine.run_optimization_pool = lambda *args: self.fail("backtesting rerun")
+        resumed_results = self.engine.run_optimization(self.optimization_setting, output=False)
+
+        self.assertEqual(
+            {r[0]: r[1] for r in results},
+            {r[0]: r[1] for r in resumed_results}
+        )
+
+    def test_resume_walk_forward(self):
+        totals = []
+        self.engine.max_tasks = 1
+        self.engine.optimization_callback = lambda results, finished, total: totals.append(total)
+        window_results = self.engine.run_walk_forward(
+            self.optimization_setting, 15, 7, output=False, batch_size=2
+        )
+        self.assertEqual(len(window_results), 4)
+        self.assertEqual(set(totals), {len(self.optimization_setting.generate_setting())})
+
+        # Results of each window are saved with window dates in task
+        tasks = self.store.get_all_tasks()
+        self.assertEqual(len(tasks), len(window_results))
+        self.assertEqual(
+            {task["end"] for task in tasks},
+            {str(result["in_sample_end"]) for result in window_results}
+        )
+
+        self.engine.run_optimization_pool = lambda *args: self.fail("backtesting rerun")
+        resumed_results = self.engine.run_walk_forward(
+            self.optimization_setting, 15, 7, output=False, batch_size=2
+        )
+        self.assertEqual(
+            [result["setting"] for result in window_results],
+            [result["setting"] for result in resumed_results]
+        )
+
+    def test_resume_without_end(self):
+        self.engine.end = None
+        results = self.engine.run_optimization(self.optimization_setting, output=False)
+        self.assertIsNone(self.engine.end)
+
+        # Task of the next run without end is the same
+        self.engine.run_optimization_pool = lambda *args: self.fail("backtesting rerun")
+        resumed_results = self.engine.run_optimization(self.optimization_setting, output=False)
+
+        self.assertEqual(
+            {r[0]: r[1] for r in results},
+            {r[0]: r[1] for r in resumed_results}
+        )
+
+    def test_resume_ga_optimization(self):
+        results = self.engine.run_optimization(self.optimization_setting, output=False)
+
+        ga_results = self.engine.run_ga_optimization(
+            self.optimization_setting,
+            population_size=4,
+            ngen_size=1
+        )
+
+        expected = {r[0]: r[1] for r in results}
+        for setting, target_value, _ in ga_results:
+            self.assertAlmostEqual(target_value, expected[str(setting)])
+
+
+if __name__ == "__main__":
+    unittest.main()
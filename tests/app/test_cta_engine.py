@@ -0,0 +1,665 @@
+"""
+Test if cta strategy engine works fine
+"""
+import json
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from vnpy.app.cta_strategy.backtesting import BacktestingEngine
+from vnpy.app.cta_strategy.base import BacktestingMode, StopOrderStatus
+from vnpy.app.cta_strategy.engine import CtaEngine
+from vnpy.app.cta_strategy.journal import DataJournal
+from vnpy.app.cta_strategy.template import CtaTemplate
+from vnpy.event import Event, EventEngine
+from vnpy.trader.constant import Direction, Exchange, Interval, Offset
+from vnpy.trader.engine import MainEngine
+from vnpy.trader.event import EVENT_TICK
+from vnpy.trader.object import BarData, TickData, TradeData
+from vnpy.trader.utility import BarGenerator
+
+
+class RecordStrategy(CtaTemplate):
+    """
+    Strategy recording stop order updates.
+    """
+
+    def __init__(self, cta_engine, strategy_name, vt_symbol, setting):
+        super().__init__(cta_engine, strategy_name, vt_symbol, setting)
+        self.stop_orders = []
+
+    def on_stop_order(self, stop_order):
+        self.stop_orders.append((stop_order.stop_orderid, stop_order.status))
+
+
+class SubscribeStrategy(CtaTemplate):
+    """
+    Strategy recording bars subscribed from engine.
+    """
+
+    def __init__(self, cta_engine, strategy_name, vt_symbol, setting):
+        super().__init__(cta_engine, strategy_name, vt_symbol, setting)
+        self.records = []
+
+        self.subscribe_bar(5, self.on_5min_bar)
+        self.subscribe_bar(1, self.on_hour_bar, Interval.HOUR)
+
+    def on_bar(self, bar):
+        self.records.append(("1m", bar.datetime, bar.close_price, bar.volume))
+
+    def on_5min_bar(self, bar):
+        self.records.append(("5m", bar.datetime, bar.close_price, bar.volume))
+
+    def on_hour_bar(self, bar):
+        self.records.append(("1h", bar.datetime, bar.close_price, bar.volume))
+
+
+class GeneratorStrategy(SubscribeStrategy):
+    """
+    Strategy generating the same bars with BarGenerator of its own.
+    """
+
+    def subscribe_bar(self, window=0, on_window_bar=None, interval=Interval.MINUTE):
+        if not hasattr(self, "bg"):
+            self.bg = BarGenerator(self.on_1min_bar)
+            self.window_generators = []
+
+        self.window_generators.append(BarGenerator(None, window, on_window_bar, interval))
+
+    def on_tick(self, tick):
+        self.bg.update_tick(tick)
+
+    def on_1min_bar(self, bar):
+        for generator in self.window_generators:
+            generator.update_bar(bar)
+        self.on_bar(bar)
+
+
+class InitStrategy(CtaTemplate):
+    """
+    Strategy loading history bars in on_init.
+    """
+
+    days = 10
+    parameters = ["days"]
+
+    def __init__(self, cta_engine, strategy_name, vt_symbol, setting):
+        super().__init__(cta_engine, strategy_name, vt_symbol, setting)
+        self.bars = []
+
+    def on_init(self):
+        if self.days < 0:
+            raise ValueError("days must be positive")
+
+        self.load_bar(self.days)
+
+    def on_bar(self, bar):
+        self.bars.append(bar)
+
+
+class ShardStrategy(CtaTemplate):
+    """
+    Strategy sending an order on first tick, running in shard process.
+    """
+
+    bar_count = 0
+    tick_count = 0
+    trade_pos = 0
+    variables = ["bar_count", "tick_count", "trade_pos"]
+
+    def on_init(self):
+        self.load_bar(10)
+
+    def on_bar(self, bar):
+        self.bar_count += 1
+
+    def on_tick(self, tick):
+        self.tick_count += 1
+        if self.tick_count == 1:
+            self.buy(tick.last_price, 1)
+
+    def on_trade(self, trade):
+        self.trade_pos = self.pos
+
+
+class HistoryCtaEngine(CtaEngine):
+    """
+    Cta engine loading history bars from memory.
+    """
+
+    def __init__(self, main_engine, event_engine):
+        super().__init__(main_engine, event_engine)
+        self.queries = []
+        self.active_queries = 0
+        self.max_active_queries = 0
+
+    def query_history_bars(self, vt_symbol, days, interval):
+        self.queries.append((vt_symbol, interval, days))
+
+        self.active_queries += 1
+        self.max_active_queries = max(self.max_active_queries, self.active_queries)
+        time.sleep(0.05)
+        self.active_queries -= 1
+
+        symbol, exchange = vt_symbol.split(".")
+        start = datetime(2019, 1, 1)
+        return [
+            BarData(
+                gateway_name="DB",
+                symbol=symbol,
+                exchange=Exchange(exchange),
+                datetime=start + timedelta(minutes=i),
+                interval=interval,
+                close_price=i,
+            )
+            for i in range(days)
+        ]
+
+
+class RecordCtaEngine(CtaEngine):
+    """
+    Cta engine recording orders sent instead of sending to gateway.
+    """
+
+    def __init__(self, main_engine, event_engine):
+        super().__init__(main_engine, event_engine)
+        self.sent_orders = []
+
+    def send_limit_order(self, strategy, contract, direction, offset, price, volume, lock):
+        vt_orderid = f"TEST.{len(self.sent_orders) + 1}"
+        self.sent_orders.append((strategy.strategy_name, direction, vt_orderid))
+        return [vt_orderid]
+
+
+class ShardCtaEngine(HistoryCtaEngine):
+    """
+    Cta engine recording orders sent from shard processes.
+    """
+
+    def __init__(self, main_engine, event_engine):
+        super().__init__(main_engine, event_engine)
+        self.sent_orders = []
+
+    def send_order(self, strategy, direction, offset, price, volume, stop, lock):
+        vt_orderid = f"TEST.{len(self.sent_orders) + 1}"
+        self.sent_orders.append((strategy.strategy_name, direction, price))
+        self.orderid_strategy_map[vt_orderid] = strategy
+        return [vt_orderid]
+
+
+def create_tick(vt_symbol: str, price: float):
+    symbol, exchange = vt_symbol.split(".")
+    return TickData(
+        gateway_name="TEST",
+        symbol=symbol,
+        exchange=Exchange(exchange),
+        datetime=datetime.now(),
+        last_price=price,
+        limit_up=price * 1.1,
+        limit_down=price * 0.9,
+    )
+
+
+def generate_ticks(count: int, vt_symbol: str = "rb1910.SHFE"):
+    np.random.seed(0)
+    prices = 3000 + np.random.randn(count).cumsum()
+    start = datetime(2019, 1, 1, 9)
+
+    ticks = []
+    for i, price in enumerate(prices):
+        tick = create_tick(vt_symbol, round(price))
+        tick.datetime = start + timedelta(seconds=i * 7)
+        tick.volume = i * 3
+        ticks.append(tick)
+
+    return ticks
+
+
+class TestStopOrder(unittest.TestCase):
+
+    def setUp(self):
+        self.main_engine = MainEngine(EventEngine())
+        self.engine = RecordCtaEngine(self.main_engine, self.main_engine.event_engine)
+
+        self.strategies = []
+        for i, vt_symbol in enumerate(["rb1910.SHFE", "rb1910.SHFE", "IF1909.CFFEX"]):
+            strategy = RecordStrategy(self.engine, f"test{i}", vt_symbol, {})
+            self.engine.strategies[strategy.strategy_name] = strategy
+            self.engine.symbol_strategy_map[vt_symbol].append(strategy)
+            self.strategies.append(strategy)
+
+    def tearDown(self):
+        self.main_engine.close()
+
+    def send_stop_order(self, strategy, direction, price):
+        return self.engine.send_local_stop_order(
+            strategy, direction, Offset.OPEN, price, 1, False
+        )
+
+    def test_check_stop_order(self):
+        rb1, rb2, if1 = self.strategies
+
+        long_1 = self.send_stop_order(rb1, Direction.LONG, 3010)
+        short_1 = self.send_stop_order(rb2, Direction.SHORT, 2990)
+        long_2 = self.send_stop_order(rb2, Direction.LONG, 3005)
+        short_2 = self.send_stop_order(rb1, Direction.SHORT, 2995)
+        long_3 = self.send_stop_order(if1, Direction.LONG, 3005)
+
+        # Nothing triggered between stop prices
+        self.engine.check_stop_order(create_tick("rb1910.SHFE", 3000))
+        self.assertFalse(self.engine.sent_orders)
+
+        # Only long orders of the symbol are triggered, in send order
+        self.engine.check_stop_order(create_tick("rb1910.SHFE", 3010))
+        self.assertEqual(
+            [order[:2] for order in self.engine.sent_orders],
+            [("test0", Direction.LONG), ("test1", Direction.LONG)]
+        )
+        self.assertNotIn(long_1, self.engine.stop_orders)
+        self.assertNotIn(long_2, self.engine.stop_orders)
+        self.assertIn(long_3, self.engine.stop_orders)
+        self.assertEqual(rb1.stop_orders[-1], (long_1, StopOrderStatus.TRIGGERED))
+
+        # Cancelled stop order is not triggered
+        self.engine.cancel_local_stop_order(rb1, short_2)
+        self.engine.check_stop_order(create_tick("rb1910.SHFE", 2980))
+        self.assertEqual(self.engine.sent_orders[-1][:2], ("test1", Direction.SHORT))
+        self.assertEqual(len(self.engine.sent_orders), 3)
+        self.assertNotIn(short_1, self.engine.stop_orders)
+
+        indexes = self.engine.stop_indexes["rb1910.SHFE"]
+        self.assertEqual(len(indexes[Direction.LONG]), 0)
+        self.assertEqual(len(indexes[Direction.SHORT]), 0)
+
+        self.engine.check_stop_order(create_tick("IF1909.CFFEX", 3006))
+        self.assertEqual(self.engine.sent_orders[-1][:2], ("test2", Direction.LONG))
+        self.assertFalse(self.engine.stop_orders)
+
+
+class TestBarAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.main_engine = MainEngine(EventEngine())
+        self.engine = CtaEngine(self.main_engine, self.main_engine.event_engine)
+        self.ticks = generate_ticks(3000)
+
+    def tearDown(self):
+        self.main_engine.close()
+
+    def add_strategy(self, strategy_class, strategy_name):
+        strategy = strategy_class(self.engine, strategy_name, "rb1910.SHFE", {})
+        strategy.inited = True
+        self.engine.strategies[strategy_name] = strategy
+        self.engine.symbol_strategy_map[strategy.vt_symbol].append(strategy)
+        return strategy
+
+    def test_subscribe_bar(self):
+        strategies = [
+            self.add_strategy(SubscribeStrategy, f"test{i}") for i in range(3)
+        ]
+        reference = self.add_strategy(GeneratorStrategy, "reference")
+
+        # Generators are shared by all strategies
+        aggregator = self.engine.bar_aggregators["rb1910.SHFE"]
+        self.assertEqual(len(aggregator.window_generators), 2)
+
+        for tick in self.ticks:
+            self.engine.process_tick_event(Event(EVENT_TICK, tick))
+
+        self.assertTrue(any(record[0] == "1h" for record in reference.records))
+        for strategy in strategies:
+            self.assertEqual(strategy.records, reference.records)
+
+        # Removed strategy gets no more bar
+        strategy = strategies[0]
+        self.engine.remove_strategy(strategy.strategy_name)
+        count = len(strategy.records)
+
+        for tick in generate_ticks(100):
+            tick.datetime += timedelta(days=1)
+            self.engine.process_tick_event(Event(EVENT_TICK, tick))
+
+        self.assertEqual(len(strategy.records), count)
+        self.assertGreater(len(strategies[1].records), count)
+
+    def test_load_bar(self):
+        strategies = [
+            self.add_strategy(SubscribeStrategy, f"test{i}") for i in range(2)
+        ]
+        reference = self.add_strategy(GeneratorStrategy, "reference")
+
+        # History ends in the middle of 5 minute and hour window
+        history = []
+        generator = BarGenerator(history.append)
+        for tick in self.ticks[:1000]:
+            generator.update_tick(tick)
+        self.assertNotEqual((history[-1].datetime.minute + 1) % 5, 0)
+
+        self.engine.load_bar = lambda vt_symbol, days, interval, callback: [
+            callback(bar) for bar in history
+        ]
+        for strategy in strategies:
+            strategy.load_bar(1)
+        for bar in history:
+            reference.on_1min_bar(bar)
+
+        for tick in self.ticks[1000:]:
+            self.engine.process_tick_event(Event(EVENT_TICK, tick))
+
+        # First live window bar continues window unfinished in history
+        self.assertTrue(any(record[0] == "1h" for record in reference.records))
+        for strategy in strategies:
+            self.assertEqual(strategy.records, reference.records)
+
+    def test_backtesting(self):
+        records = []
+
+        for strategy_class in [SubscribeStrategy, GeneratorStrategy]:
+            engine = BacktestingEngine()
+            engine.output = lambda msg: None
+            engine.set_parameters(
+                vt_symbol="rb1910.SHFE",
+                interval="1m",
+                start=self.ticks[0].datetime,
+                end=self.ticks[-1].datetime,
+                rate=0,
+                slippage=0,
+                size=10,
+                pricetick=1,
+                mode=BacktestingMode.TICK
+            )
+            engine.add_strategy(strategy_class, {})
+            engine.strategy.inited = True
+            engine.strategy.trading = True
+
+            for tick in self.ticks:
+                engine.new_tick(tick)
+            records.append(engine.strategy.records)
+
+        self.assertTrue(records[0])
+        self.assertEqual(records[0], records[1])
+
+
+class TestInitStrategy(unittest.TestCase):
+
+    def setUp(self):
+        self.main_engine = MainEngine(EventEngine())
+        self.engine = HistoryCtaEngine(self.main_engine, self.main_engine.event_engine)
+
+    def tearDown(self):
+        self.main_engine.close()
+
+    def add_strategy(self, strategy_name, vt_symbol, days):
+        strategy = InitStrategy(self.engine, strategy_name, vt_symbol, {"days": days})
+        self.engine.strategies[strategy_name] = strategy
+        self.engine.symbol_strategy_map[vt_symbol].append(strategy)
+        return strategy
+
+    def wait_init(self):
+        thread = self.engine.init_thread
+        if thread:
+            thread.join()
+
+    def test_init_all_strategies(self):
+        strategies = []
+        for i in range(20):
+            vt_symbol = "rb1910.SHFE" if i % 2 else "IF1909.CFFEX"
+            days = 10 if i % 3 else 5
+            strategies.append(self.add_strategy(f"test{i}", vt_symbol, days))
+
+        failed = self.add_strategy("failed", "rb1910.SHFE", -1)
+
+        self.engine.init_all_strategies()
+        self.wait_init()
+
+        # History is queried once for each symbol and days
+        self.assertEqual(len(self.engine.queries), 4)
+        self.assertEqual(len(set(self.engine.queries)), 4)
+        self.assertIsNone(self.engine.history_cache)
+
+        for strategy in strategies:
+            self.assertTrue(strategy.inited)
+            self.assertEqual(len(strategy.bars), strategy.days)
+            self.assertEqual(strategy.bars[0].vt_symbol, strategy.vt_symbol)
+
+        # Exception of one strategy does not affect others
+        self.assertFalse(failed.bars)
+
+        # Strategies get their own copy of the same history
+        self.assertEqual(strategies[1].bars, strategies[7].bars)
+        self.assertIsNot(strategies[1].bars[0], strategies[7].bars[0])
+
+        # History is queried again for init later
+        strategy = self.add_strategy("later", "rb1910.SHFE", 10)
+        self.engine.init_strategy("later")
+        self.wait_init()
+
+        self.assertTrue(strategy.inited)
+        self.assertEqual(len(self.engine.queries), 5)
+
+
+class TestStrategyShard(unittest.TestCase):
+
+    def setUp(self):
+        self.main_engine = MainEngine(EventEngine())
+        self.engine = ShardCtaEngine(self.main_engine, self.main_engine.event_engine)
+        self.engine.register_event()
+        self.engine.set_shard_count(2)
+
+    def tearDown(self):
+        for shard in self.engine.shards.values():
+            shard.close()
+        self.main_engine.close()
+
+    def add_strategy(self, strategy_name, vt_symbol):
+        shard = self.engine.get_shard(vt_symbol)
+        strategy = shard.add_strategy(ShardStrategy, strategy_name, vt_symbol, {})
+        self.engine.strategies[strategy_name] = strategy
+        self.engine.symbol_strategy_map[vt_symbol].append(strategy)
+        return strategy
+
+    def wait_until(self, condition):
+        end = time.time() + 30
+        while not condition() and time.time() < end:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_run_strategies(self):
+        strategies = [
+            self.add_strategy("test0", "rb1910.SHFE"),
+            self.add_strategy("test1", "rb1910.SHFE"),
+            self.add_strategy("test2", "IF1909.CFFEX"),
+        ]
+        rb1, rb2, if1 = strategies
+        self.assertIs(rb1.shard, rb2.shard)
+
+        # on_init returns after history loaded from main process
+        self.engine.init_all_strategies()
+        self.engine.init_thread.join()
+
+        for strategy in strategies:
+            self.assertTrue(strategy.inited)
+            self.assertEqual(strategy.bar_count, 10)
+        self.assertEqual(len(self.engine.queries), 2)
+
+        for strategy in strategies:
+            self.engine.start_strategy(strategy.strategy_name)
+            self.assertTrue(strategy.trading)
+
+        for price in [3000, 3001]:
+            self.engine.process_tick_event(Event(EVENT_TICK, create_tick("rb1910.SHFE", price)))
+
+        # Orders of strategies in shard are sent through main process
+        self.wait_until(lambda: rb2.tick_count == 2)
+        self.assertEqual(rb1.tick_count, 2)
+        self.assertEqual(if1.tick_count, 0)
+        self.assertEqual(
+            sorted(self.engine.sent_orders),
+            [("test0", Direction.LONG, 3000), ("test1", Direction.LONG, 3000)]
+        )
+
+        # Position is updated before on_trade called in shard
+        trade = TradeData(
+            gateway_name="TEST",
+            symbol="rb1910",
+            exchange=Exchange.SHFE,
+            orderid="1",
+            tradeid="1",
+            direction=Direction.LONG,
+            volume=1,
+        )
+        trade.vt_orderid = "TEST.1"
+        self.engine.process_trade_event(Event("", trade))
+
+        strategy = self.engine.orderid_strategy_map["TEST.1"]
+        self.wait_until(lambda: strategy.trade_pos == 1)
+        self.assertEqual(strategy.pos, 1)
+        self.assertEqual(self.engine.strategy_data[strategy.strategy_name]["trade_pos"], 1)
+
+        # Removed strategy gets no more tick
+        self.engine.stop_strategy("test0")
+        self.engine.remove_strategy("test0")
+        self.engine.process_tick_event(Event(EVENT_TICK, create_tick("rb1910.SHFE", 3002)))
+
+        self.wait_until(lambda: rb2.tick_count == 3)
+        self.assertEqual(rb1.tick_count, 2)
+
+    def test_query_history(self):
+        strategies = [
+            self.add_strategy(f"test{i}", vt_symbol)
+            for i, vt_symbol in enumerate(["rb1910.SHFE", "IF1909.CFFEX", "IF1910.CFFEX"])
+        ]
+        self.assertEqual(len({strategy.shard for strategy in strategies}), 2)
+
+        # History requests of shards are queried one at a time
+        self.engine.init_all_strategies()
+        self.engine.init_thread.join()
+
+        self.assertTrue(all(strategy.inited for strategy in strategies))
+        self.assertEqual(len(self.engine.queries), 3)
+        self.assertEqual(self.engine.max_active_queries, 1)
+
+    def test_local_strategy(self):
+        proxy = self.add_strategy("proxy", "rb1910.SHFE")
+        self.engine.init_strategy("proxy")
+        self.engine.init_thread.join()
+        self.assertFalse(self.engine.set_shard_count(3))
+        self.assertEqual(self.engine.shard_count, 2)
+
+        # Strategy running in engine still gets tick with shards enabled
+        local = ShardStrategy(self.engine, "local", "rb1910.SHFE", {})
+        local.inited = True
+        self.engine.strategies["local"] = local
+        self.engine.symbol_strategy_map["rb1910.SHFE"].append(local)
+
+        self.engine.process_tick_event(Event(EVENT_TICK, create_tick("rb1910.SHFE", 3000)))
+
+        self.assertEqual(local.tick_count, 1)
+        self.wait_until(lambda: proxy.tick_count == 1)
+
+    def test_process_exited(self):
+        strategy = self.add_strategy("test0", "rb1910.SHFE")
+        self.engine.init_strategy("test0")
+        self.engine.init_thread.join()
+        self.engine.start_strategy("test0")
+        self.assertTrue(strategy.trading)
+
+        # Order sent on first tick is still active
+        self.engine.process_tick_event(Event(EVENT_TICK, create_tick("rb1910.SHFE", 3000)))
+        self.wait_until(lambda: self.engine.sent_orders)
+        cancelled = []
+        self.engine.cancel_all = lambda strategy: cancelled.append(strategy.strategy_name)
+
+        # Strategies are stopped and orders cancelled after shard process is killed
+        strategy.shard.process.kill()
+        strategy.shard.process.join()
+        self.wait_until(lambda: not strategy.shard.active)
+        self.assertFalse(strategy.trading)
+        self.assertFalse(strategy.inited)
+        self.wait_until(lambda: cancelled == ["test0"])
+
+        # Messages to dead shard are dropped
+        self.engine.process_tick_event(Event(EVENT_TICK, create_tick("rb1910.SHFE", 3000)))
+        strategy.on_init()
+        strategy.shard.close(timeout=1)
+
+
+class TestDataJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = str(Path(self.folder.name).joinpath("data.json"))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def update_data(self, journal, count):
+        expected = {}
+
+        for i in range(count):
+            name = f"test{i % 3}"
+            value = {"pos": i, "prices": [i * 1.5, -i], "name": "螺纹钢"}
+            journal.update(name, value)
+
+            # Later change of value is not written
+            value["pos"] = -1
+            expected[name] = {"pos": i, "prices": [i * 1.5, -i], "name": "螺纹钢"}
+
+        return expected
+
+    def test_recover(self):
+        with open(self.filename, "w") as f:
+            json.dump({"old": {"pos": 1}, "test0": {"pos": 2}}, f)
+
+        journal = DataJournal(self.filename, flush_interval=0.01)
+        self.assertEqual(journal.load(), {"old": {"pos": 1}, "test0": {"pos": 2}})
+        journal.start()
+
+        expected = self.update_data(journal, 100)
+        expected["old"] = {"pos": 1}
+
+        # Stop writing without compaction, as if process is killed
+        journal.queue.put(None)
+        journal.thread.join()
+        self.assertTrue(journal.journal_path.exists())
+
+        # Incomplete line at the end is ignored
+        with open(journal.journal_path, "a") as f:
+            f.write('["test1", {"pos": ')
+
+        journal = DataJournal(self.filename)
+        self.assertEqual(journal.load(), expected)
+        self.assertFalse(journal.journal_path.exists())
+
+        with open(self.filename, encoding="UTF-8") as f:
+            self.assertEqual(json.load(f), expected)
+
+    def test_compact(self):
+        journal = DataJournal(self.filename, flush_interval=0, compact_count=5)
+        journal.load()
+        journal.start()
+
+        expected = self.update_data(journal, 50)
+        journal.close()
+
+        self.assertFalse(journal.journal_path.exists())
+        self.assertEqual(DataJournal(self.filename).load(), expected)
+
+    def test_close_without_load(self):
+        with open(self.filename, "w") as f:
+            json.dump({"test0": {"pos": 5}}, f)
+
+        journal = DataJournal(self.filename)
+        journal.start()
+        journal.close()
+
+        with open(self.filename) as f:
+            self.assertEqual(json.load(f), {"test0": {"pos": 5}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+"""
+Test if event engine works fine
+"""
+import os
+import unittest
+from collections import defaultdict
+from threading import Event as ThreadingEvent
+from time import perf_counter, sleep
+
+from vnpy.event import Event, EventEngine, EVENT_STATS
+from vnpy.event.engine import Timer, TimerWheel
+
+EVENT_TEST = "eTest"
+EVENT_TEST_LATEST = "eTestLatest"
+
+
+class MockData:
+
+    def __init__(self, vt_symbol: str, count: int):
+        self.vt_symbol = vt_symbol
+        self.count = count
+        self.put_time = perf_counter()
+
+
+def run_engine(engine: EventEngine, symbol_count: int, event_count: int, cost: float):
+    """
+    Put events of several symbols into engine and wait until all processed.
+
+    :return: (throughput in events/second, average latency, max latency)
+    """
+    received = defaultdict(list)
+    latencies = []
+    finished = ThreadingEvent()
+    total = symbol_count * event_count
+
+    def handler(event: Event):
+        data = event.data
+        latencies.append(perf_counter() - data.put_time)
+        received[data.vt_symbol].append(data.count)
+
+        if cost:
+            sleep(cost)
+
+        if len(latencies) == total:
+            finished.set()
+
+    engine.register(EVENT_TEST, handler)
+    engine.start()
+
+    start = perf_counter()
+    for count in range(event_count):
+        for i in range(symbol_count):
+            data = MockData(f"symbol{i}.TEST", count)
+            engine.put(Event(EVENT_TEST, data))
+    finished.wait(60)
+    cost_time = perf_counter() - start
+
+    engine.stop()
+
+    throughput = total / cost_time
+    average_latency = sum(latencies) / len(latencies)
+    return throughput, average_latency, max(latencies), received
+
+
+class TestEventEngine(unittest.TestCase):
+
+    def test_single_thread(self):
+        engine = EventEngine()
+        _, _, _, received = run_engine(engine, 4, 100, 0)
+
+        for counts in received.values():
+            self.assertEqual(counts, list(range(100)))
+
+    def test_worker_ordering(self):
+        engine = EventEngine(worker_count=4, batch_size=10)
+        _, _, _, received = run_engine(engine, 8, 200, 0)
+
+        self.assertEqual(len(received), 8)
+        for counts in received.values():
+            self.assertEqual(counts, list(range(200)), "per-symbol ordering broken")
+
+    def test_put_latest(self):
+        engine = EventEngine()
+        full = []
+        latest = []
+        finished = ThreadingEvent()
+
+        engine.register(EVENT_TEST, lambda event: full.append(event.data.count))
+        engine.register(EVENT_TEST_LATEST, lambda event: latest.append(event.data.count))
+        engine.register(EVENT_TEST + "done", lambda event: finished.set())
+
+        # Queue up events before engine started, as if handlers fell behind
+        for count in range(10):
+            for vt_symbol in ["a.TEST", "b.TEST"]:
+                data = MockData(vt_symbol, count)
+                engine.put_latest(Event(EVENT_TEST_LATEST, data), vt_symbol)
+                engine.put(Event(EVENT_TEST, data))
+        engine.put(Event(EVENT_TEST + "done"))
+
+        engine.start()
+        finished.wait(10)
+
+        # Put again after pending events processed
+        engine.put_latest(Event(EVENT_TEST_LATEST, MockData("a.TEST", 10)), "a.TEST")
+        engine.put(Event(EVENT_TEST + "done"))
+        sleep(0.1)
+        engine.stop()
+
+        self.assertEqual(len(full), 20)
+        self.assertEqual(latest, [9, 9, 10])
+        self.assertEqual(engine.get_merged_count(EVENT_TEST_LATEST), 18)
+
+    def test_put_latest_type_without_key(self):
+        engine = EventEngine()
+        latest = []
+        engine.register(EVENT_TEST_LATEST, lambda event: latest.append(event.data.count))
+
+        # Event of conflated type put without key, e.g. by other gateways
+        engine.put_latest(Event(EVENT_TEST_LATEST, MockData("a.TEST", 0)), "a.TEST")
+        engine.put(Event(EVENT_TEST_LATEST, MockData("a.TEST", 1)))
+        engine.put_latest(Event(EVENT_TEST_LATEST, MockData("a.TEST", 2)), "a.TEST")
+
+        engine.start()
+        sleep(0.1)
+        engine.put_latest(Event(EVENT_TEST_LATEST, MockData("a.TEST", 3)), "a.TEST")
+        sleep(0.1)
+        engine.stop()
+
+        self.assertEqual(latest, [2, 1, 3])
+
+    def test_profile(self):
+        engine = EventEngine(profile_interval=1)
+        stats_list = []
+
+        def slow_handler(event: Event):
+            sleep(0.001)
+
+        engine.register(EVENT_TEST, slow_handler)
+        engine.register(EVENT_STATS, lambda event: stats_list.append(event.data))
+
+        for count in range(20):
+            engine.put(Event(EVENT_TEST, MockData("a.TEST", count)))
+
+        engine.start()
+        sleep(1.5)
+        engine.stop()
+
+        stats = engine.get_stats()
+        event_stats = stats["events"][EVENT_TEST]
+        handler_stats = event_stats["handlers"]["TestEventEngine.test_profile.<locals>.slow_handler"]
+
+        self.assertEqual(event_stats["count"], 20)
+        self.assertGreater(event_stats["max"], event_stats["p50"])
+        self.assertEqual(handler_stats["count"], 20)
+        self.assertGreaterEqual(handler_stats["p50"], 0.001)
+        self.assertGreater(stats["max_queue_depth"], 0)
+        self.assertTrue(stats_list, "no stats event pushed by timer")
+
+
+@unittest.skipIf(
+    "VNPY_TEST_BENCHMARK" not in os.environ,
+    "Benchmark only runs with VNPY_TEST_BENCHMARK set"
+)
+class BenchmarkEventEngine(unittest.TestCase):
+
+    def test_worker_benchmark(self):
+        """
+        Compare throughput/latency of single thread loop and worker mode
+        with a slow handler.
+        """
+        results = {}
+        for worker_count in [0, 2, 4]:
+            engine = EventEngine(worker_count=worker_count)
+            throughput, average, maximum, _ = run_engine(engine, 8, 100, 0.0002)
+            results[worker_count] = throughput
+
+            print(
+                f"\nworkers={worker_count}: {throughput:.0f} events/s, "
+                f"avg latency {average * 1000:.2f}ms, max latency {maximum * 1000:.2f}ms"
+            )
+
+        self.assertGreater(results[4], results[0])
+
+
+class TestTimerWheel(unittest.TestCase):
+
+    def test_expire(self):
+        wheel = TimerWheel()
+        expires = [0, 1, 255, 256, 257, 1000, 16383, 16384, 20000, 1 << 20, (1 << 20) + 7]
+        for ix, expire in enumerate(expires):
+            wheel.add(Timer(ix, expire, 0, None))
+
+        for expire in expires:
+            self.assertEqual(wheel.advance(expire - 1) if expire else [], [])
+
+            timers = wheel.advance(expire)
+            self.assertEqual([timer.expire for timer in timers], [expire])
+
+        self.assertEqual(wheel.count, 0)
+        self.assertEqual(wheel.get_next_delay(), -1)
+
+    def test_next_delay(self):
+        wheel = TimerWheel()
+        wheel.advance(100)
+        wheel.add(Timer(1, 150, 0, None))
+        self.assertEqual(wheel.get_next_delay(), 49)
+
+        wheel.add(Timer(2, 5000, 0, None))
+        wheel.advance(150)
+        self.assertEqual(wheel.get_next_delay(), 256 - 151)
+
+
+class TestSchedule(unittest.TestCase):
+
+    def test_schedule(self):
+        engine = EventEngine()
+        once = []
+        every = []
+        cancelled = []
+
+        engine.start()
+        start = perf_counter()
+        engine.schedule_once(50, lambda: once.append(perf_counter() - start))
+        timer_id = engine.schedule_every(20, lambda: every.append(perf_counter() - start))
+        cancel_id = engine.schedule_once(100, lambda: cancelled.append(1))
+        engine.cancel_timer(cancel_id)
+
+        sleep(0.21)
+        engine.cancel_timer(timer_id)
+        count = len(every)
+        sleep(0.1)
+        engine.stop()
+
+        self.assertEqual(len(once), 1)
+        self.assertGreaterEqual(once[0], 0.05)
+        self.assertLess(once[0], 0.1)
+        self.assertGreaterEqual(count, 8)
+        self.assertEqual(len(every), count, "callback called after cancelled")
+        self.assertFalse(cancelled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Test if array manager works fine
+"""
+import os
+import unittest
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData
+from vnpy.trader.utility import ArrayManager
+
+
+class ShiftArrayManager:
+    """
+    Reference implementation which shifts arrays on every bar.
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self.open = np.zeros(size)
+        self.high = np.zeros(size)
+        self.low = np.zeros(size)
+        self.close = np.zeros(size)
+        self.volume = np.zeros(size)
+
+    def update_bar(self, bar):
+        self.open[:-1] = self.open[1:]
+        self.high[:-1] = self.high[1:]
+        self.low[:-1] = self.low[1:]
+        self.close[:-1] = self.close[1:]
+        self.volume[:-1] = self.volume[1:]
+
+        self.open[-1] = bar.open_price
+        self.high[-1] = bar.high_price
+        self.low[-1] = bar.low_price
+        self.close[-1] = bar.close_price
+        self.volume[-1] = bar.volume
+
+
+def generate_bars(count: int):
+    start = datetime(2019, 1, 1)
+    np.random.seed(0)
+    prices = 1000 + np.random.randn(count).cumsum()
+
+    bars = []
+    for i, price in enumerate(prices):
+        bar = BarData(
+            gateway_name="TEST",
+            symbol="test",
+            exchange=Exchange.SHFE,
+            datetime=start + timedelta(minutes=i),
+            interval=Interval.MINUTE,
+            open_price=price,
+            high_price=price + 1,
+            low_price=price - 1,
+            close_price=price + 0.5,
+            volume=i,
+            open_interest=i * 2,
+        )
+        bars.append(bar)
+    return bars
+
+
+class TestArrayManager(unittest.TestCase):
+
+    def test_update_bar(self):
+        bars = generate_bars(250)
+        am = ArrayManager(size=100)
+        reference = ShiftArrayManager(size=100)
+
+        for ix, bar in enumerate(bars):
+            am.update_bar(bar)
+            reference.update_bar(bar)
+
+            for name in ["open", "high", "low", "close", "volume"]:
+                np.testing.assert_array_equal(getattr(am, name), getattr(reference, name))
+
+            self.assertEqual(am.datetime[-1], bar.datetime)
+            self.assertEqual(am.open_interest[-1], bar.open_interest)
+            self.assertEqual(am.inited, ix >= 99)
+
+        self.assertTrue(am.close.flags["C_CONTIGUOUS"])
+        self.assertEqual(list(am.datetime), [bar.datetime for bar in bars[-100:]])
+        self.assertAlmostEqual(am.sma(20), reference.close[-20:].mean())
+
+    def test_set_array(self):
+        bars = generate_bars(150)
+        am = ArrayManager(size=100, incremental=True)
+        reference = ShiftArrayManager(size=100)
+
+        for bar in bars:
+            am.update_bar(bar)
+            reference.update_bar(bar)
+
+        value = am.sma(20)
+        close = am.close_array * 2
+        am.close_array = close
+        reference.close *= 2
+
+        np.testing.assert_array_equal(am.close, close)
+        self.assertAlmostEqual(am.sma(20), value * 2)
+
+        # Values set are kept after buffer wraps around
+        for bar in generate_bars(100)[:60]:
+            am.update_bar(bar)
+            reference.update_bar(bar)
+        np.testing.assert_array_equal(am.close, reference.close)
+
+    def test_incremental(self):
+        bars = generate_bars(3000)
+        am = ArrayManager(size=1000)
+        incremental_am = ArrayManager(size=1000, incremental=True)
+
+        for bar in bars:
+            am.update_bar(bar)
+            incremental_am.update_bar(bar)
+
+            if not am.inited:
+                continue
+
+            for name, args in [
+                ("sma", (20,)),
+                ("std", (20,)),
+                ("atr", (14,)),
+                ("rsi", (14,)),
+                ("macd", (12, 26, 9)),
+                ("boll", (20, 2)),
+                ("keltner", (20, 2)),
+                ("donchian", (20,)),
+            ]:
+                expected = getattr(am, name)(*args)
+                result = getattr(incremental_am, name)(*args)
+                np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-6)
+
+        # Value is memoized until next bar
+        value = incremental_am.sma(20)
+        incremental_am.close[-1] += 100
+        self.assertEqual(incremental_am.sma(20), value)
+
+
+@unittest.skipIf(
+    "VNPY_TEST_BENCHMARK" not in os.environ,
+    "Benchmark only runs with VNPY_TEST_BENCHMARK set"
+)
+class BenchmarkArrayManager(unittest.TestCase):
+
+    def test_update_bar(self):
+        bars = generate_bars(20000)
+
+        for size in [100, 1000, 10000]:
+            for am_class in [ShiftArrayManager, ArrayManager]:
+                am = am_class(size=size)
+
+                start = perf_counter()
+                for bar in bars:
+                    am.update_bar(bar)
+                cost = perf_counter() - start
+
+                print(f"\nsize={size} {am_class.__name__}: "
+                      f"{cost / len(bars) * 1e6:.2f}us per update_bar")
+
+    def test_indicator(self):
+        bars = generate_bars(20000)
+
+        for size in [100, 1000, 10000]:
+            for incremental in [False, True]:
+                am = ArrayManager(size=size, incremental=incremental)
+
+                start = perf_counter()
+                for bar in bars:
+                    am.update_bar(bar)
+                    am.sma(20)
+                    am.atr(14)
+                    am.rsi(14)
+                    am.macd(12, 26, 9)
+                    am.donchian(20)
+                cost = perf_counter() - start
+
+                print(f"\nsize={size} incremental={incremental}: "
+                      f"{cost / len(bars) * 1e6:.2f}us per bar")
+
+
+if __name__ == "__main__":
+    unittest.main()
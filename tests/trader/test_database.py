@@ -5,6 +5,8 @@ import os
 import unittest
 from copy import copy
 from datetime import datetime, timedelta
+from time import perf_counter
+import tracemalloc
 
 from vnpy.trader.constant import Exchange, Interval
 from vnpy.trader.database.database import Driver
@@ -12,7 +14,10 @@ from vnpy.trader.object import BarData, TickData
 
 os.environ["VNPY_TESTING"] = "1"
 
-profiles = {Driver.SQLITE: {"driver": "sqlite", "database": "test_db.db"}}
+profiles = {
+    Driver.SQLITE: {"driver": "sqlite", "database": "test_db.db"},
+    Driver.NUMPY: {"driver": "numpy", "database": "test_db_numpy"},
+}
 if "VNPY_TEST_ONLY_SQLITE" not in os.environ:
     profiles.update(
         {
@@ -49,6 +54,26 @@ def now():
     return datetime.utcnow()
 
 
+def generate_bars(count: int, end: datetime):
+    """
+    Generate minute bars ending at end for benchmark.
+    """
+    start = end - timedelta(minutes=count)
+    for i in range(count):
+        yield BarData(
+            gateway_name="DB",
+            symbol=bar.symbol,
+            exchange=bar.exchange,
+            datetime=start + timedelta(minutes=i),
+            interval=Interval.MINUTE,
+            volume=i,
+            open_price=i,
+            high_price=i,
+            low_price=i,
+            close_price=i,
+        )
+
+
 bar = BarData(
     gateway_name="DB",
     symbol="test_symbol",
@@ -125,6 +150,87 @@ class TestDatabase(unittest.TestCase):
 
                 self.assertBarCount(1, "there should be only one item after save")
 
+    def test_save_string_bar(self):
+        for driver, settings in profiles.items():
+            with self.subTest(driver=driver, settings=settings):
+                self.connect(settings)
+
+                # Values read from csv file are saved as float
+                b = copy(bar)
+                b.volume = "12"
+                b.open_price = "1.5"
+                b.high_price = "2"
+                b.low_price = "1"
+                b.close_price = "1.25"
+                self.manager.save_bar_data([b])
+
+                bars = self.manager.load_bar_data(
+                    symbol=bar.symbol,
+                    exchange=bar.exchange,
+                    interval=bar.interval,
+                    start=bar.datetime - timedelta(days=1),
+                    end=now()
+                )
+                self.assertEqual(len(bars), 1)
+                self.assertEqual(
+                    [bars[0].volume, bars[0].open_price, bars[0].close_price],
+                    [12.0, 1.5, 1.25]
+                )
+                self.assertIsInstance(bars[0].volume, float)
+
+    def test_save_unordered_bar(self):
+        for driver, settings in profiles.items():
+            with self.subTest(driver=driver, settings=settings):
+                self.connect(settings)
+
+                bars = []
+                for i in range(5):
+                    b = copy(bar)
+                    b.datetime = bar.datetime - timedelta(minutes=i)
+                    b.close_price = i
+                    bars.append(b)
+
+                # newer bars first, then older ones and an update
+                self.manager.save_bar_data(bars[:2])
+                updated = copy(bars[0])
+                updated.close_price = 100
+                self.manager.save_bar_data(bars[2:] + [updated])
+
+                got = self.manager.load_bar_data(
+                    symbol=bar.symbol,
+                    exchange=bar.exchange,
+                    interval=bar.interval,
+                    start=bar.datetime - timedelta(days=1),
+                    end=now()
+                )
+                self.assertEqual([b.close_price for b in got], [4, 3, 2, 1, 100])
+                self.assertEqual(
+                    [b.datetime for b in got],
+                    sorted(b.datetime for b in bars)
+                )
+
+    def test_load_bar_arrays(self):
+        for driver, settings in profiles.items():
+            with self.subTest(driver=driver, settings=settings):
+                self.connect(settings)
+                bars = list(generate_bars(10, now()))
+                self.manager.save_bar_data(bars)
+
+                args = (bar.symbol, bar.exchange, bar.interval, bars[0].datetime, now())
+                loaded = self.manager.load_bar_data(*args)
+                arrays = self.manager.load_bar_arrays(*args)
+                df = self.manager.load_bar_df(*args)
+
+                self.assertEqual(len(arrays["datetime"]), 10)
+                self.assertEqual(arrays["datetime"].tolist(), [b.datetime for b in loaded])
+                self.assertEqual(arrays["close_price"].tolist(), [b.close_price for b in loaded])
+                self.assertEqual(df["volume"].tolist(), [b.volume for b in loaded])
+
+                empty = self.manager.load_bar_arrays(
+                    bar.symbol, bar.exchange, bar.interval, now(), now()
+                )
+                self.assertEqual(len(empty["open_price"]), 0)
+
     def test_upsert_tick(self):
         for driver, settings in profiles.items():
             with self.subTest(driver=driver, settings=settings):
@@ -142,6 +248,31 @@ class TestDatabase(unittest.TestCase):
 
                 self.assertTickCount(1, "there should be only one item after save")
 
+    def test_numpy_store_path(self):
+        self.connect(profiles[Driver.NUMPY])
+
+        # Symbol is escaped so that data stays in folder of the store
+        t = copy(tick)
+        t.symbol = "../test_symbol"
+        try:
+            self.manager.save_tick_data([t])
+
+            path = self.manager.get_symbol_path(t.symbol)
+            self.assertEqual(path.parent, self.manager.path)
+            ticks = self.manager.load_tick_data(
+                t.symbol, t.exchange, t.datetime - timedelta(days=1), now()
+            )
+            self.assertEqual(len(ticks), 1)
+        finally:
+            self.manager.clean(t.symbol)
+
+        # Name longer than column width is rejected instead of truncated
+        t = copy(tick)
+        t.name = "x" * 33
+        with self.assertRaises(ValueError):
+            self.manager.save_tick_data([t])
+        self.assertTickCount(0, "tick with long name should not be saved")
+
     def test_newest_bar(self):
         for driver, settings in profiles.items():
             with self.subTest(driver=driver, settings=settings):
@@ -193,5 +324,72 @@ class TestDatabase(unittest.TestCase):
                 self.assertEqual(got.volume, newer_one.volume, "the newest tick we got mismatched")
 
 
+@unittest.skipIf(
+    "VNPY_TEST_BENCHMARK" not in os.environ,
+    "Benchmark only runs with VNPY_TEST_BENCHMARK set"
+)
+class BenchmarkDatabase(unittest.TestCase):
+    """
+    Rows per second of saving bars, bar count can be changed by
+    VNPY_TEST_BENCHMARK_COUNT (1 million by default).
+    """
+
+    count = int(os.environ.get("VNPY_TEST_BENCHMARK_COUNT", 1_000_000))
+
+    def test_save_bar_stream(self):
+        from vnpy.trader.database.initialize import init  # noqa
+
+        for driver, settings in profiles.items():
+            with self.subTest(driver=driver, settings=settings):
+                manager = init(settings)
+                manager.clean(bar.symbol)
+
+                start = perf_counter()
+                saved = manager.save_bar_data_stream(generate_bars(self.count, now()))
+                cost = perf_counter() - start
+
+                print(f"\n{driver.value}: saved {saved} bars in {cost:.1f}s, "
+                      f"{saved / cost:.0f} rows/s")
+
+                self.assertEqual(saved, self.count)
+                manager.clean(bar.symbol)
+
+    def test_load_bar(self):
+        """
+        Time and peak memory of load_bar_data compared with load_bar_arrays,
+        bar count can be changed by VNPY_TEST_BENCHMARK_LOAD_COUNT
+        (5 million by default).
+        """
+        from vnpy.trader.database.initialize import init  # noqa
+
+        count = int(os.environ.get("VNPY_TEST_BENCHMARK_LOAD_COUNT", 5_000_000))
+        end = now()
+        args = (bar.symbol, bar.exchange, bar.interval, end - timedelta(minutes=count), end)
+
+        for driver, settings in profiles.items():
+            with self.subTest(driver=driver, settings=settings):
+                manager = init(settings)
+                manager.clean(bar.symbol)
+                manager.save_bar_data_stream(generate_bars(count, end))
+
+                for func in [manager.load_bar_data, manager.load_bar_arrays]:
+                    tracemalloc.start()
+                    start = perf_counter()
+                    data = func(*args)
+                    cost = perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    print(f"\n{driver.value} {func.__name__}: {cost:.1f}s, "
+                          f"peak memory {peak / 1024 / 1024:.0f}MB")
+
+                    if isinstance(data, dict):
+                        data = data["datetime"]
+                    self.assertEqual(len(data), count)
+                    del data
+
+                manager.clean(bar.symbol)
+
+
 if __name__ == "__main__":
     unittest.main()
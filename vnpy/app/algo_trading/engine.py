@@ -1,3 +1,4 @@
+from typing import Callable
 
 from vnpy.event import EventEngine, Event
 from vnpy.trader.engine import BaseEngine, MainEngine
@@ -201,6 +202,18 @@ class AlgoEngine(BaseEngine):
         req = order.create_cancel_request()
         self.main_engine.cancel_order(req, order.gateway_name)
 
+    def schedule_once(self, algo: AlgoTemplate, delay: int, callback: Callable):
+        """"""
+        return self.event_engine.schedule_once(delay, callback)
+
+    def schedule_every(self, algo: AlgoTemplate, interval: int, callback: Callable):
+        """"""
+        return self.event_engine.schedule_every(interval, callback)
+
+    def cancel_timer(self, algo: AlgoTemplate, timer_id: int):
+        """"""
+        self.event_engine.cancel_timer(timer_id)
+
     def get_tick(self, algo: AlgoTemplate, vt_symbol: str):
         """"""
         tick = self.main_engine.get_tick(vt_symbol)
@@ -1,3 +1,5 @@
+from typing import Callable
+
 from vnpy.trader.engine import BaseEngine
 from vnpy.trader.object import TickData, OrderData, TradeData
 from vnpy.trader.constant import OrderType, Offset, Direction
@@ -24,6 +26,7 @@ class AlgoTemplate:
 
         self.active = False
         self.active_orders = {}  # vt_orderid:order
+        self.timer_ids = set()
 
         self.variables.insert(0, "active")
 
@@ -99,6 +102,7 @@ class AlgoTemplate:
         """"""
         self.active = False
         self.cancel_all()
+        self.cancel_all_timers()
         self.on_stop()
         self.put_variables_event()
 
@@ -164,6 +168,32 @@ class AlgoTemplate:
         for vt_orderid in self.active_orders.keys():
             self.cancel_order(vt_orderid)
 
+    def schedule_once(self, delay: int, callback: Callable):
+        """
+        Call callback once after delay milliseconds.
+        """
+        timer_id = self.algo_engine.schedule_once(self, delay, callback)
+        self.timer_ids.add(timer_id)
+        return timer_id
+
+    def schedule_every(self, interval: int, callback: Callable):
+        """
+        Call callback every interval milliseconds until algo stopped.
+        """
+        timer_id = self.algo_engine.schedule_every(self, interval, callback)
+        self.timer_ids.add(timer_id)
+        return timer_id
+
+    def cancel_timer(self, timer_id: int):
+        """"""
+        self.algo_engine.cancel_timer(self, timer_id)
+        self.timer_ids.discard(timer_id)
+
+    def cancel_all_timers(self):
+        """"""
+        for timer_id in list(self.timer_ids):
+            self.cancel_timer(timer_id)
+
     def get_tick(self, vt_symbol: str):
         """"""
         return self.algo_engine.get_tick(self, vt_symbol)
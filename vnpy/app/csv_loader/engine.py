@@ -71,38 +71,42 @@ class CsvLoaderEngine(BaseEngine):
         """
         reader = csv.DictReader(f)
 
-        bars = []
-        start = None
-        count = 0
-        for item in reader:
-            if datetime_format:
-                dt = datetime.strptime(item[datetime_head], datetime_format)
-            else:
-                dt = datetime.fromisoformat(item[datetime_head])
-
-            bar = BarData(
-                symbol=symbol,
-                exchange=exchange,
-                datetime=dt,
-                interval=interval,
-                volume=item[volume_head],
-                open_price=item[open_head],
-                high_price=item[high_head],
-                low_price=item[low_head],
-                close_price=item[close_head],
-                gateway_name="DB",
-            )
-
-            bars.append(bar)
-
-            # do some statistics
-            count += 1
-            if not start:
-                start = bar.datetime
-        end = bar.datetime
-
-        # insert into database
-        database_manager.save_bar_data(bars)
+        stats = {"start": None, "end": None, "count": 0}
+
+        def generate_bars():
+            for item in reader:
+                if datetime_format:
+                    dt = datetime.strptime(item[datetime_head], datetime_format)
+                else:
+                    dt = datetime.fromisoformat(item[datetime_head])
+
+                bar = BarData(
+                    symbol=symbol,
+                    exchange=exchange,
+                    datetime=dt,
+                    interval=interval,
+                    volume=item[volume_head],
+                    open_price=item[open_head],
+                    high_price=item[high_head],
+                    low_price=item[low_head],
+                    close_price=item[close_head],
+                    gateway_name="DB",
+                )
+
+                # do some statistics
+                stats["count"] += 1
+                if not stats["start"]:
+                    stats["start"] = bar.datetime
+                stats["end"] = bar.datetime
+
+                yield bar
+
+        # insert into database batch by batch
+        database_manager.save_bar_data_stream(generate_bars())
+
+        start = stats["start"]
+        end = stats["end"]
+        count = stats["count"]
         return start, end, count
 
     def load(
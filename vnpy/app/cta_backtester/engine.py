@@ -1,7 +1,7 @@
 import os
 import importlib
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
 from threading import Thread
 from pathlib import Path
 
@@ -17,12 +17,14 @@ from vnpy.app.cta_strategy import (
     BacktestingEngine,
     OptimizationSetting
 )
+from vnpy.app.cta_strategy.result_store import OptimizationResultStore
 
 APP_NAME = "CtaBacktester"
 
 EVENT_BACKTESTER_LOG = "eBacktesterLog"
 EVENT_BACKTESTER_BACKTESTING_FINISHED = "eBacktesterBacktestingFinished"
 EVENT_BACKTESTER_OPTIMIZATION_FINISHED = "eBacktesterOptimizationFinished"
+EVENT_BACKTESTER_OPTIMIZATION_PROGRESS = "eBacktesterOptimizationProgress"
 
 
 class BacktesterEngine(BaseEngine):
@@ -36,6 +38,7 @@ class BacktesterEngine(BaseEngine):
 
         self.classes = {}
         self.backtesting_engine = None
+        self.result_store = None
         self.thread = None
 
         # Backtesting reuslt
@@ -45,6 +48,11 @@ class BacktesterEngine(BaseEngine):
         # Optimization result
         self.result_values = None
 
+        # Optimization progress
+        self.optimization_target = ""
+        self.optimization_start = None
+        self.best_count = 10
+
         self.load_strategy_class()
 
     def init_engine(self):
@@ -55,6 +63,13 @@ class BacktesterEngine(BaseEngine):
         # Redirect log from backtesting engine outside.
         self.backtesting_engine.output = self.write_log
 
+        # Keep optimization results for resuming interrupted optimization.
+        self.result_store = OptimizationResultStore()
+        self.backtesting_engine.result_store = self.result_store
+
+        # Stream optimization results while running.
+        self.backtesting_engine.optimization_callback = self.process_optimization_results
+
         self.write_log("策略文件加载完成")
 
         self.init_rqdata()
@@ -217,6 +232,18 @@ class BacktesterEngine(BaseEngine):
         """"""
         return self.result_values
 
+    def get_optimization_tasks(self):
+        """
+        Get all optimization tasks saved in result store.
+        """
+        return self.result_store.get_all_tasks()
+
+    def get_optimization_results(self, task: str, target_name: str, count: int = 0):
+        """
+        Get saved results of optimization task sorted by target.
+        """
+        return self.result_store.query_results(task, target_name, count)
+
     def get_default_setting(self, class_name: str):
         """"""
         strategy_class = self.classes[class_name]
@@ -243,7 +270,9 @@ class BacktesterEngine(BaseEngine):
         else:
             self.write_log("开始多进程参数优化")
 
-        self.result_values = None
+        self.result_values = []
+        self.optimization_target = optimization_setting.target_name
+        self.optimization_start = datetime.now()
 
         engine = self.backtesting_engine
         engine.clear_data()
@@ -279,7 +308,16 @@ class BacktesterEngine(BaseEngine):
 
         # Clear thread object handler.
         self.thread = None
-        self.write_log("多进程参数优化完成")
+
+        if use_ga:
+            name = "遗传算法参数优化"
+        else:
+            name = "多进程参数优化"
+
+        if engine.optimization_cancelled:
+            self.write_log(f"{name}已停止")
+        else:
+            self.write_log(f"{name}完成")
 
         # Put optimization done event
         event = Event(EVENT_BACKTESTER_OPTIMIZATION_FINISHED)
@@ -326,6 +364,55 @@ class BacktesterEngine(BaseEngine):
 
         return True
 
+    def stop_optimization(self):
+        """
+        Stop running optimization, results finished are kept.
+        """
+        if not self.thread:
+            return False
+
+        self.backtesting_engine.stop_optimization()
+        self.write_log("正在停止参数优化")
+        return True
+
+    def process_optimization_results(self, results: list, finished: int, total: int):
+        """
+        Callback of finished optimization results, called when each
+        batch of settings is finished.
+        """
+        # Keep results sorted by target, so the best ones can be viewed
+        # before optimization finished
+        self.result_values = sorted(
+            self.result_values + results,
+            reverse=True,
+            key=lambda result: result[1]
+        )
+
+        cost = (datetime.now() - self.optimization_start).total_seconds()
+        speed = finished / cost * 60 if cost else 0
+        if finished:
+            eta = cost / finished * (total - finished)
+        else:
+            eta = 0
+
+        progress = {
+            "finished": finished,
+            "total": total,
+            "speed": speed,
+            "eta": eta,
+            "best": self.result_values[:self.best_count],
+        }
+
+        event = Event(EVENT_BACKTESTER_OPTIMIZATION_PROGRESS, progress)
+        self.event_engine.put(event)
+
+        best = self.result_values[0]
+        self.write_log(
+            f"优化进度：{finished}/{total}，速度：{speed:.1f}次/分钟，"
+            f"剩余时间：{timedelta(seconds=int(eta))}，"
+            f"当前最优：{best[0]}，{self.optimization_target}：{best[1]}"
+        )
+
     def run_downloading(
         self,
         vt_symbol: str,
@@ -7,6 +7,7 @@ from ..engine import (
     EVENT_BACKTESTER_LOG,
     EVENT_BACKTESTER_BACKTESTING_FINISHED,
     EVENT_BACKTESTER_OPTIMIZATION_FINISHED,
+    EVENT_BACKTESTER_OPTIMIZATION_PROGRESS,
     OptimizationSetting
 )
 from vnpy.trader.constant import Interval, Direction
@@ -23,6 +24,7 @@ class BacktesterManager(QtWidgets.QWidget):
     signal_log = QtCore.pyqtSignal(Event)
     signal_backtesting_finished = QtCore.pyqtSignal(Event)
     signal_optimization_finished = QtCore.pyqtSignal(Event)
+    signal_optimization_progress = QtCore.pyqtSignal(Event)
 
     def __init__(self, main_engine: MainEngine, event_engine: EventEngine):
         """"""
@@ -90,6 +92,9 @@ class BacktesterManager(QtWidgets.QWidget):
         optimization_button = QtWidgets.QPushButton("参数优化")
         optimization_button.clicked.connect(self.start_optimization)
 
+        stop_button = QtWidgets.QPushButton("停止优化")
+        stop_button.clicked.connect(self.stop_optimization)
+
         self.result_button = QtWidgets.QPushButton("优化结果")
         self.result_button.clicked.connect(self.show_optimization_result)
         self.result_button.setEnabled(False)
@@ -116,6 +121,7 @@ class BacktesterManager(QtWidgets.QWidget):
         for button in [
             backtesting_button,
             optimization_button,
+            stop_button,
             downloading_button,
             self.result_button,
             self.order_button,
@@ -148,6 +154,7 @@ class BacktesterManager(QtWidgets.QWidget):
         left_vbox.addWidget(self.candle_button)
         left_vbox.addStretch()
         left_vbox.addWidget(optimization_button)
+        left_vbox.addWidget(stop_button)
         left_vbox.addWidget(self.result_button)
 
         # Result part
@@ -199,12 +206,16 @@ class BacktesterManager(QtWidgets.QWidget):
             self.process_backtesting_finished_event)
         self.signal_optimization_finished.connect(
             self.process_optimization_finished_event)
+        self.signal_optimization_progress.connect(
+            self.process_optimization_progress_event)
 
         self.event_engine.register(EVENT_BACKTESTER_LOG, self.signal_log.emit)
         self.event_engine.register(
             EVENT_BACKTESTER_BACKTESTING_FINISHED, self.signal_backtesting_finished.emit)
         self.event_engine.register(
             EVENT_BACKTESTER_OPTIMIZATION_FINISHED, self.signal_optimization_finished.emit)
+        self.event_engine.register(
+            EVENT_BACKTESTER_OPTIMIZATION_PROGRESS, self.signal_optimization_progress.emit)
 
     def process_log_event(self, event: Event):
         """"""
@@ -235,6 +246,12 @@ class BacktesterManager(QtWidgets.QWidget):
         self.write_log("请点击[优化结果]按钮查看")
         self.result_button.setEnabled(True)
 
+    def process_optimization_progress_event(self, event: Event):
+        """
+        Best results so far can be viewed before optimization finished.
+        """
+        self.result_button.setEnabled(True)
+
     def start_backtesting(self):
         """"""
         class_name = self.class_combo.currentText()
@@ -324,6 +341,10 @@ class BacktesterManager(QtWidgets.QWidget):
 
         self.result_button.setEnabled(False)
 
+    def stop_optimization(self):
+        """"""
+        self.backtester_engine.stop_optimization()
+
     def start_downloading(self):
         """"""
         vt_symbol = self.symbol_line.text()
@@ -1,11 +1,12 @@
 from collections import defaultdict
 from datetime import date, datetime, timedelta
-from typing import Callable
+from typing import Callable, Dict, List
 from itertools import product
-from functools import lru_cache
+from functools import lru_cache, partial
 from time import time
 import multiprocessing
 import random
+from queue import Empty, Queue
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -21,18 +22,39 @@ from vnpy.trader.utility import round_to
 
 from .base import (
     BacktestingMode,
+    BarAggregator,
     EngineType,
+    PriceIndex,
     STOPORDER_PREFIX,
     StopOrder,
     StopOrderStatus,
 )
+from .history import HistoryStream, HistoryView, SharedHistory
+from .performance import (
+    DAILY_FIELDS,
+    STATISTICS_FIELDS,
+    calculate_balance,
+    calculate_daily_pnl,
+    calculate_statistics,
+    get_statistics
+)
+from .result_store import OptimizationResultStore, get_setting_key
 from .template import CtaTemplate
 
+DAY_MICROSECONDS = 24 * 60 * 60 * 1_000_000
+
 sns.set_style("whitegrid")
 creator.create("FitnessMax", base.Fitness, weights=(1.0,))
 creator.create("Individual", list, fitness=creator.FitnessMax)
 
 
+class OptimizationCancelled(Exception):
+    """
+    Raised in ga optimization after stop_optimization is called.
+    """
+    pass
+
+
 class OptimizationSetting:
     """
     Setting for runnning optimization.
@@ -126,13 +148,24 @@ class BacktestingEngine:
         self.callback = None
         self.history_data = []
 
+        self.bar_aggregator: BarAggregator = None
+
         self.stop_order_count = 0
         self.stop_orders = {}
         self.active_stop_orders = {}
+        self.stop_indexes = {
+            Direction.LONG: PriceIndex(),
+            Direction.SHORT: PriceIndex(),
+        }
 
         self.limit_order_count = 0
         self.limit_orders = {}
         self.active_limit_orders = {}
+        self.limit_indexes = {
+            Direction.LONG: PriceIndex(),
+            Direction.SHORT: PriceIndex(),
+        }
+        self.submitting_orderids = []       # (sequence, vt_orderid)
 
         self.trade_count = 0
         self.trades = {}
@@ -142,6 +175,12 @@ class BacktestingEngine:
         self.daily_results = {}
         self.daily_df = None
 
+        self.result_store: OptimizationResultStore = None
+
+        self.max_tasks = 0                  # Max batches in pool, 0 for cpu_count * 2
+        self.optimization_callback: Callable = None
+        self.optimization_cancelled = False
+
     def clear_data(self):
         """
         Clear all data of last backtesting.
@@ -150,14 +189,20 @@ class BacktestingEngine:
         self.tick = None
         self.bar = None
         self.datetime = None
+        self.bar_aggregator = None
 
         self.stop_order_count = 0
         self.stop_orders.clear()
         self.active_stop_orders.clear()
+        for index in self.stop_indexes.values():
+            index.clear()
 
         self.limit_order_count = 0
         self.limit_orders.clear()
         self.active_limit_orders.clear()
+        for index in self.limit_indexes.values():
+            index.clear()
+        self.submitting_orderids.clear()
 
         self.trade_count = 0
         self.trades.clear()
@@ -203,84 +248,193 @@ class BacktestingEngine:
     def add_strategy(self, strategy_class: type, setting: dict):
         """"""
         self.strategy_class = strategy_class
+        self.bar_aggregator = None
         self.strategy = strategy_class(
             self, strategy_class.__name__, self.vt_symbol, setting
         )
 
-    def load_data(self):
-        """"""
+    def get_end(self) -> datetime:
+        """
+        Get end of data range, which is current time if end is not set.
+        """
+        return self.end or datetime.now()
+
+    def load_data(self, stream: bool = False, prefetch: int = 2, end: datetime = None):
+        """
+        Load history data of backtesting.
+
+        With stream enabled, history_data is a HistoryStream which loads
+        data in background during replay, keeping at most prefetch chunks
+        ahead in memory instead of the whole data range.
+
+        Data is loaded until end if given, otherwise until get_end().
+        """
         self.output("开始加载历史数据")
 
-        if not self.end:
-            self.end = datetime.now()
+        if not end:
+            end = self.get_end()
 
-        if self.start >= self.end:
+        if self.start >= end:
             self.output("起始日期必须小于结束日期")    
             return        
 
-        self.history_data.clear()       # Clear previously loaded history data
+        # Use history data loaded by parent process if available
+        if shared_history and shared_history.match(
+            self.mode,
+            self.symbol,
+            self.exchange,
+            self.interval,
+            self.start,
+            end
+        ):
+            self.history_data = shared_history.get_view(self.start, end)
+            self.output(f"历史数据加载完成，数据量：{len(self.history_data)}")
+            return
+
+        if stream:
+            self.history_data = HistoryStream(
+                self.get_load_ranges(end),
+                partial(self.load_chunk, cache=False),
+                self.output,
+                prefetch
+            )
+            self.output("历史数据将在回放时分段加载")
+            return
+
+        self.history_data = []          # Clear previously loaded history data
+
+        for chunk_start, chunk_end, progress in self.get_load_ranges(end):
+            data = self.load_chunk(chunk_start, chunk_end)
+            self.history_data.extend(data)
+            
+            progress_bar = "#" * int(progress * 10)
+            self.output(f"加载进度：{progress_bar} [{progress:.0%}]")
+        
+        self.output(f"历史数据加载完成，数据量：{len(self.history_data)}")
+
+    def get_load_ranges(self, range_end: datetime = None) -> List[tuple]:
+        """
+        Split data range into chunks of 30 days to allow for progress
+        update, return list of (start, end, progress).
+        """
+        if not range_end:
+            range_end = self.get_end()
 
-        # Load 30 days of data each time and allow for progress update
         progress_delta = timedelta(days=30)
-        total_delta = self.end - self.start
+        total_delta = range_end - self.start
 
+        ranges = []
         start = self.start
         end = self.start + progress_delta
         progress = 0
 
-        while start < self.end:
-            end = min(end, self.end)  # Make sure end time stays within set range
-            
-            if self.mode == BacktestingMode.BAR:
-                data = load_bar_data(
-                    self.symbol,
-                    self.exchange,
-                    self.interval,
-                    start,
-                    end
-                )
-            else:
-                data = load_tick_data(
-                    self.symbol,
-                    self.exchange,
-                    start,
-                    end
-                )
+        while start < range_end:
+            end = min(end, range_end)  # Make sure end time stays within set range
 
-            self.history_data.extend(data)
-            
             progress += progress_delta / total_delta
             progress = min(progress, 1)
-            progress_bar = "#" * int(progress * 10)
-            self.output(f"加载进度：{progress_bar} [{progress:.0%}]")
-            
+            ranges.append((start, end, progress))
+
             start = end
             end += progress_delta
-        
-        self.output(f"历史数据加载完成，数据量：{len(self.history_data)}")
 
-    def run_backtesting(self):
-        """"""
+        return ranges
+
+    def load_chunk(self, start: datetime, end: datetime, cache: bool = True):
+        """
+        Load history data between start and end from database. Cached
+        loading function is used unless cache is False.
+        """
         if self.mode == BacktestingMode.BAR:
-            func = self.new_bar
+            func = load_bar_data
+            args = (self.symbol, self.exchange, self.interval, start, end)
         else:
-            func = self.new_tick
+            func = load_tick_data
+            args = (self.symbol, self.exchange, start, end)
 
-        self.strategy.on_init()
+        if not cache:
+            func = func.__wrapped__
 
-        # Use the first [days] of history data for initializing strategy
-        day_count = 0
-        ix = 0
-        
-        for ix, data in enumerate(self.history_data):
-            if self.datetime and data.datetime.day != self.datetime.day:
-                day_count += 1
-                if day_count >= self.days:
-                    break
+        return func(*args)
+
+    def run_backtesting(self):
+        """"""
+        self.replay_history([self])
 
-            self.datetime = data.datetime
-            self.callback(data)
+    def run_batch_backtesting(self, settings: List[dict]) -> List["BacktestingEngine"]:
+        """
+        Run backtesting of strategies with different settings in one pass
+        over history data. Each strategy is added into a new engine with
+        its own orders, trades and daily results, which are returned.
+        """
+        engines = []
 
+        for setting in settings:
+            engine = BacktestingEngine()
+            engine.set_parameters(
+                vt_symbol=self.vt_symbol,
+                interval=self.interval,
+                start=self.start,
+                rate=self.rate,
+                slippage=self.slippage,
+                size=self.size,
+                pricetick=self.pricetick,
+                capital=self.capital,
+                end=self.end,
+                mode=self.mode
+            )
+            engine.output = self.output
+            engine.add_strategy(self.strategy_class, setting)
+            engines.append(engine)
+
+        self.replay_history(engines)
+        return engines
+
+    def replay_history(self, engines: List["BacktestingEngine"]):
+        """
+        Feed history data of this engine to strategies of all engines.
+        """
+        for engine in engines:
+            engine.strategy.on_init()
+
+        # Use the first [days] of history data for initializing strategy,
+        # engines still initializing are kept with day count.
+        initing = {engine: 0 for engine in engines}
+        funcs = []
+        data = None
+
+        for data in self.history_data:
+            if initing:
+                for engine, day_count in list(initing.items()):
+                    if engine.datetime and data.datetime.day != engine.datetime.day:
+                        day_count += 1
+                        initing[engine] = day_count
+
+                        if day_count >= engine.days:
+                            initing.pop(engine)
+                            funcs.append(engine.start_replay())
+                            continue
+
+                    engine.datetime = data.datetime
+                    engine.callback(data)
+
+            # Use the rest of history data for running backtesting
+            for func in funcs:
+                func(data)
+
+        # Strategy with all history data used for initializing
+        for engine in initing:
+            func = engine.start_replay()
+            if data:
+                func(data)
+
+        self.output("历史数据回放结束")
+
+    def start_replay(self) -> Callable:
+        """
+        Start strategy after initialized, and return function for
+        replaying history data.
+        """
         self.strategy.inited = True
         self.output("策略初始化完成")
 
@@ -288,11 +442,10 @@ class BacktestingEngine:
         self.strategy.trading = True
         self.output("开始回放历史数据")
 
-        # Use the rest of history data for running backtesting
-        for data in self.history_data[ix:]:
-            func(data)
-
-        self.output("历史数据回放结束")
+        if self.mode == BacktestingMode.BAR:
+            return self.new_bar
+        else:
+            return self.new_tick
 
     def calculate_result(self):
         """"""
@@ -302,32 +455,50 @@ class BacktestingEngine:
             self.output("成交记录为空，无法计算")
             return
 
+        dates = list(self.daily_results.keys())
+        daily_results = list(self.daily_results.values())
+        day_index = {d: ix for ix, d in enumerate(dates)}
+
         # Add trade data into daily reuslt.
-        for trade in self.trades.values():
-            d = trade.datetime.date()
-            daily_result = self.daily_results[d]
-            daily_result.add_trade(trade)
-
-        # Calculate daily result by iteration.
-        pre_close = 0
-        start_pos = 0
-
-        for daily_result in self.daily_results.values():
-            daily_result.calculate_pnl(
-                pre_close, start_pos, self.size, self.rate, self.slippage
-            )
+        for daily_result in daily_results:
+            daily_result.trades = []
 
-            pre_close = daily_result.close_price
-            start_pos = daily_result.end_pos
+        trades = list(self.trades.values())
+        trade_days = []
+        trade_volumes = []
 
-        # Generate dataframe
-        results = defaultdict(list)
+        for trade in trades:
+            ix = day_index[trade.datetime.date()]
+            daily_results[ix].add_trade(trade)
+            trade_days.append(ix)
+
+            if trade.direction == Direction.LONG:
+                trade_volumes.append(trade.volume)
+            else:
+                trade_volumes.append(-trade.volume)
+
+        # Calculate daily result with arrays.
+        arrays = calculate_daily_pnl(
+            np.array([daily_result.close_price for daily_result in daily_results]),
+            np.array(trade_days),
+            np.array([trade.price for trade in trades]),
+            np.array(trade_volumes),
+            self.size,
+            self.rate,
+            self.slippage
+        )
 
-        for daily_result in self.daily_results.values():
-            for key, value in daily_result.__dict__.items():
-                results[key].append(value)
+        columns = [arrays[name].tolist() for name in DAILY_FIELDS]
+        for daily_result, values in zip(daily_results, zip(*columns)):
+            for name, value in zip(DAILY_FIELDS, values):
+                setattr(daily_result, name, value)
 
-        self.daily_df = DataFrame.from_dict(results).set_index("date")
+        # Generate dataframe
+        self.daily_df = DataFrame(arrays, index=dates)
+        self.daily_df.index.name = "date"
+        self.daily_df.insert(
+            2, "trades", [daily_result.trades for daily_result in daily_results]
+        )
 
         self.output("逐日盯市盈亏计算完成")
         return self.daily_df
@@ -343,142 +514,64 @@ class BacktestingEngine:
         # Check for init DataFrame 
         if df is None:
             # Set all statistics to 0 if no trade.
-            start_date = ""
-            end_date = ""
-            total_days = 0
-            profit_days = 0
-            loss_days = 0
-            end_balance = 0
-            max_drawdown = 0
-            max_ddpercent = 0
-            total_net_pnl = 0
-            daily_net_pnl = 0
-            total_commission = 0
-            daily_commission = 0
-            total_slippage = 0
-            daily_slippage = 0
-            total_turnover = 0
-            daily_turnover = 0
-            total_trade_count = 0
-            daily_trade_count = 0
-            total_return = 0
-            annual_return = 0
-            daily_return = 0
-            return_std = 0
-            sharpe_ratio = 0
-            return_drawdown_ratio = 0
+            statistics = create_statistics(
+                "", "", self.capital, dict.fromkeys(STATISTICS_FIELDS, 0)
+            )
         else:
             # Calculate balance related time series data
-            df["balance"] = df["net_pnl"].cumsum() + self.capital
-            df["return"] = np.log(df["balance"] / df["balance"].shift(1)).fillna(0)
-            df["highlevel"] = (
-                df["balance"].rolling(
-                    min_periods=1, window=len(df), center=False).max()
-            )
-            df["drawdown"] = df["balance"] - df["highlevel"]
-            df["ddpercent"] = df["drawdown"] / df["highlevel"] * 100
+            net_pnl = df["net_pnl"].values
+            for key, values in calculate_balance(net_pnl, self.capital).items():
+                df[key] = values
 
             # Calculate statistics value
-            start_date = df.index[0]
-            end_date = df.index[-1]
-
-            total_days = len(df)
-            profit_days = len(df[df["net_pnl"] > 0])
-            loss_days = len(df[df["net_pnl"] < 0])
-
-            end_balance = df["balance"].iloc[-1]
-            max_drawdown = df["drawdown"].min()
-            max_ddpercent = df["ddpercent"].min()
-
-            total_net_pnl = df["net_pnl"].sum()
-            daily_net_pnl = total_net_pnl / total_days
-
-            total_commission = df["commission"].sum()
-            daily_commission = total_commission / total_days
-
-            total_slippage = df["slippage"].sum()
-            daily_slippage = total_slippage / total_days
-
-            total_turnover = df["turnover"].sum()
-            daily_turnover = total_turnover / total_days
-
-            total_trade_count = df["trade_count"].sum()
-            daily_trade_count = total_trade_count / total_days
-
-            total_return = (end_balance / self.capital - 1) * 100
-            annual_return = total_return / total_days * 240
-            daily_return = df["return"].mean() * 100
-            return_std = df["return"].std() * 100
-
-            if return_std:
-                sharpe_ratio = daily_return / return_std * np.sqrt(240)
-            else:
-                sharpe_ratio = 0
-
-            return_drawdown_ratio = -total_return / max_ddpercent
+            result = calculate_statistics(
+                net_pnl,
+                df["commission"].values,
+                df["slippage"].values,
+                df["turnover"].values,
+                df["trade_count"].values,
+                self.capital
+            )
+            statistics = create_statistics(
+                df.index[0], df.index[-1], self.capital, get_statistics(result)
+            )
 
         # Output
         if output:
+            s = statistics
+
             self.output("-" * 30)
-            self.output(f"首个交易日：\t{start_date}")
-            self.output(f"最后交易日：\t{end_date}")
-
-            self.output(f"总交易日：\t{total_days}")
-            self.output(f"盈利交易日：\t{profit_days}")
-            self.output(f"亏损交易日：\t{loss_days}")
-
-            self.output(f"起始资金：\t{self.capital:,.2f}")
-            self.output(f"结束资金：\t{end_balance:,.2f}")
-
-            self.output(f"总收益率：\t{total_return:,.2f}%")
-            self.output(f"年化收益：\t{annual_return:,.2f}%")
-            self.output(f"最大回撤: \t{max_drawdown:,.2f}")
-            self.output(f"百分比最大回撤: {max_ddpercent:,.2f}%")
-
-            self.output(f"总盈亏：\t{total_net_pnl:,.2f}")
-            self.output(f"总手续费：\t{total_commission:,.2f}")
-            self.output(f"总滑点：\t{total_slippage:,.2f}")
-            self.output(f"总成交金额：\t{total_turnover:,.2f}")
-            self.output(f"总成交笔数：\t{total_trade_count}")
-
-            self.output(f"日均盈亏：\t{daily_net_pnl:,.2f}")
-            self.output(f"日均手续费：\t{daily_commission:,.2f}")
-            self.output(f"日均滑点：\t{daily_slippage:,.2f}")
-            self.output(f"日均成交金额：\t{daily_turnover:,.2f}")
-            self.output(f"日均成交笔数：\t{daily_trade_count}")
-
-            self.output(f"日均收益率：\t{daily_return:,.2f}%")
-            self.output(f"收益标准差：\t{return_std:,.2f}%")
-            self.output(f"Sharpe Ratio：\t{sharpe_ratio:,.2f}")
-            self.output(f"收益回撤比：\t{return_drawdown_ratio:,.2f}")
-
-        statistics = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "total_days": total_days,
-            "profit_days": profit_days,
-            "loss_days": loss_days,
-            "capital": self.capital,
-            "end_balance": end_balance,
-            "max_drawdown": max_drawdown,
-            "max_ddpercent": max_ddpercent,
-            "total_net_pnl": total_net_pnl,
-            "daily_net_pnl": daily_net_pnl,
-            "total_commission": total_commission,
-            "daily_commission": daily_commission,
-            "total_slippage": total_slippage,
-            "daily_slippage": daily_slippage,
-            "total_turnover": total_turnover,
-            "daily_turnover": daily_turnover,
-            "total_trade_count": total_trade_count,
-            "daily_trade_count": daily_trade_count,
-            "total_return": total_return,
-            "annual_return": annual_return,
-            "daily_return": daily_return,
-            "return_std": return_std,
-            "sharpe_ratio": sharpe_ratio,
-            "return_drawdown_ratio": return_drawdown_ratio,
-        }
+            self.output(f"首个交易日：\t{s['start_date']}")
+            self.output(f"最后交易日：\t{s['end_date']}")
+
+            self.output(f"总交易日：\t{s['total_days']}")
+            self.output(f"盈利交易日：\t{s['profit_days']}")
+            self.output(f"亏损交易日：\t{s['loss_days']}")
+
+            self.output(f"起始资金：\t{s['capital']:,.2f}")
+            self.output(f"结束资金：\t{s['end_balance']:,.2f}")
+
+            self.output(f"总收益率：\t{s['total_return']:,.2f}%")
+            self.output(f"年化收益：\t{s['annual_return']:,.2f}%")
+            self.output(f"最大回撤: \t{s['max_drawdown']:,.2f}")
+            self.output(f"百分比最大回撤: {s['max_ddpercent']:,.2f}%")
+
+            self.output(f"总盈亏：\t{s['total_net_pnl']:,.2f}")
+            self.output(f"总手续费：\t{s['total_commission']:,.2f}")
+            self.output(f"总滑点：\t{s['total_slippage']:,.2f}")
+            self.output(f"总成交金额：\t{s['total_turnover']:,.2f}")
+            self.output(f"总成交笔数：\t{s['total_trade_count']}")
+
+            self.output(f"日均盈亏：\t{s['daily_net_pnl']:,.2f}")
+            self.output(f"日均手续费：\t{s['daily_commission']:,.2f}")
+            self.output(f"日均滑点：\t{s['daily_slippage']:,.2f}")
+            self.output(f"日均成交金额：\t{s['daily_turnover']:,.2f}")
+            self.output(f"日均成交笔数：\t{s['daily_trade_count']}")
+
+            self.output(f"日均收益率：\t{s['daily_return']:,.2f}%")
+            self.output(f"收益标准差：\t{s['return_std']:,.2f}%")
+            self.output(f"Sharpe Ratio：\t{s['sharpe_ratio']:,.2f}")
+            self.output(f"收益回撤比：\t{s['return_drawdown_ratio']:,.2f}")
 
         return statistics
 
@@ -512,8 +605,16 @@ class BacktestingEngine:
 
         plt.show()
 
-    def run_optimization(self, optimization_setting: OptimizationSetting, output=True):
-        """"""
+    def run_optimization(
+        self,
+        optimization_setting: OptimizationSetting,
+        output=True,
+        batch_size: int = 10
+    ):
+        """
+        Run backtesting of all settings with multiprocessing pool. Each
+        task runs a batch of settings in one pass over history data.
+        """
         # Get optimization setting and target
         settings = optimization_setting.generate_setting()
         target_name = optimization_setting.target_name
@@ -526,33 +627,10 @@ class BacktestingEngine:
             self.output("优化目标未设置，请检查")
             return
 
-        # Use multiprocessing pool for running backtesting with different setting
-        pool = multiprocessing.Pool(multiprocessing.cpu_count())
-
-        results = []
-        for setting in settings:
-            result = (pool.apply_async(optimize, (
-                target_name,
-                self.strategy_class,
-                setting,
-                self.vt_symbol,
-                self.interval,
-                self.start,
-                self.rate,
-                self.slippage,
-                self.size,
-                self.pricetick,
-                self.capital,
-                self.end,
-                self.mode
-            )))
-            results.append(result)
-
-        pool.close()
-        pool.join()
+        self.optimization_cancelled = False
+        result_values = self.run_settings(target_name, settings, batch_size)
 
         # Sort results and output
-        result_values = [result.get() for result in results]
         result_values.sort(reverse=True, key=lambda result: result[1])
 
         if output:
@@ -562,6 +640,530 @@ class BacktestingEngine:
 
         return result_values
 
+    def run_halving_optimization(
+        self,
+        optimization_setting: OptimizationSetting,
+        eta: int = 3,
+        min_fraction: float = 0.1,
+        output=True,
+        batch_size: int = 10
+    ):
+        """
+        Successive halving optimization. All settings are run on a short
+        prefix of history data first, and only the best 1/eta of them are
+        kept for running on a prefix eta times longer, until the rest
+        settings are run on the whole history data.
+        """
+        # Get optimization setting and target
+        settings = optimization_setting.generate_setting()
+        target_name = optimization_setting.target_name
+
+        if not settings:
+            self.output("优化参数组合为空，请检查")
+            return
+
+        if not target_name:
+            self.output("优化目标未设置，请检查")
+            return
+
+        self.optimization_cancelled = False
+
+        # Make sure the last round is run with only a few settings left
+        rounds = max(1, int(np.ceil(np.log(len(settings)) / np.log(eta))))
+        end = self.end
+        total_delta = self.get_end() - self.start
+
+        # End is changed for each round, and restored after optimization
+        try:
+            for i in range(rounds):
+                fraction = max(eta ** (i - rounds + 1), min_fraction)
+                if fraction < 1:
+                    self.end = self.start + total_delta * fraction
+                else:
+                    self.end = end
+
+                self.output(
+                    f"第{i + 1}轮优化，参数组合：{len(settings)}，"
+                    f"数据区间：{self.start} - {self.get_end()}"
+                )
+                result_values = self.run_settings(target_name, settings, batch_size)
+                result_values.sort(reverse=True, key=lambda result: result[1])
+
+                if self.optimization_cancelled:
+                    self.output("参数优化已停止")
+                    break
+
+                # Keep best settings for next round
+                if i < rounds - 1:
+                    count = int(np.ceil(len(result_values) / eta))
+                    setting_map = {str(setting): setting for setting in settings}
+                    settings = [
+                        setting_map[result[0]] for result in result_values[:count]
+                    ]
+        finally:
+            self.end = end
+
+        if output:
+            for value in result_values:
+                msg = f"参数：{value[0]}, 目标：{value[1]}"
+                self.output(msg)
+
+        return result_values
+
+    def run_walk_forward(
+        self,
+        optimization_setting: OptimizationSetting,
+        in_sample_days: int,
+        out_sample_days: int,
+        anchored: bool = False,
+        output=True,
+        batch_size: int = 10
+    ) -> List[dict]:
+        """
+        Walk-forward optimization. Data range is split into windows of
+        in-sample period followed by out-of-sample period, and windows move
+        forward by out-of-sample days. In-sample period has fixed length if
+        rolling, or always begins from start if anchored.
+
+        History data of the whole range is loaded once. In-sample period of
+        each window is optimized by run_settings with window dates as data
+        range, so results are saved into result store with window in task
+        key, then the best setting is backtested in out-of-sample period.
+        Daily results of all out-of-sample periods are stitched into
+        daily_results and daily_df of this engine, for calculate_statistics
+        and show_chart.
+        """
+        # Get optimization setting and target
+        settings = optimization_setting.generate_setting()
+        target_name = optimization_setting.target_name
+
+        if not settings:
+            self.output("优化参数组合为空，请检查")
+            return
+
+        if not target_name:
+            self.output("优化目标未设置，请检查")
+            return
+
+        end = self.get_end()
+
+        windows = self.get_walk_forward_windows(
+            in_sample_days, out_sample_days, anchored, end
+        )
+        if not windows:
+            self.output("数据区间不足，无法进行滚动优化")
+            return
+
+        self.optimization_cancelled = False
+
+        # Load history data once and share it with all worker processes
+        history = self.create_shared_history(end)
+        if self.optimization_cancelled:
+            self.output("滚动优化已停止")
+            return []
+
+        view = history.get_view()
+        timestamps = history.get_arrays()["datetime"]
+
+        setting_map = {str(setting): setting for setting in settings}
+        window_results = []
+        self.daily_results.clear()
+
+        data_start, data_end = self.start, self.end
+
+        for ix, (in_start, in_end, out_start, out_end) in enumerate(windows):
+            self.output(
+                f"第{ix + 1}个窗口样本内优化，参数组合：{len(settings)}，"
+                f"数据区间：{in_start} - {in_end}"
+            )
+
+            # Data range is changed for in-sample period, and restored after
+            self.start, self.end = in_start, in_end
+            try:
+                result_values = self.run_settings(
+                    target_name, settings, batch_size, history
+                )
+            finally:
+                self.start, self.end = data_start, data_end
+
+            # Results of windows finished are kept if stopped
+            if self.optimization_cancelled:
+                self.output("滚动优化已停止")
+                break
+
+            # Run best setting of window in out-of-sample period
+            result_values.sort(reverse=True, key=lambda result: result[1])
+            setting_str, target_value, _ = result_values[0]
+            setting = setting_map[setting_str]
+
+            # Last window includes data at the end of whole range
+            start_ix = history.get_index(out_start, "left")
+            if out_end == end:
+                end_ix = history.get_index(out_end, "right")
+            else:
+                end_ix = history.get_index(out_end, "left")
+
+            engine = self.run_out_of_sample(setting, view, timestamps, start_ix, end_ix)
+            statistics = engine.calculate_statistics(output=False)
+            self.daily_results.update(engine.daily_results)
+
+            window_results.append({
+                "in_sample_start": in_start,
+                "in_sample_end": in_end,
+                "out_sample_start": out_start,
+                "out_sample_end": out_end,
+                "setting": setting,
+                "in_sample_value": target_value,
+                "out_sample_value": statistics[target_name],
+                "statistics": statistics,
+            })
+
+            if output:
+                self.output(
+                    f"窗口：{out_start} - {out_end}，参数：{setting_str}，"
+                    f"样本内目标：{target_value}，样本外目标：{statistics[target_name]}"
+                )
+
+        # Stitch daily results of all out-of-sample periods
+        dates = list(self.daily_results.keys())
+        daily_results = list(self.daily_results.values())
+
+        if dates:
+            self.daily_df = DataFrame(
+                {
+                    name: [getattr(daily_result, name) for daily_result in daily_results]
+                    for name in DAILY_FIELDS
+                },
+                index=dates
+            )
+            self.daily_df.index.name = "date"
+            self.daily_df.insert(
+                2, "trades", [daily_result.trades for daily_result in daily_results]
+            )
+        else:
+            self.daily_df = None
+
+        return window_results
+
+    def get_walk_forward_windows(
+        self,
+        in_sample_days: int,
+        out_sample_days: int,
+        anchored: bool = False,
+        end: datetime = None
+    ) -> List[tuple]:
+        """
+        Get list of (in-sample start, in-sample end, out-of-sample start,
+        out-of-sample end). Out-of-sample periods begin at midnight, so
+        that no date is split between windows.
+        """
+        if not end:
+            end = self.get_end()
+
+        in_sample_delta = timedelta(days=in_sample_days)
+        out_sample_delta = timedelta(days=out_sample_days)
+
+        midnight = self.start.replace(hour=0, minute=0, second=0, microsecond=0)
+        out_start = midnight + in_sample_delta
+
+        windows = []
+
+        while out_start < end:
+            if anchored:
+                in_start = self.start
+            else:
+                in_start = max(self.start, out_start - in_sample_delta)
+
+            out_end = min(out_start + out_sample_delta, end)
+            windows.append((in_start, out_start, out_start, out_end))
+
+            out_start += out_sample_delta
+
+        return windows
+
+    def run_out_of_sample(
+        self,
+        setting: dict,
+        view: HistoryView,
+        timestamps: np.ndarray,
+        start_ix: int,
+        end_ix: int
+    ) -> "BacktestingEngine":
+        """
+        Run backtesting of setting with history data between start_ix and
+        end_ix, with strategy initialized by data of days before start_ix.
+        Initializing never uses data from start_ix, even if there is less
+        data than days needed before it.
+        """
+        engine = BacktestingEngine()
+        engine.set_parameters(
+            vt_symbol=self.vt_symbol,
+            interval=self.interval,
+            start=self.start,
+            rate=self.rate,
+            slippage=self.slippage,
+            size=self.size,
+            pricetick=self.pricetick,
+            capital=self.capital,
+            end=self.end,
+            mode=self.mode
+        )
+        engine.output = self.output
+
+        # Days of data needed are known after on_init called
+        engine.add_strategy(self.strategy_class, setting)
+        engine.strategy.on_init()
+        days = engine.days
+
+        # Index of the first data of each day before start_ix
+        day_numbers = timestamps[:start_ix] // DAY_MICROSECONDS
+        day_starts = np.flatnonzero(np.diff(day_numbers)) + 1
+        if start_ix:
+            day_starts = np.concatenate([[0], day_starts])
+
+        # Only data before out-of-sample period is used for initializing
+        if not days:
+            init_ix = start_ix
+        elif len(day_starts) >= days:
+            init_ix = int(day_starts[-days])
+        else:
+            init_ix = 0
+            self.output(f"样本外回测初始化数据不足：需要{days}天，实际{len(day_starts)}天")
+
+        for data in view[init_ix:start_ix]:
+            engine.datetime = data.datetime
+            engine.callback(data)
+
+        func = engine.start_replay()
+        for data in view[start_ix:end_ix]:
+            func(data)
+
+        engine.calculate_result()
+
+        return engine
+
+    def run_settings(
+        self,
+        target_name: str,
+        settings: List[dict],
+        batch_size: int = 10,
+        history: SharedHistory = None
+    ) -> list:
+        """
+        Get optimization results of settings, from result store if
+        already evaluated, otherwise by running backtesting in pool.
+        History covering the data range can be given to avoid loading.
+        """
+        # Load results of settings already evaluated in previous run
+        result_values = []
+
+        if self.result_store:
+            task = self.get_result_task()
+            saved_results = self.result_store.load_results(task)
+
+            new_settings = []
+            for setting in settings:
+                statistics = saved_results.get(get_setting_key(setting), None)
+                if statistics:
+                    result_values.append((str(setting), statistics[target_name], statistics))
+                else:
+                    new_settings.append(setting)
+
+            self.output(f"读取已完成优化结果：{len(result_values)}")
+            settings = new_settings
+
+        if settings:
+            result_values.extend(
+                self.run_optimization_pool(target_name, settings, batch_size, history)
+            )
+
+        return result_values
+
+    def run_optimization_pool(
+        self,
+        target_name: str,
+        settings: List[dict],
+        batch_size: int,
+        history: SharedHistory = None
+    ) -> list:
+        """
+        Run backtesting of settings in multiprocessing pool.
+
+        Settings are submitted in batches with at most max_tasks batches
+        running or waiting in pool, so memory usage stays bounded with
+        huge number of settings. Results of each finished batch are saved
+        into result store and pushed to optimization_callback, and no more
+        batch is submitted after stop_optimization is called.
+
+        If history is given, it can cover a longer range than start and end
+        of this engine, and workers use the part within data range.
+        """
+        if self.result_store:
+            task = self.get_result_task()
+
+        # Load history data once and share it with all worker processes
+        if not history:
+            history = self.create_shared_history()
+
+            # Stop may be called during loading history data
+            if self.optimization_cancelled:
+                return []
+
+        end = self.end or history.end
+
+        # Make sure every process gets tasks when settings are not enough
+        cpu_count = multiprocessing.cpu_count()
+        batch_size = max(1, min(batch_size, len(settings) // cpu_count))
+        max_tasks = self.max_tasks or cpu_count * 2
+
+        batches = (
+            settings[i:i + batch_size] for i in range(0, len(settings), batch_size)
+        )
+
+        # Use multiprocessing pool for running backtesting with different setting
+        pool = multiprocessing.Pool(
+            cpu_count,
+            initializer=init_shared_history,
+            initargs=(history,)
+        )
+
+        # Results are put into queue by pool thread, and handled here
+        finished_queue = Queue()
+        running_count = 0
+        error = None
+
+        result_values = []
+        total = len(settings)
+
+        while True:
+            # Keep pool busy with limited number of batches
+            while running_count < max_tasks and not self.optimization_cancelled:
+                batch = next(batches, None)
+                if not batch:
+                    break
+
+                pool.apply_async(
+                    optimize_batch,
+                    (
+                        target_name,
+                        self.strategy_class,
+                        batch,
+                        self.vt_symbol,
+                        self.interval,
+                        self.start,
+                        self.rate,
+                        self.slippage,
+                        self.size,
+                        self.pricetick,
+                        self.capital,
+                        end,
+                        self.mode
+                    ),
+                    callback=partial(self.put_finished, finished_queue, batch),
+                    error_callback=partial(self.put_finished, finished_queue, batch)
+                )
+                running_count += 1
+
+            if not running_count:
+                break
+
+            try:
+                batch, results = finished_queue.get(timeout=1)
+            except Empty:
+                if self.optimization_cancelled:
+                    break
+                continue
+
+            running_count -= 1
+
+            if isinstance(results, Exception):
+                error = results
+                break
+
+            result_values.extend(results)
+
+            if self.result_store:
+                self.save_results(task, batch, results)
+
+            if self.optimization_callback:
+                self.optimization_callback(results, len(result_values), total)
+
+        # Kill running tasks if stopped
+        if self.optimization_cancelled or error:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+
+        if error:
+            raise error
+
+        return result_values
+
+    @staticmethod
+    def put_finished(finished_queue: Queue, batch: List[dict], results):
+        """
+        Callback of pool task, called in pool thread.
+        """
+        finished_queue.put((batch, results))
+
+    def stop_optimization(self):
+        """
+        Stop running optimization, results finished are still returned.
+        The flag is reset when next optimization starts.
+        """
+        self.optimization_cancelled = True
+
+    def get_result_task(self) -> str:
+        """
+        Get task key of current strategy class and parameters in result store.
+
+        End is None in task if not set, instead of current time which is
+        different for every run, so that the task can be resumed.
+        """
+        return self.result_store.get_task(
+            self.strategy_class,
+            self.vt_symbol,
+            self.interval.value,
+            self.start,
+            self.end,
+            self.rate,
+            self.slippage,
+            self.size,
+            self.pricetick,
+            self.capital,
+            self.mode.name
+        )
+
+    def save_results(self, task: str, settings: List[dict], results: list):
+        """
+        Save optimization results of settings into result store.
+        """
+        for setting, result in zip(settings, results):
+            self.result_store.save_result(task, setting, result[2])
+
+    def create_shared_history(self, end: datetime = None):
+        """
+        Load history data and copy it into shared memory for optimization.
+        Worker processes should use end of history, which is resolved
+        here if end is not set.
+        """
+        if not end:
+            end = self.get_end()
+
+        self.load_data(end=end)
+
+        history = SharedHistory(
+            self.mode,
+            self.symbol,
+            self.exchange,
+            self.interval,
+            self.start,
+            end,
+            self.history_data
+        )
+        return history
+
     def run_ga_optimization(self, optimization_setting: OptimizationSetting, population_size=100, ngen_size=30, output=True):
         """"""
         # Get optimization setting and target
@@ -590,35 +1192,6 @@ class BacktestingEngine:
                     individual[i] = paramlist[i]
             return individual,
 
-        # Create ga object function
-        global ga_target_name
-        global ga_strategy_class
-        global ga_setting
-        global ga_vt_symbol
-        global ga_interval
-        global ga_start
-        global ga_rate
-        global ga_slippage
-        global ga_size
-        global ga_pricetick
-        global ga_capital
-        global ga_end
-        global ga_mode
-
-        ga_target_name = target_name
-        ga_strategy_class = self.strategy_class
-        ga_setting = settings[0]
-        ga_vt_symbol = self.vt_symbol
-        ga_interval = self.interval
-        ga_start = self.start
-        ga_rate = self.rate
-        ga_slippage = self.slippage
-        ga_size = self.size
-        ga_pricetick = self.pricetick
-        ga_capital = self.capital
-        ga_end = self.end
-        ga_mode = self.mode
-
         # Set up genetic algorithem
         toolbox = base.Toolbox() 
         toolbox.register("individual", tools.initIterate, creator.Individual, generate_parameter)                          
@@ -647,9 +1220,69 @@ class BacktestingEngine:
         stats.register("min", np.min, axis=0)
         stats.register("max", np.max, axis=0)
 
-        # Multiprocessing is not supported yet.
-        # pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        # toolbox.register("map", pool.map)
+        self.optimization_cancelled = False
+
+        # Load history data once and share it with all worker processes
+        history = self.create_shared_history()
+
+        # Ship backtesting parameters to each worker process once
+        parameters = {
+            "strategy_class": self.strategy_class,
+            "vt_symbol": self.vt_symbol,
+            "interval": self.interval,
+            "start": self.start,
+            "rate": self.rate,
+            "slippage": self.slippage,
+            "size": self.size,
+            "pricetick": self.pricetick,
+            "capital": self.capital,
+            "end": history.end,
+            "mode": self.mode,
+        }
+
+        pool = multiprocessing.Pool(
+            multiprocessing.cpu_count(),
+            initializer=init_ga_optimization,
+            initargs=(history, target_name, parameters)
+        )
+
+        # Fitness of evaluated individuals, shared by all worker processes
+        fitness_cache = {}
+
+        if self.result_store:
+            task = self.get_result_task()
+            saved_results = self.result_store.load_results(task)
+
+            for parameter_values in settings:
+                statistics = saved_results.get(get_setting_key(dict(parameter_values)), None)
+                if statistics:
+                    fitness_cache[tuple(parameter_values)] = (statistics[target_name],)
+
+            self.output(f"读取已完成优化结果：{len(fitness_cache)}")
+
+        def map_fitness(func: Callable, individuals: list):
+            """
+            Evaluate individuals not in fitness cache with pool.
+            """
+            keys = [tuple(individual) for individual in individuals]
+            new_keys = [key for key in dict.fromkeys(keys) if key not in fitness_cache]
+
+            # Check stop flag while waiting, so that it is not delayed by a whole generation
+            async_result = pool.map_async(func, new_keys)
+            while not async_result.ready():
+                if self.optimization_cancelled:
+                    raise OptimizationCancelled()
+                async_result.wait(1)
+
+            for key, result in zip(new_keys, async_result.get()):
+                fitness_cache[key] = (result[1],)
+
+                if self.result_store:
+                    self.result_store.save_result(task, dict(key), result[2])
+
+            return [fitness_cache[key] for key in keys]
+
+        toolbox.register("map", map_fitness)
 
         # Run ga optimization
         self.output(f"参数优化空间：{total_size}")
@@ -661,29 +1294,42 @@ class BacktestingEngine:
 
         start = time()
 
-        algorithms.eaMuPlusLambda(
-            pop, 
-            toolbox, 
-            mu, 
-            lambda_, 
-            cxpb, 
-            mutpb, 
-            ngen, 
-            stats,
-            halloffame=hof
-        )    
+        try:
+            algorithms.eaMuPlusLambda(
+                pop, 
+                toolbox, 
+                mu, 
+                lambda_, 
+                cxpb, 
+                mutpb, 
+                ngen, 
+                stats,
+                halloffame=hof
+            )    
+        except OptimizationCancelled:
+            pass
+        finally:
+            if self.optimization_cancelled:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
         
         end = time()
         cost = int((end - start))
 
-        self.output(f"遗传算法优化完成，耗时{cost}秒")
+        # Best settings of generations finished are returned if stopped
+        if self.optimization_cancelled:
+            self.output(f"遗传算法优化已停止，耗时{cost}秒")
+        else:
+            self.output(f"遗传算法优化完成，耗时{cost}秒")
         
         # Return result list
         results = []
 
         for parameter_values in hof:
             setting = dict(parameter_values)
-            target_value = ga_optimize(parameter_values)[0]
+            target_value = fitness_cache[tuple(parameter_values)][0]
             results.append((setting, target_value, {}))
         
         return results
@@ -705,7 +1351,11 @@ class BacktestingEngine:
 
         self.cross_limit_order()
         self.cross_stop_order()
-        self.strategy.on_bar(bar)
+
+        if self.bar_aggregator:
+            self.bar_aggregator.update_bar(bar)
+        else:
+            self.strategy.on_bar(bar)
 
         self.update_daily_close(bar.close_price)
 
@@ -716,6 +1366,9 @@ class BacktestingEngine:
 
         self.cross_limit_order()
         self.cross_stop_order()
+
+        if self.bar_aggregator:
+            self.bar_aggregator.update_tick(tick)
         self.strategy.on_tick(tick)
 
         self.update_daily_close(tick.last_price)
@@ -735,7 +1388,23 @@ class BacktestingEngine:
             long_best_price = long_cross_price
             short_best_price = short_cross_price
 
-        for order in list(self.active_limit_orders.values()):
+        # Only visit orders submitted since last data and orders crossed
+        # by price, in the same order as they were sent.
+        orderids = dict(self.submitting_orderids)
+        self.submitting_orderids = []
+
+        if long_cross_price > 0:
+            orderids.update(self.limit_indexes[Direction.LONG].get_above(long_cross_price))
+
+        if short_cross_price > 0:
+            orderids.update(self.limit_indexes[Direction.SHORT].get_below(short_cross_price))
+
+        for sequence in sorted(orderids):
+            # Skip order cancelled by strategy callback of previous order
+            order = self.active_limit_orders.get(orderids[sequence], None)
+            if not order:
+                continue
+
             # Push order update with status "not traded" (pending).
             if order.status == Status.SUBMITTING:
                 order.status = Status.NOTTRADED
@@ -763,6 +1432,7 @@ class BacktestingEngine:
             self.strategy.on_order(order)
 
             self.active_limit_orders.pop(order.vt_orderid)
+            self.limit_indexes[order.direction].remove(order.price, order.vt_orderid)
 
             # Push trade update
             self.trade_count += 1
@@ -808,7 +1478,17 @@ class BacktestingEngine:
             long_best_price = long_cross_price
             short_best_price = short_cross_price
 
-        for stop_order in list(self.active_stop_orders.values()):
+        # Only visit stop orders crossed by price, in the same order as
+        # they were sent.
+        stop_orderids = dict(self.stop_indexes[Direction.LONG].get_below(long_cross_price))
+        stop_orderids.update(self.stop_indexes[Direction.SHORT].get_above(short_cross_price))
+
+        for sequence in sorted(stop_orderids):
+            # Skip stop order cancelled by strategy callback of previous order
+            stop_order = self.active_stop_orders.get(stop_orderids[sequence], None)
+            if not stop_order:
+                continue
+
             # Check whether stop order can be triggered.
             long_cross = (
                 stop_order.direction == Direction.LONG 
@@ -872,6 +1552,9 @@ class BacktestingEngine:
             stop_order.status = StopOrderStatus.TRIGGERED
 
             self.active_stop_orders.pop(stop_order.stop_orderid)
+            self.stop_indexes[stop_order.direction].remove(
+                stop_order.price, stop_order.stop_orderid
+            )
 
             # Push update to strategy.
             self.strategy.on_stop_order(stop_order)
@@ -892,6 +1575,25 @@ class BacktestingEngine:
         self.days = days
         self.callback = callback
 
+    def subscribe_bar(
+        self,
+        strategy: CtaTemplate,
+        window: int = 0,
+        on_window_bar: Callable = None,
+        interval: Interval = Interval.MINUTE
+    ):
+        """
+        Subscribe bar data generated in the same way as CtaEngine.
+        """
+        if not self.bar_aggregator:
+            self.bar_aggregator = BarAggregator(self.push_bar)
+
+        self.bar_aggregator.subscribe(strategy, window, on_window_bar, interval)
+
+    def push_bar(self, strategy: CtaTemplate, func: Callable, bar: BarData):
+        """"""
+        func(bar)
+
     def send_order(
         self,
         strategy: CtaTemplate,
@@ -932,6 +1634,9 @@ class BacktestingEngine:
 
         self.active_stop_orders[stop_order.stop_orderid] = stop_order
         self.stop_orders[stop_order.stop_orderid] = stop_order
+        self.stop_indexes[direction].add(
+            price, self.stop_order_count, stop_order.stop_orderid
+        )
 
         return stop_order.stop_orderid
 
@@ -960,6 +1665,10 @@ class BacktestingEngine:
 
         self.active_limit_orders[order.vt_orderid] = order
         self.limit_orders[order.vt_orderid] = order
+        self.limit_indexes[direction].add(
+            price, self.limit_order_count, order.vt_orderid
+        )
+        self.submitting_orderids.append((self.limit_order_count, order.vt_orderid))
 
         return order.vt_orderid
 
@@ -977,6 +1686,7 @@ class BacktestingEngine:
         if vt_orderid not in self.active_stop_orders:
             return
         stop_order = self.active_stop_orders.pop(vt_orderid)
+        self.stop_indexes[stop_order.direction].remove(stop_order.price, vt_orderid)
 
         stop_order.status = StopOrderStatus.CANCELLED
         self.strategy.on_stop_order(stop_order)
@@ -986,6 +1696,7 @@ class BacktestingEngine:
         if vt_orderid not in self.active_limit_orders:
             return
         order = self.active_limit_orders.pop(vt_orderid)
+        self.limit_indexes[order.direction].remove(order.price, vt_orderid)
 
         order.status = Status.CANCELLED
         self.strategy.on_order(order)
@@ -1126,6 +1837,14 @@ class DailyResult:
         self.net_pnl = self.total_pnl - self.commission - self.slippage
 
 
+def init_shared_history(history: SharedHistory):
+    """
+    Initializer of multiprocessing.pool worker for receiving history data.
+    """
+    global shared_history
+    shared_history = history
+
+
 def optimize(
     target_name: str,
     strategy_class: CtaTemplate,
@@ -1169,32 +1888,144 @@ def optimize(
     return (str(setting), target_value, statistics)
 
 
-@lru_cache(maxsize=1000000)
-def _ga_optimize(parameter_values: tuple):
-    """"""
-    setting = dict(parameter_values)
-
-    result = optimize(
-        ga_target_name,
-        ga_strategy_class,
-        setting,
-        ga_vt_symbol,
-        ga_interval,
-        ga_start,
-        ga_rate,
-        ga_slippage,
-        ga_size,
-        ga_pricetick,
-        ga_capital,
-        ga_end,
-        ga_mode
+def init_ga_optimization(
+    history: SharedHistory,
+    target_name: str,
+    parameters: dict
+):
+    """
+    Initializer of multiprocessing.pool worker for ga optimization.
+    """
+    global ga_target_name
+    global ga_parameters
+
+    ga_target_name = target_name
+    ga_parameters = parameters
+
+    init_shared_history(history)
+
+
+def ga_optimize(parameter_values: tuple):
+    """
+    Function for evaluating fitness in multiprocessing.pool
+    """
+    return optimize(
+        target_name=ga_target_name,
+        setting=dict(parameter_values),
+        **ga_parameters
     )
-    return (result[1],)
 
 
-def ga_optimize(parameter_values: list):
-    """"""
-    return _ga_optimize(tuple(parameter_values))
+def optimize_batch(
+    target_name: str,
+    strategy_class: CtaTemplate,
+    settings: List[dict],
+    vt_symbol: str,
+    interval: Interval,
+    start: datetime,
+    rate: float,
+    slippage: float,
+    size: float,
+    pricetick: float,
+    capital: int,
+    end: datetime,
+    mode: BacktestingMode
+):
+    """
+    Function for running a batch of settings in multiprocessing.pool
+    """
+    engine = BacktestingEngine()
+
+    engine.set_parameters(
+        vt_symbol=vt_symbol,
+        interval=interval,
+        start=start,
+        rate=rate,
+        slippage=slippage,
+        size=size,
+        pricetick=pricetick,
+        capital=capital,
+        end=end,
+        mode=mode
+    )
+    engine.strategy_class = strategy_class
+
+    engine.load_data()
+    engines = engine.run_batch_backtesting(settings)
+    statistics_list = calculate_batch_statistics(engines)
+
+    results = []
+    for setting, statistics in zip(settings, statistics_list):
+        target_value = statistics[target_name]
+        results.append((str(setting), target_value, statistics))
+
+    return results
+
+
+def create_statistics(
+    start_date: date,
+    end_date: date,
+    capital: float,
+    values: Dict[str, float]
+) -> dict:
+    """
+    Create statistics dict of one backtesting, shared by single and batch
+    calculation so that both give the same keys and value types.
+    """
+    statistics = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "capital": capital,
+    }
+    statistics.update(values)
+    return statistics
+
+
+def calculate_batch_statistics(engines: List[BacktestingEngine]) -> List[dict]:
+    """
+    Calculate statistics of engines run on the same history data, with
+    daily net pnl of all engines stacked into 2-D arrays and calculated
+    by one call.
+    """
+    for engine in engines:
+        engine.calculate_result()
+
+    # Engines with the same days of daily result are calculated together,
+    # engine without trade gets statistics of all 0 later.
+    groups = defaultdict(list)
+    for engine in engines:
+        df = engine.daily_df
+        if df is not None:
+            groups[(df.index[0], len(df))].append(engine)
+
+    statistics_map = {}
+
+    for group in groups.values():
+        dfs = [engine.daily_df for engine in group]
+        capital = group[0].capital
+
+        result = calculate_statistics(
+            np.vstack([df["net_pnl"].values for df in dfs]),
+            np.vstack([df["commission"].values for df in dfs]),
+            np.vstack([df["slippage"].values for df in dfs]),
+            np.vstack([df["turnover"].values for df in dfs]),
+            np.vstack([df["trade_count"].values for df in dfs]),
+            capital
+        )
+
+        for ix, (engine, df) in enumerate(zip(group, dfs)):
+            statistics_map[engine] = create_statistics(
+                df.index[0], df.index[-1], capital, get_statistics(result, ix)
+            )
+
+    statistics_list = []
+    for engine in engines:
+        statistics = statistics_map.get(engine, None)
+        if not statistics:
+            statistics = engine.calculate_statistics(output=False)
+        statistics_list.append(statistics)
+
+    return statistics_list
 
 
 @lru_cache(maxsize=999)
@@ -1224,17 +2055,9 @@ def load_tick_data(
     )
 
 
+# History data shared by parent process
+shared_history = None
+
 # GA related global value
-ga_end = None
-ga_mode = None
 ga_target_name = None
-ga_strategy_class = None
-ga_setting = None
-ga_vt_symbol = None
-ga_interval = None
-ga_start = None
-ga_rate = None
-ga_slippage = None
-ga_size = None
-ga_pricetick = None
-ga_capital = None
+ga_parameters = None
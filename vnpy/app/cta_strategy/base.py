@@ -2,10 +2,17 @@
 Defines constants and objects used in CtaStrategy App.
 """
 
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from copy import copy
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import partial
+from typing import Any, Callable
 
-from vnpy.trader.constant import Direction, Offset
+from vnpy.trader.constant import Direction, Interval, Offset
+from vnpy.trader.object import BarData, TickData
+from vnpy.trader.utility import BarGenerator
 
 APP_NAME = "CtaStrategy"
 STOPORDER_PREFIX = "STOP"
@@ -41,6 +48,178 @@ class StopOrder:
     status: StopOrderStatus = StopOrderStatus.WAITING
 
 
+class PriceIndex:
+    """
+    Orders of one direction sorted by price and then by sequence number,
+    for finding orders crossed by market price without visiting others.
+    """
+
+    def __init__(self):
+        """"""
+        self.items = []     # (price, sequence, orderid)
+
+    def __len__(self):
+        """"""
+        return len(self.items)
+
+    def add(self, price: float, sequence: int, orderid: str):
+        """"""
+        insort(self.items, (price, sequence, orderid))
+
+    def remove(self, price: float, orderid: str):
+        """"""
+        ix = bisect_left(self.items, (price,))
+
+        while ix < len(self.items) and self.items[ix][0] == price:
+            if self.items[ix][2] == orderid:
+                del self.items[ix]
+                return
+            ix += 1
+
+    def get_above(self, price: float) -> list:
+        """
+        Get (sequence, orderid) of orders with price >= given price.
+        """
+        ix = bisect_left(self.items, (price,))
+        return [item[1:] for item in self.items[ix:]]
+
+    def get_below(self, price: float) -> list:
+        """
+        Get (sequence, orderid) of orders with price <= given price.
+        """
+        ix = bisect_right(self.items, (price, float("inf")))
+        return [item[1:] for item in self.items[:ix]]
+
+    def clear(self):
+        """"""
+        self.items.clear()
+
+
+class BarAggregator:
+    """
+    Bar generators of one symbol shared by all strategies subscribed.
+
+    1 minute bar is generated from tick data (or given directly) once, and
+    pushed to on_bar of every strategy. x minute/hour bar is generated
+    from 1 minute bar once for each (interval, window), and pushed to
+    on_window_bar of strategies subscribed.
+
+    Window bars finished by a 1 minute bar are pushed before the 1 minute
+    bar itself, the same as a strategy calling update_bar of its own
+    window generator at the beginning of on_bar. Bar objects are shared
+    between strategies and should not be modified.
+
+    History bars replayed by load_bar of a strategy go through a separate
+    aggregator of the strategy. When the first live bar arrives, window
+    generators not started yet are seeded with the state of history
+    aggregators, so that the first live window bar continues the window
+    unfinished in history, just like a BarGenerator of the strategy fed
+    with both history and live bars. Generators already running (shared
+    with strategies started before) are not seeded again.
+    """
+
+    def __init__(self, push_func: Callable):
+        """
+        push_func(strategy, callback, bar) is called for pushing bar.
+        """
+        self.push_func = push_func
+
+        self.strategies = []
+        self.minute_generator = BarGenerator(self.update_bar)
+        self.window_generators = {}                 # (interval, window): generator
+        self.window_callbacks = defaultdict(list)   # (interval, window): [(strategy, callback)]
+        self.unseeded = set()                       # (interval, window) of generators not started
+
+    def subscribe(
+        self,
+        strategy: Any,
+        window: int = 0,
+        on_window_bar: Callable = None,
+        interval: Interval = Interval.MINUTE
+    ):
+        """"""
+        if strategy not in self.strategies:
+            self.strategies.append(strategy)
+
+        if not window:
+            return
+
+        key = (interval, window)
+        if key not in self.window_generators:
+            self.window_generators[key] = BarGenerator(
+                None, window, partial(self.push_window_bar, key), interval
+            )
+            self.unseeded.add(key)
+
+        self.window_callbacks[key].append((strategy, on_window_bar))
+
+    def unsubscribe(self, strategy: Any):
+        """
+        Remove all subscription of strategy, and generators not used.
+        """
+        if strategy in self.strategies:
+            self.strategies.remove(strategy)
+
+        for key, callbacks in list(self.window_callbacks.items()):
+            callbacks[:] = [c for c in callbacks if c[0] is not strategy]
+
+            if not callbacks:
+                self.window_callbacks.pop(key)
+                self.window_generators.pop(key)
+                self.unseeded.discard(key)
+
+    def update_tick(self, tick: TickData):
+        """"""
+        self.minute_generator.update_tick(tick)
+
+    def update_bar(self, bar: BarData):
+        """
+        Update 1 minute bar into window generators, and push it.
+        """
+        if self.unseeded:
+            self.seed_generators()
+
+        for generator in list(self.window_generators.values()):
+            generator.update_bar(bar)
+
+        for strategy in list(self.strategies):
+            self.push_func(strategy, strategy.on_bar, bar)
+
+    def seed_generators(self):
+        """
+        Copy state of window generators from history aggregator of
+        strategies, using the one with the latest history bar.
+        """
+        for key in self.unseeded:
+            generator = self.window_generators[key]
+            source = None
+
+            for strategy in self.strategies:
+                history = getattr(strategy, "history_aggregator", None)
+                if not history or history is self:
+                    continue
+
+                candidate = history.window_generators.get(key, None)
+                if not candidate or not candidate.last_bar:
+                    continue
+
+                if not source or candidate.last_bar.datetime > source.last_bar.datetime:
+                    source = candidate
+
+            if source:
+                generator.window_bar = copy(source.window_bar)
+                generator.last_bar = source.last_bar
+                generator.interval_count = source.interval_count
+
+        self.unseeded.clear()
+
+    def push_window_bar(self, key: tuple, bar: BarData):
+        """"""
+        for strategy, callback in list(self.window_callbacks.get(key, [])):
+            self.push_func(strategy, callback, bar)
+
+
 EVENT_CTA_LOG = "eCtaLog"
 EVENT_CTA_STRATEGY = "eCtaStrategy"
 EVENT_CTA_STOPORDER = "eCtaStopOrder"
+EVENT_CTA_SHARD = "eCtaShard"
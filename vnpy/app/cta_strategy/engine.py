@@ -7,7 +7,7 @@ from collections import defaultdict
 from pathlib import Path
 from typing import Any, Callable
 from datetime import datetime, timedelta
-from threading import Thread
+from threading import Lock, Thread
 from queue import Queue
 from copy import copy
 
@@ -42,16 +42,21 @@ from vnpy.trader.rqdata import rqdata_client
 
 from .base import (
     APP_NAME,
+    BarAggregator,
     EVENT_CTA_LOG,
     EVENT_CTA_STRATEGY,
     EVENT_CTA_STOPORDER,
+    EVENT_CTA_SHARD,
     EngineType,
+    PriceIndex,
     StopOrder,
     StopOrderStatus,
     STOPORDER_PREFIX
 )
 from .template import CtaTemplate
 from .converter import OffsetConverter
+from .journal import DataJournal
+from .shard import StrategyProxy, StrategyShard, get_shard_index
 
 
 STOP_STATUS_MAP = {
@@ -79,6 +84,7 @@ class CtaEngine(BaseEngine):
 
         self.strategy_setting = {}  # strategy_name: dict
         self.strategy_data = {}     # strategy_name: dict
+        self.data_journal = DataJournal(self.data_filename)
 
         self.classes = {}           # class_name: stategy_class
         self.strategies = {}        # strategy_name: strategy
@@ -91,10 +97,21 @@ class CtaEngine(BaseEngine):
 
         self.stop_order_count = 0   # for generating stop_orderid
         self.stop_orders = {}       # stop_orderid: stop_order
+        self.stop_indexes = defaultdict(
+            lambda: {Direction.LONG: PriceIndex(), Direction.SHORT: PriceIndex()}
+        )                           # vt_symbol: direction: price index
+
+        self.bar_aggregators = {}   # vt_symbol: bar_aggregator
+
+        self.shard_count = 0        # processes running strategies, 0 for running in engine
+        self.shards = {}            # shard index: shard
 
         self.init_thread = None
         self.init_queue = Queue()
 
+        self.history_cache = None   # (vt_symbol, interval, days): bars, during init
+        self.history_lock = Lock()  # for querying history one at a time
+
         self.rq_client = None
         self.rq_symbols = set()
 
@@ -116,12 +133,19 @@ class CtaEngine(BaseEngine):
         """"""
         self.stop_all_strategies()
 
+        for shard in self.shards.values():
+            shard.close()
+        self.shards.clear()
+
+        self.data_journal.close()
+
     def register_event(self):
         """"""
         self.event_engine.register(EVENT_TICK, self.process_tick_event)
         self.event_engine.register(EVENT_ORDER, self.process_order_event)
         self.event_engine.register(EVENT_TRADE, self.process_trade_event)
         self.event_engine.register(EVENT_POSITION, self.process_position_event)
+        self.event_engine.register(EVENT_CTA_SHARD, self.process_shard_event)
 
     def init_rqdata(self):
         """
@@ -157,10 +181,22 @@ class CtaEngine(BaseEngine):
 
         self.check_stop_order(tick)
 
+        aggregator = self.bar_aggregators.get(tick.vt_symbol, None)
+        if aggregator:
+            aggregator.update_tick(tick)
+
+        # Tick is sent once to every shard running strategies of the symbol
+        shards = set()
+
         for strategy in strategies:
-            if strategy.inited:
+            if isinstance(strategy, StrategyProxy):
+                shards.add(strategy.shard)
+            elif strategy.inited:
                 self.call_strategy_func(strategy, strategy.on_tick, tick)
 
+        for shard in shards:
+            shard.send(("tick", tick))
+
     def process_order_event(self, event: Event):
         """"""
         order = event.data
@@ -229,10 +265,53 @@ class CtaEngine(BaseEngine):
 
         self.offset_converter.update_position(position)
 
+    def process_shard_event(self, event: Event):
+        """
+        Process order request from strategy running in shard.
+        """
+        shard, msg = event.data
+        shard.process_order_request(msg)
+
+    def set_shard_count(self, shard_count: int) -> bool:
+        """
+        Set number of processes running strategies, which can only be
+        changed before any strategy is added.
+        """
+        if self.strategies:
+            self.write_log("已有策略存在，无法修改策略进程数量")
+            return False
+
+        self.shard_count = shard_count
+        return True
+
+    def get_shard(self, vt_symbol: str):
+        """
+        Get shard process for running strategies of vt_symbol.
+        """
+        index = get_shard_index(vt_symbol, self.shard_count)
+
+        shard = self.shards.get(index, None)
+        if not shard:
+            shard = StrategyShard(self, index)
+            self.shards[index] = shard
+
+        return shard
+
     def check_stop_order(self, tick: TickData):
         """"""
-        for stop_order in list(self.stop_orders.values()):
-            if stop_order.vt_symbol != tick.vt_symbol:
+        indexes = self.stop_indexes.get(tick.vt_symbol, None)
+        if not indexes:
+            return
+
+        # Only visit stop orders of the symbol triggered by last price,
+        # in the same order as they were sent.
+        stop_orderids = dict(indexes[Direction.LONG].get_below(tick.last_price))
+        stop_orderids.update(indexes[Direction.SHORT].get_above(tick.last_price))
+
+        for sequence in sorted(stop_orderids):
+            # Skip stop order cancelled by strategy callback of previous order
+            stop_order = self.stop_orders.get(stop_orderids[sequence], None)
+            if not stop_order:
                 continue
 
             long_triggered = (
@@ -275,6 +354,7 @@ class CtaEngine(BaseEngine):
                 if vt_orderids:
                     # Remove from relation map.
                     self.stop_orders.pop(stop_order.stop_orderid)
+                    self.remove_stop_index(stop_order)
 
                     strategy_vt_orderids = self.strategy_orderid_map[strategy.strategy_name]
                     if stop_order.stop_orderid in strategy_vt_orderids:
@@ -289,6 +369,13 @@ class CtaEngine(BaseEngine):
                     )
                     self.put_stop_order_event(stop_order)
 
+    def remove_stop_index(self, stop_order: StopOrder):
+        """
+        Remove stop order from price index of its symbol.
+        """
+        index = self.stop_indexes[stop_order.vt_symbol][stop_order.direction]
+        index.remove(stop_order.price, stop_order.stop_orderid)
+
     def send_server_order(
         self,
         strategy: CtaTemplate,
@@ -411,6 +498,9 @@ class CtaEngine(BaseEngine):
         )
 
         self.stop_orders[stop_orderid] = stop_order
+        self.stop_indexes[stop_order.vt_symbol][direction].add(
+            price, self.stop_order_count, stop_orderid
+        )
 
         vt_orderids = self.strategy_orderid_map[strategy.strategy_name]
         vt_orderids.add(stop_orderid)
@@ -443,6 +533,7 @@ class CtaEngine(BaseEngine):
 
         # Remove from relation map.
         self.stop_orders.pop(stop_orderid)
+        self.remove_stop_index(stop_order)
 
         vt_orderids = self.strategy_orderid_map[strategy.strategy_name]
         if stop_orderid in vt_orderids:
@@ -513,6 +604,36 @@ class CtaEngine(BaseEngine):
         interval: Interval,
         callback: Callable[[BarData], None]
     ):
+        """"""
+        bars = self.get_history_bars(vt_symbol, days, interval)
+
+        for bar in bars:
+            callback(bar)
+
+    def get_history_bars(self, vt_symbol: str, days: int, interval: Interval):
+        """
+        Get bars of history days. During strategy init, bars are cached by
+        (vt_symbol, interval, days) and shared by strategies initialized
+        together, so that the same history is only queried once.
+
+        Queries are made one at a time, since RQData client and database
+        connection are not safe to use from multiple threads. Every caller
+        gets its own copy of cached bars.
+        """
+        with self.history_lock:
+            cache = self.history_cache
+            if cache is None:
+                return self.query_history_bars(vt_symbol, days, interval)
+
+            key = (vt_symbol, interval, days)
+            bars = cache.get(key, None)
+            if bars is None:
+                bars = self.query_history_bars(vt_symbol, days, interval)
+                cache[key] = bars
+
+        return [copy(bar) for bar in bars]
+
+    def query_history_bars(self, vt_symbol: str, days: int, interval: Interval):
         """"""
         symbol, exchange = extract_vt_symbol(vt_symbol)
         end = datetime.now()
@@ -529,8 +650,7 @@ class CtaEngine(BaseEngine):
                 end=end,
             )
 
-        for bar in bars:
-            callback(bar)
+        return bars
 
     def load_tick(
         self, 
@@ -553,6 +673,31 @@ class CtaEngine(BaseEngine):
         for tick in ticks:
             callback(tick)
 
+    def subscribe_bar(
+        self,
+        strategy: CtaTemplate,
+        window: int = 0,
+        on_window_bar: Callable = None,
+        interval: Interval = Interval.MINUTE
+    ):
+        """
+        Subscribe bar data generated from tick data, generators are
+        shared by all strategies of the same vt_symbol.
+        """
+        aggregator = self.bar_aggregators.get(strategy.vt_symbol, None)
+        if not aggregator:
+            aggregator = BarAggregator(self.push_bar)
+            self.bar_aggregators[strategy.vt_symbol] = aggregator
+
+        aggregator.subscribe(strategy, window, on_window_bar, interval)
+
+    def push_bar(self, strategy: CtaTemplate, func: Callable, bar: BarData):
+        """
+        Push bar generated to strategy after inited.
+        """
+        if strategy.inited:
+            self.call_strategy_func(strategy, func, bar)
+
     def call_strategy_func(
         self, strategy: CtaTemplate, func: Callable, params: Any = None
     ):
@@ -586,7 +731,11 @@ class CtaEngine(BaseEngine):
             self.write_log(f"创建策略失败，找不到策略类{class_name}")
             return
 
-        strategy = strategy_class(self, strategy_name, vt_symbol, setting)
+        if self.shard_count:
+            shard = self.get_shard(vt_symbol)
+            strategy = shard.add_strategy(strategy_class, strategy_name, vt_symbol, setting)
+        else:
+            strategy = strategy_class(self, strategy_name, vt_symbol, setting)
         self.strategies[strategy_name] = strategy
 
         # Add vt_symbol to strategy map.
@@ -611,44 +760,91 @@ class CtaEngine(BaseEngine):
     def _init_strategy(self):
         """
         Init strategies in queue.
+
+        History bars are loaded once for strategies of the same vt_symbol,
+        interval and days. on_init of strategies in engine is called one by
+        one in this thread, since replaying history is CPU bound and gains
+        nothing from more threads. Strategies in shard processes are inited
+        with one thread for each shard, which only waits for its process.
         """
+        self.history_cache = {}
+
         while not self.init_queue.empty():
-            strategy_name = self.init_queue.get()
-            strategy = self.strategies[strategy_name]
+            strategy_names = set()
+            local_names = []
+            shard_names = defaultdict(list)     # shard: [strategy_name]
 
-            if strategy.inited:
-                self.write_log(f"{strategy_name}已经完成初始化，禁止重复操作")
-                continue
+            while not self.init_queue.empty():
+                strategy_name = self.init_queue.get()
+                strategy = self.strategies[strategy_name]
 
-            self.write_log(f"{strategy_name}开始执行初始化")
+                if strategy.inited or strategy_name in strategy_names:
+                    self.write_log(f"{strategy_name}已经完成初始化，禁止重复操作")
+                    continue
 
-            # Call on_init function of strategy
-            self.call_strategy_func(strategy, strategy.on_init)
+                self.write_log(f"{strategy_name}开始执行初始化")
+                strategy_names.add(strategy_name)
 
-            # Restore strategy data(variables)
-            data = self.strategy_data.get(strategy_name, None)
-            if data:
-                for name in strategy.variables:
-                    value = data.get(name, None)
-                    if value:
-                        setattr(strategy, name, value)
-
-            # Subscribe market data
-            contract = self.main_engine.get_contract(strategy.vt_symbol)
-            if contract:
-                req = SubscribeRequest(
-                    symbol=contract.symbol, exchange=contract.exchange)
-                self.main_engine.subscribe(req, contract.gateway_name)
-            else:
-                self.write_log(f"行情订阅失败，找不到合约{strategy.vt_symbol}", strategy)
+                if isinstance(strategy, StrategyProxy):
+                    shard_names[strategy.shard].append(strategy_name)
+                else:
+                    local_names.append(strategy_name)
 
-            # Put event to update init completed status.
-            strategy.inited = True
-            self.put_strategy_event(strategy)
-            self.write_log(f"{strategy_name}初始化完成")
-        
+            # Strategies in shard are finished in this thread after on_init returns
+            finished = Queue()
+            for names in shard_names.values():
+                thread = Thread(target=self.call_init_funcs, args=(names, finished))
+                thread.start()
+
+            for strategy_name in local_names:
+                strategy = self.strategies[strategy_name]
+                self.call_strategy_func(strategy, strategy.on_init)
+                self.finish_init_strategy(strategy_name)
+
+            for _ in range(len(strategy_names) - len(local_names)):
+                self.finish_init_strategy(finished.get())
+
+        self.history_cache = None
         self.init_thread = None
 
+    def call_init_funcs(self, strategy_names: list, finished: Queue):
+        """
+        Call on_init of strategies in the same shard one by one, and put
+        name of strategy into finished queue after its on_init returns.
+        """
+        for strategy_name in strategy_names:
+            strategy = self.strategies[strategy_name]
+            self.call_strategy_func(strategy, strategy.on_init)
+            finished.put(strategy_name)
+
+    def finish_init_strategy(self, strategy_name: str):
+        """
+        Restore data and subscribe market data after on_init called.
+        """
+        strategy = self.strategies[strategy_name]
+
+        # Restore strategy data(variables)
+        data = self.strategy_data.get(strategy_name, None)
+        if data:
+            for name in strategy.variables:
+                value = data.get(name, None)
+                if value:
+                    setattr(strategy, name, value)
+
+        # Subscribe market data
+        contract = self.main_engine.get_contract(strategy.vt_symbol)
+        if contract:
+            req = SubscribeRequest(
+                symbol=contract.symbol, exchange=contract.exchange)
+            self.main_engine.subscribe(req, contract.gateway_name)
+        else:
+            self.write_log(f"行情订阅失败，找不到合约{strategy.vt_symbol}", strategy)
+
+        # Put event to update init completed status.
+        strategy.inited = True
+        self.put_strategy_event(strategy)
+        self.write_log(f"{strategy_name}初始化完成")
+
     def start_strategy(self, strategy_name: str):
         """
         Start a strategy.
@@ -716,6 +912,15 @@ class CtaEngine(BaseEngine):
         strategies = self.symbol_strategy_map[strategy.vt_symbol]
         strategies.remove(strategy)
 
+        # Remove from bar subscription
+        aggregator = self.bar_aggregators.get(strategy.vt_symbol, None)
+        if aggregator:
+            aggregator.unsubscribe(strategy)
+
+        # Remove from shard process
+        if isinstance(strategy, StrategyProxy):
+            strategy.shard.remove_strategy(strategy_name)
+
         # Remove from active orderid map
         if strategy_name in self.strategy_orderid_map:
             vt_orderids = self.strategy_orderid_map.pop(strategy_name)
@@ -769,20 +974,21 @@ class CtaEngine(BaseEngine):
 
     def load_strategy_data(self):
         """
-        Load strategy data from json file.
+        Load strategy data from json file and journal of updates after it.
         """
-        self.strategy_data = load_json(self.data_filename)
+        self.strategy_data = self.data_journal.load()
+        self.data_journal.start()
 
     def sync_strategy_data(self, strategy: CtaTemplate):
         """
-        Sync strategy data into json file.
+        Sync strategy data into journal, which is written in background.
         """
         data = strategy.get_variables()
         data.pop("inited")      # Strategy status (inited, trading) should not be synced.
         data.pop("trading")
 
         self.strategy_data[strategy.strategy_name] = data
-        save_json(self.data_filename, self.strategy_data)
+        self.data_journal.update(strategy.strategy_name, data)
 
     def get_all_strategy_class_names(self):
         """
@@ -848,7 +1054,7 @@ class CtaEngine(BaseEngine):
         strategy = self.strategies[strategy_name]
 
         self.strategy_setting[strategy_name] = {
-            "class_name": strategy.__class__.__name__,
+            "class_name": strategy.get_data()["class_name"],
             "vt_symbol": strategy.vt_symbol,
             "setting": setting,
         }
@@ -0,0 +1,370 @@
+"""
+History data containers of backtesting: columnar cache shared between
+processes, and stream of data loaded by a background thread.
+"""
+from ctypes import c_char
+from datetime import datetime
+from multiprocessing.sharedctypes import RawArray
+from queue import Full, Queue
+from threading import Event, Thread
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData, TickData
+
+from .base import BacktestingMode
+
+
+BAR_FIELDS = [
+    "volume",
+    "open_interest",
+    "open_price",
+    "high_price",
+    "low_price",
+    "close_price",
+]
+
+TICK_FIELDS = [
+    "volume",
+    "open_interest",
+    "last_price",
+    "last_volume",
+    "limit_up",
+    "limit_down",
+    "open_price",
+    "high_price",
+    "low_price",
+    "pre_close",
+    "bid_price_1",
+    "bid_price_2",
+    "bid_price_3",
+    "bid_price_4",
+    "bid_price_5",
+    "ask_price_1",
+    "ask_price_2",
+    "ask_price_3",
+    "ask_price_4",
+    "ask_price_5",
+    "bid_volume_1",
+    "bid_volume_2",
+    "bid_volume_3",
+    "bid_volume_4",
+    "bid_volume_5",
+    "ask_volume_1",
+    "ask_volume_2",
+    "ask_volume_3",
+    "ask_volume_4",
+    "ask_volume_5",
+]
+
+
+class SharedHistory:
+    """
+    History data of one backtesting stored as columns in shared memory.
+
+    Columns are allocated with multiprocessing RawArray, so they can be
+    passed to pool workers on creation (initializer args) without copying
+    data into every process. Workers get BarData/TickData from the
+    arrays lazily with HistoryView.
+    """
+
+    def __init__(
+        self,
+        mode: BacktestingMode,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        datas: Sequence,
+    ):
+        """"""
+        self.mode = mode
+        self.symbol = symbol
+        self.exchange = exchange
+        self.interval = interval
+        self.start = start
+        self.end = end
+
+        self.count = len(datas)
+        self.tzinfo = datas[0].datetime.tzinfo if datas else None
+        self.name = getattr(datas[0], "name", "") if datas else ""
+        self.raw_arrays: Dict[str, RawArray] = {}
+
+        dts = [d.datetime.replace(tzinfo=None) for d in datas]
+        self.add_column(
+            "datetime",
+            np.array(dts, dtype="datetime64[us]").astype("int64")
+        )
+
+        for name in self.get_fields():
+            self.add_column(
+                name,
+                np.array([getattr(d, name) for d in datas], dtype="float64")
+            )
+
+    def add_column(self, name: str, array: np.ndarray):
+        """
+        Copy array into a new shared memory buffer.
+        """
+        raw = RawArray(c_char, max(array.nbytes, 1))
+        np.frombuffer(raw, dtype=array.dtype, count=len(array))[:] = array
+        self.raw_arrays[name] = raw
+
+    def get_fields(self):
+        """"""
+        if self.mode == BacktestingMode.BAR:
+            return BAR_FIELDS
+        else:
+            return TICK_FIELDS
+
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Get read-only numpy arrays backed by shared memory.
+        """
+        arrays = {}
+
+        for name, raw in self.raw_arrays.items():
+            dtype = "int64" if name == "datetime" else "float64"
+            array = np.frombuffer(raw, dtype=dtype, count=self.count)
+            array.flags.writeable = False
+            arrays[name] = array
+
+        return arrays
+
+    def match(
+        self,
+        mode: BacktestingMode,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+    ) -> bool:
+        """
+        Check if history is loaded with the same parameters, and data
+        range between start and end is covered.
+        """
+        if mode != self.mode:
+            return False
+
+        if mode == BacktestingMode.BAR and interval != self.interval:
+            return False
+
+        return (
+            symbol == self.symbol
+            and exchange == self.exchange
+            and start >= self.start
+            and end <= self.end
+        )
+
+    def get_index(self, dt: datetime, side: str = "left") -> int:
+        """
+        Get index of the first row with datetime not earlier than dt
+        (side "left") or later than dt (side "right").
+        """
+        timestamp = np.datetime64(dt.replace(tzinfo=None), "us").astype("int64")
+        arrays = self.get_arrays()
+        return int(np.searchsorted(arrays["datetime"], timestamp, side))
+
+    def get_view(self, start: datetime = None, end: datetime = None) -> "HistoryView":
+        """
+        Get view of data with datetime between start and end, or all
+        data if not given.
+        """
+        left = self.get_index(start, "left") if start else 0
+        right = self.get_index(end, "right") if end else self.count
+        return HistoryView(self, self.get_arrays(), left, max(left, right))
+
+    def create_data(self, arrays: Dict[str, np.ndarray], ix: int):
+        """
+        Create BarData/TickData from the ix row of arrays.
+        """
+        return next(self.iter_data(arrays, ix, ix + 1))
+
+    def iter_data(
+        self,
+        arrays: Dict[str, np.ndarray],
+        start: int,
+        stop: int,
+        chunk_size: int = 10000
+    ):
+        """
+        Create BarData/TickData from rows between start and stop, with
+        arrays converted into python values chunk by chunk.
+        """
+        names = self.get_fields()
+
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+
+            dts = arrays["datetime"][chunk_start:chunk_stop]
+            dts = dts.astype("datetime64[us]").tolist()
+            columns = [arrays[name][chunk_start:chunk_stop].tolist() for name in names]
+
+            for dt, values in zip(dts, zip(*columns)):
+                if self.tzinfo:
+                    dt = dt.replace(tzinfo=self.tzinfo)
+
+                yield self.to_data(dt, dict(zip(names, values)))
+
+    def to_data(self, dt: datetime, values: dict):
+        """"""
+        if self.mode == BacktestingMode.BAR:
+            return BarData(
+                symbol=self.symbol,
+                exchange=self.exchange,
+                datetime=dt,
+                interval=self.interval,
+                gateway_name="DB",
+                **values
+            )
+        else:
+            return TickData(
+                symbol=self.symbol,
+                exchange=self.exchange,
+                datetime=dt,
+                name=self.name,
+                gateway_name="DB",
+                **values
+            )
+
+
+class HistoryView:
+    """
+    Read-only sequence of history data, with data object created from
+    shared arrays only when accessed.
+    """
+
+    def __init__(
+        self,
+        history: SharedHistory,
+        arrays: Dict[str, np.ndarray],
+        start: int,
+        stop: int
+    ):
+        """"""
+        self.history = history
+        self.arrays = arrays
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        """"""
+        return self.stop - self.start
+
+    def __iter__(self):
+        """"""
+        return self.history.iter_data(self.arrays, self.start, self.stop)
+
+    def __getitem__(self, key):
+        """"""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("HistoryView does not support slice step")
+
+            return HistoryView(
+                self.history,
+                self.arrays,
+                self.start + start,
+                self.start + max(start, stop)
+            )
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("HistoryView index out of range")
+
+        return self.history.create_data(self.arrays, self.start + key)
+
+
+class HistoryStream:
+    """
+    Iterable history data loaded chunk by chunk in a background thread.
+
+    Loading of the next chunks (at most prefetch count) overlaps with
+    replay of the current one, so only a bounded window of data is kept
+    in memory. Data is loaded again every time the stream is iterated.
+    """
+
+    def __init__(
+        self,
+        ranges: List[Tuple[datetime, datetime, float]],
+        load_func: Callable,
+        output: Callable,
+        prefetch: int = 2
+    ):
+        """
+        ranges is list of (start, end, progress) of every chunk, and
+        load_func(start, end) returns data of a chunk.
+        """
+        self.ranges = ranges
+        self.load_func = load_func
+        self.output = output
+        self.prefetch = prefetch
+
+        self.count = 0      # Data count of last iteration
+
+    def __iter__(self):
+        """"""
+        queue = Queue(maxsize=self.prefetch)
+        stopped = Event()
+
+        thread = Thread(target=self.run_loader, args=(queue, stopped), daemon=True)
+        thread.start()
+
+        self.count = 0
+
+        try:
+            while True:
+                item = queue.get()
+                if item is None:
+                    break
+                elif isinstance(item, Exception):
+                    raise item
+
+                datas, progress = item
+                self.count += len(datas)
+
+                progress_bar = "#" * int(progress * 10)
+                self.output(f"加载进度：{progress_bar} [{progress:.0%}]")
+
+                yield from datas
+
+            self.output(f"历史数据加载完成，数据量：{self.count}")
+        finally:
+            # Loader thread exits after current chunk if iteration stopped early
+            stopped.set()
+
+    def run_loader(self, queue: Queue, stopped: Event):
+        """
+        Load chunks into queue, and put None after all loaded.
+        """
+        try:
+            for start, end, progress in self.ranges:
+                datas = self.load_func(start, end)
+
+                if not self.put_item(queue, (datas, progress), stopped):
+                    return
+        except Exception as e:
+            self.put_item(queue, e, stopped)
+            return
+
+        self.put_item(queue, None, stopped)
+
+    @staticmethod
+    def put_item(queue: Queue, item, stopped: Event) -> bool:
+        """
+        Put item into queue, wait if queue is full until stopped.
+        """
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+
+        return False
@@ -0,0 +1,185 @@
+"""
+Persistence of strategy data with snapshot file and append-only journal.
+"""
+import json
+import os
+from copy import deepcopy
+from queue import Empty, Queue
+from threading import Thread
+from time import time
+
+from vnpy.trader.utility import get_file_path
+
+
+class DataJournal:
+    """
+    Data of every strategy is kept in a json snapshot file (the same format
+    as save_json), and changes after the snapshot are appended into a
+    journal file with one json line for each update.
+
+    Updates are written by a background thread. Updates of the same name
+    within flush interval are merged into the last one, and each group of
+    lines is fsynced once. Journal is compacted into snapshot after
+    compact_count lines, on load and on close.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        journal_filename: str = "",
+        flush_interval: float = 0.5,
+        compact_count: int = 1000
+    ):
+        """"""
+        self.filepath = get_file_path(filename)
+        if not journal_filename:
+            journal_filename = f"{filename}.journal"
+        self.journal_path = get_file_path(journal_filename)
+
+        self.flush_interval = flush_interval
+        self.compact_count = compact_count
+
+        self.data = {}
+        self.loaded = False
+        self.line_count = 0
+
+        self.queue = Queue()
+        self.active = False
+        self.thread = None
+        self.journal_file = None
+
+    def load(self) -> dict:
+        """
+        Load snapshot and apply updates in journal, then compact them.
+        """
+        data = {}
+
+        if self.filepath.exists():
+            with open(self.filepath, mode="r", encoding="UTF-8") as f:
+                data = json.load(f)
+
+        if self.journal_path.exists():
+            with open(self.journal_path, mode="r", encoding="UTF-8") as f:
+                for line in f:
+                    # Last line may be incomplete if writing is interrupted
+                    try:
+                        name, value = json.loads(line)
+                    except ValueError:
+                        break
+                    data[name] = value
+
+        self.data = data
+        self.loaded = True
+        self.compact()
+
+        return deepcopy(data)
+
+    def start(self):
+        """"""
+        if self.active or not self.loaded:
+            return
+
+        self.active = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def update(self, name: str, value: dict):
+        """
+        Put update of name into queue. Value is serialized immediately, so
+        that later change of it is not written.
+        """
+        line = json.dumps([name, value], ensure_ascii=False)
+        self.queue.put((name, line))
+
+    def close(self):
+        """
+        Write all updates in queue and compact journal. Files are not touched
+        if data is never loaded, otherwise snapshot would be cleared.
+        """
+        if self.active:
+            self.active = False
+            self.queue.put(None)
+            self.thread.join()
+
+        if self.loaded:
+            self.compact()
+
+    def run(self):
+        """"""
+        stopped = False
+
+        while not stopped:
+            try:
+                item = self.queue.get(timeout=1)
+            except Empty:
+                continue
+
+            # Collect updates within flush interval, None is put last by close
+            updates = {}
+            end = time() + self.flush_interval
+
+            while True:
+                if not item:
+                    stopped = True
+                    break
+
+                name, line = item
+                updates.pop(name, None)     # Keep order of the last update
+                updates[name] = line
+
+                timeout = end - time()
+                if timeout <= 0:
+                    break
+
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except Empty:
+                    break
+
+            if updates:
+                self.write(updates)
+
+            if self.line_count >= self.compact_count:
+                self.compact()
+
+    def write(self, updates: dict):
+        """
+        Append lines into journal and fsync.
+        """
+        if not self.journal_file:
+            self.journal_file = open(self.journal_path, mode="a", encoding="UTF-8")
+
+        for name, line in updates.items():
+            self.journal_file.write(line + "\n")
+            self.data[name] = json.loads(line)[1]
+
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+        self.line_count += len(updates)
+
+    def compact(self):
+        """
+        Save all data into snapshot file, and clear journal.
+        """
+        if self.journal_file:
+            self.journal_file.close()
+            self.journal_file = None
+
+        # Replace snapshot file after data written completely
+        temp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        with open(temp_path, mode="w+", encoding="UTF-8") as f:
+            json.dump(
+                self.data,
+                f,
+                indent=4,
+                ensure_ascii=False
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.filepath)
+
+        if self.journal_path.exists():
+            os.remove(self.journal_path)
+
+        self.line_count = 0
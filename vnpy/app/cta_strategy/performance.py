@@ -0,0 +1,222 @@
+"""
+Array based calculation of backtesting daily pnl and statistics.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+DAILY_FIELDS = [
+    "close_price",
+    "pre_close",
+    "trade_count",
+    "start_pos",
+    "end_pos",
+    "turnover",
+    "commission",
+    "slippage",
+    "trading_pnl",
+    "holding_pnl",
+    "total_pnl",
+    "net_pnl",
+]
+
+STATISTICS_FIELDS = [
+    "total_days",
+    "profit_days",
+    "loss_days",
+    "end_balance",
+    "max_drawdown",
+    "max_ddpercent",
+    "total_net_pnl",
+    "daily_net_pnl",
+    "total_commission",
+    "daily_commission",
+    "total_slippage",
+    "daily_slippage",
+    "total_turnover",
+    "daily_turnover",
+    "total_trade_count",
+    "daily_trade_count",
+    "total_return",
+    "annual_return",
+    "daily_return",
+    "return_std",
+    "sharpe_ratio",
+    "return_drawdown_ratio",
+]
+
+
+def calculate_daily_pnl(
+    close_prices: np.ndarray,
+    trade_days: np.ndarray,
+    trade_prices: np.ndarray,
+    trade_volumes: np.ndarray,
+    size: float,
+    rate: float,
+    slippage: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate mark-to-market pnl of every day.
+
+    close_prices is close price of each day, and trades are given by
+    index of their day, price and signed volume (negative for short).
+    """
+    day_count = len(close_prices)
+
+    def sum_by_day(values: np.ndarray) -> np.ndarray:
+        """"""
+        return np.bincount(trade_days, weights=values, minlength=day_count)
+
+    pre_close = np.concatenate([[0], close_prices[:-1]])
+
+    # Holding pnl is the pnl from holding position at day start
+    pos_change = sum_by_day(trade_volumes)
+    end_pos = np.cumsum(pos_change)
+    start_pos = end_pos - pos_change
+    holding_pnl = start_pos * (close_prices - pre_close) * size
+
+    # Trading pnl is the pnl from new trade during the day
+    trading_pnl = sum_by_day(
+        trade_volumes * (close_prices[trade_days] - trade_prices) * size
+    )
+
+    abs_volumes = np.abs(trade_volumes)
+    turnover = sum_by_day(trade_prices * abs_volumes * size)
+    commission = turnover * rate
+    slippage = sum_by_day(abs_volumes * size * slippage)
+
+    # Net pnl takes account of commission and slippage cost
+    total_pnl = trading_pnl + holding_pnl
+    net_pnl = total_pnl - commission - slippage
+
+    return {
+        "close_price": close_prices,
+        "pre_close": pre_close,
+        "trade_count": np.bincount(trade_days, minlength=day_count),
+        "start_pos": start_pos,
+        "end_pos": end_pos,
+        "turnover": turnover,
+        "commission": commission,
+        "slippage": slippage,
+        "trading_pnl": trading_pnl,
+        "holding_pnl": holding_pnl,
+        "total_pnl": total_pnl,
+        "net_pnl": net_pnl,
+    }
+
+
+def calculate_balance(net_pnl: np.ndarray, capital: float) -> Dict[str, np.ndarray]:
+    """
+    Calculate balance related time series of daily net pnl.
+
+    net_pnl can be 1-D array of one backtesting, or 2-D array with one
+    row for each backtesting.
+    """
+    balance = np.cumsum(net_pnl, axis=-1) + capital
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pre_balance = np.roll(balance, 1, axis=-1)
+        daily_return = np.log(balance / pre_balance)
+        daily_return[..., 0] = 0
+        daily_return[np.isnan(daily_return)] = 0
+
+        highlevel = np.maximum.accumulate(balance, axis=-1)
+        drawdown = balance - highlevel
+        ddpercent = drawdown / highlevel * 100
+
+    return {
+        "balance": balance,
+        "return": daily_return,
+        "highlevel": highlevel,
+        "drawdown": drawdown,
+        "ddpercent": ddpercent,
+    }
+
+
+def calculate_statistics(
+    net_pnl: np.ndarray,
+    commission: np.ndarray,
+    slippage: np.ndarray,
+    turnover: np.ndarray,
+    trade_count: np.ndarray,
+    capital: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate statistics of daily results.
+
+    Inputs can be 1-D arrays of one backtesting, or 2-D arrays with one
+    row for each backtesting (same number of days), then every statistics
+    value is an array with one element for each backtesting.
+    """
+    balance = calculate_balance(net_pnl, capital)
+    total_days = net_pnl.shape[-1]
+
+    end_balance = balance["balance"][..., -1]
+    max_drawdown = balance["drawdown"].min(axis=-1)
+    max_ddpercent = balance["ddpercent"].min(axis=-1)
+
+    total_net_pnl = net_pnl.sum(axis=-1)
+    total_commission = commission.sum(axis=-1)
+    total_slippage = slippage.sum(axis=-1)
+    total_turnover = turnover.sum(axis=-1)
+    total_trade_count = trade_count.sum(axis=-1)
+
+    total_return = (end_balance / capital - 1) * 100
+    annual_return = total_return / total_days * 240
+    daily_return = balance["return"].mean(axis=-1) * 100
+
+    if total_days > 1:
+        return_std = balance["return"].std(axis=-1, ddof=1) * 100
+    else:
+        return_std = np.full_like(daily_return, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe_ratio = np.where(
+            return_std != 0,
+            daily_return / return_std * np.sqrt(240),
+            0
+        )
+        return_drawdown_ratio = -total_return / max_ddpercent
+
+    return {
+        "total_days": total_days,
+        "profit_days": (net_pnl > 0).sum(axis=-1),
+        "loss_days": (net_pnl < 0).sum(axis=-1),
+        "end_balance": end_balance,
+        "max_drawdown": max_drawdown,
+        "max_ddpercent": max_ddpercent,
+        "total_net_pnl": total_net_pnl,
+        "daily_net_pnl": total_net_pnl / total_days,
+        "total_commission": total_commission,
+        "daily_commission": total_commission / total_days,
+        "total_slippage": total_slippage,
+        "daily_slippage": total_slippage / total_days,
+        "total_turnover": total_turnover,
+        "daily_turnover": total_turnover / total_days,
+        "total_trade_count": total_trade_count,
+        "daily_trade_count": total_trade_count / total_days,
+        "total_return": total_return,
+        "annual_return": annual_return,
+        "daily_return": daily_return,
+        "return_std": return_std,
+        "sharpe_ratio": sharpe_ratio,
+        "return_drawdown_ratio": return_drawdown_ratio,
+    }
+
+
+def get_statistics(result: Dict[str, np.ndarray], ix: int = None) -> Dict[str, float]:
+    """
+    Get statistics values of one backtesting from result of
+    calculate_statistics as Python scalars, ix is the row index of the
+    backtesting if result is calculated from 2-D arrays.
+    """
+    statistics = {}
+
+    for key in STATISTICS_FIELDS:
+        value = np.asarray(result[key])
+        if ix is not None and value.ndim:
+            value = value[ix]
+        statistics[key] = value.item()
+
+    return statistics
@@ -0,0 +1,219 @@
+"""
+Persistent store of optimization results.
+"""
+import hashlib
+import inspect
+import json
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from peewee import (
+    AutoField,
+    CharField,
+    DateTimeField,
+    Model,
+    SqliteDatabase,
+    TextField,
+)
+
+from vnpy.trader.utility import get_file_path
+
+
+def get_code_hash(strategy_class: type) -> str:
+    """
+    Get md5 hash of strategy source code, so that results are not
+    reused after the strategy is modified.
+    """
+    try:
+        source = inspect.getsource(strategy_class)
+    except (OSError, TypeError):
+        source = strategy_class.__name__
+
+    return hashlib.md5(source.encode("utf-8")).hexdigest()
+
+
+def get_setting_key(setting: dict) -> str:
+    """"""
+    return json.dumps(setting, sort_keys=True, default=str)
+
+
+def to_json_value(value):
+    """
+    Convert statistics value into type supported by json.
+    """
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    elif isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"不支持保存的统计数据类型：{type(value).__name__}")
+
+
+def init_model(db: SqliteDatabase):
+    class DbOptimizationResult(Model):
+        """
+        Statistics of one backtesting setting in an optimization task.
+
+        Index is defined unique with task and setting.
+        """
+
+        id = AutoField()
+        task: str = CharField()
+        setting: str = TextField()
+        statistics: str = TextField()
+        datetime: datetime = DateTimeField()
+
+        class Meta:
+            database = db
+            indexes = ((("task", "setting"), True),)
+
+    class DbOptimizationTask(Model):
+        """
+        Description of optimization task: strategy code and backtesting
+        parameters, with task key being hash of them.
+        """
+
+        id = AutoField()
+        task: str = CharField(unique=True)
+        class_name: str = CharField()
+        description: str = TextField()
+        datetime: datetime = DateTimeField()
+
+        class Meta:
+            database = db
+
+    db.connect()
+    db.create_tables([DbOptimizationResult, DbOptimizationTask])
+    return DbOptimizationResult, DbOptimizationTask
+
+
+class OptimizationResultStore:
+    """
+    Store statistics of finished backtestings in a local sqlite file.
+
+    Results are grouped by task, which is identified by strategy class,
+    hash of strategy code and backtesting parameters (symbol, interval,
+    data range, costs and capital). Rerunning an optimization with the
+    same task can skip settings already evaluated.
+    """
+
+    def __init__(self, filename: str = "optimization_result.db"):
+        """"""
+        path = str(get_file_path(filename))
+        self.db = SqliteDatabase(path)
+        self.result_model, self.task_model = init_model(self.db)
+
+    def get_task(
+        self,
+        strategy_class: type,
+        vt_symbol: str,
+        interval: str,
+        start: datetime,
+        end: datetime,
+        rate: float,
+        slippage: float,
+        size: float,
+        pricetick: float,
+        capital: int,
+        mode: str,
+    ) -> str:
+        """
+        Get task key of backtesting parameters, and save the task
+        description for querying.
+        """
+        description = {
+            "class_name": strategy_class.__name__,
+            "code_hash": get_code_hash(strategy_class),
+            "vt_symbol": vt_symbol,
+            "interval": interval,
+            "start": start,
+            "end": end,
+            "rate": rate,
+            "slippage": slippage,
+            "size": size,
+            "pricetick": pricetick,
+            "capital": capital,
+            "mode": mode,
+        }
+        text = json.dumps(description, default=str)
+        task = hashlib.md5(text.encode("utf-8")).hexdigest()
+
+        self.task_model.insert(
+            task=task,
+            class_name=strategy_class.__name__,
+            description=text,
+            datetime=datetime.now(),
+        ).on_conflict_ignore().execute()
+
+        return task
+
+    def get_all_tasks(self) -> List[dict]:
+        """
+        Get description of all tasks, with newest one first.
+        """
+        tasks = []
+
+        s = self.task_model.select().order_by(self.task_model.datetime.desc())
+        for row in s:
+            description = json.loads(row.description)
+            description["task"] = row.task
+            tasks.append(description)
+
+        return tasks
+
+    def save_result(self, task: str, setting: dict, statistics: dict):
+        """
+        Save result of one setting, replace if already exists.
+        """
+        self.result_model.insert(
+            task=task,
+            setting=get_setting_key(setting),
+            statistics=json.dumps(statistics, default=to_json_value),
+            datetime=datetime.now(),
+        ).on_conflict_replace().execute()
+
+    def load_results(self, task: str) -> Dict[str, dict]:
+        """
+        Get statistics of all settings evaluated in task, with setting
+        key (from get_setting_key) as dict key.
+        """
+        results = {}
+
+        s = self.result_model.select().where(self.result_model.task == task)
+        for row in s:
+            results[row.setting] = json.loads(row.statistics)
+
+        return results
+
+    def get_result(self, task: str, setting: dict) -> Optional[dict]:
+        """"""
+        row = self.result_model.get_or_none(
+            self.result_model.task == task,
+            self.result_model.setting == get_setting_key(setting)
+        )
+        if row:
+            return json.loads(row.statistics)
+        return None
+
+    def query_results(self, task: str, target_name: str, count: int = 0) -> list:
+        """
+        Get results of task sorted by target value, in the same format
+        as run_optimization: (setting str, target value, statistics).
+        """
+        results = []
+
+        for key, statistics in self.load_results(task).items():
+            setting = json.loads(key)
+            results.append((str(setting), statistics[target_name], statistics))
+
+        results.sort(reverse=True, key=lambda result: result[1])
+
+        if count:
+            results = results[:count]
+        return results
+
+    def clean(self, task: str):
+        """
+        Delete all results of task.
+        """
+        self.result_model.delete().where(self.result_model.task == task).execute()
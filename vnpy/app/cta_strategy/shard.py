@@ -0,0 +1,635 @@
+"""
+Running strategies of CtaEngine in worker processes.
+
+Strategies are grouped into shards by vt_symbol, and each shard is a worker
+process running the strategy objects. CtaEngine keeps a StrategyProxy for
+every strategy, so that orders, local stop orders, positions and offset
+conversion are still managed in the main process.
+
+Messages are tuples sent through a pipe for each shard, with message type
+as the first element.
+"""
+import multiprocessing
+import traceback
+import zlib
+from collections import defaultdict, deque
+from threading import Event as ThreadEvent
+from threading import Lock, Thread
+from typing import Any, Callable
+
+from vnpy.event import Event
+from vnpy.trader.constant import Interval
+from vnpy.trader.object import BarData, TickData
+
+from .base import BarAggregator, EngineType, EVENT_CTA_SHARD
+
+# Strategy status is managed by CtaEngine in main process
+STATUS_VARIABLES = ["inited", "trading", "pos"]
+
+
+def get_shard_index(vt_symbol: str, shard_count: int) -> int:
+    """
+    Get shard of vt_symbol with stable hash, which is the same after restart.
+    """
+    return zlib.crc32(vt_symbol.encode("utf-8")) % shard_count
+
+
+def get_data_variables(strategy: Any) -> dict:
+    """
+    Get variables of strategy except status ones.
+    """
+    variables = strategy.get_variables()
+    for name in STATUS_VARIABLES:
+        variables.pop(name, None)
+    return variables
+
+
+class StrategyProxy:
+    """
+    Strategy object in CtaEngine for strategy running in shard process.
+
+    Change of parameters and status (inited, trading, pos) is sent to the
+    strategy in shard, and variables are updated by messages from shard.
+    """
+
+    def __init__(
+        self,
+        shard: "StrategyShard",
+        strategy_class: type,
+        strategy_name: str,
+        vt_symbol: str,
+        setting: dict,
+    ):
+        """"""
+        data = self.__dict__
+        data["shard"] = shard
+        data["strategy_name"] = strategy_name
+        data["vt_symbol"] = vt_symbol
+        data["class_name"] = strategy_class.__name__
+        data["author"] = strategy_class.author
+
+        data["parameters"] = list(strategy_class.parameters)
+        data["variables"] = STATUS_VARIABLES + list(strategy_class.variables)
+
+        for name in data["parameters"]:
+            data[name] = setting.get(name, getattr(strategy_class, name, None))
+
+        for name in strategy_class.variables:
+            data[name] = getattr(strategy_class, name, None)
+
+        data["inited"] = False
+        data["trading"] = False
+        data["pos"] = 0
+
+    def __setattr__(self, name: str, value: Any):
+        """"""
+        self.__dict__[name] = value
+
+        if name in self.parameters or name in self.variables:
+            self.shard.send(("update", self.strategy_name, name, value))
+
+    def update_data(self, variables: dict):
+        """
+        Update variables sent from shard, without sending back.
+        """
+        self.__dict__.update(variables)
+
+    def update_setting(self, setting: dict):
+        """"""
+        for name in self.parameters:
+            if name in setting:
+                setattr(self, name, setting[name])
+
+    def get_parameters(self):
+        """"""
+        return {name: getattr(self, name) for name in self.parameters}
+
+    def get_variables(self):
+        """"""
+        return {name: getattr(self, name) for name in self.variables}
+
+    def get_data(self):
+        """"""
+        strategy_data = {
+            "strategy_name": self.strategy_name,
+            "vt_symbol": self.vt_symbol,
+            "class_name": self.class_name,
+            "author": self.author,
+            "parameters": self.get_parameters(),
+            "variables": self.get_variables(),
+        }
+        return strategy_data
+
+    def on_init(self):
+        """
+        Wait until on_init of strategy in shard returns.
+        """
+        self.shard.call(self.strategy_name, "on_init")
+
+    def on_start(self):
+        """"""
+        self.shard.call(self.strategy_name, "on_start")
+
+    def on_stop(self):
+        """"""
+        self.shard.call(self.strategy_name, "on_stop")
+
+    def on_order(self, order):
+        """"""
+        self.shard.send(("callback", self.strategy_name, "on_order", order))
+
+    def on_trade(self, trade):
+        """"""
+        self.shard.send(("callback", self.strategy_name, "on_trade", trade))
+
+    def on_stop_order(self, stop_order):
+        """"""
+        self.shard.send(
+            ("callback", self.strategy_name, "on_stop_order", stop_order)
+        )
+
+
+class StrategyShard:
+    """
+    Worker process of a shard, managed in main process.
+
+    Messages from shard are received in a thread. Order requests are put
+    as event and processed in event engine thread like other callbacks of
+    CtaEngine, history requests are processed in new threads.
+    """
+
+    def __init__(self, cta_engine: Any, index: int):
+        """"""
+        self.cta_engine = cta_engine
+        self.index = index
+
+        self.strategies = {}        # strategy_name: proxy
+        self.active = True          # False after closed or process exited
+
+        self.send_lock = Lock()
+        self.call_lock = Lock()
+        self.call_count = 0
+        self.calls = {}             # callid: thread event
+
+        # Use spawn since main process has threads running
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=run_shard, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, msg: tuple):
+        """
+        Send message to shard, messages are dropped if shard is not active.
+        """
+        if not self.active:
+            return
+
+        try:
+            with self.send_lock:
+                self.conn.send(msg)
+        except (BrokenPipeError, EOFError, OSError):
+            self.process_exited()
+
+    def call(self, strategy_name: str, func_name: str):
+        """
+        Call function of strategy in shard and wait for its return.
+        """
+        with self.call_lock:
+            if not self.active:
+                return
+
+            self.call_count += 1
+            callid = self.call_count
+
+            event = ThreadEvent()
+            self.calls[callid] = event
+
+        self.send(("call", callid, strategy_name, func_name))
+
+        # Stop waiting if shard process exits unexpectedly
+        while not event.wait(1):
+            if not self.process.is_alive():
+                self.process_exited()
+                break
+
+    def process_exited(self):
+        """
+        Stop strategies of shard after its process exits unexpectedly.
+        """
+        with self.call_lock:
+            if not self.active:
+                return
+            self.active = False
+
+            # Release functions waiting for return
+            for event in self.calls.values():
+                event.set()
+            self.calls.clear()
+
+        self.cta_engine.write_log(f"策略进程{self.index}异常退出，其中的策略已停止并撤销全部委托")
+
+        # Orders of strategies are cancelled in event engine thread, the
+        # same as cancel_all requested by strategy in shard.
+        for strategy in list(self.strategies.values()):
+            strategy.update_data({"inited": False, "trading": False})
+            self.cta_engine.put_strategy_event(strategy)
+
+            msg = ("cancel_all", strategy.strategy_name)
+            event = Event(EVENT_CTA_SHARD, (self, msg))
+            self.cta_engine.event_engine.put(event)
+
+    def add_strategy(
+        self, strategy_class: type, strategy_name: str, vt_symbol: str, setting: dict
+    ):
+        """"""
+        proxy = StrategyProxy(self, strategy_class, strategy_name, vt_symbol, setting)
+        self.strategies[strategy_name] = proxy
+
+        self.send(("add", strategy_class, strategy_name, vt_symbol, setting))
+        return proxy
+
+    def remove_strategy(self, strategy_name: str):
+        """"""
+        self.strategies.pop(strategy_name, None)
+        self.send(("remove", strategy_name))
+
+    def close(self, timeout: float = 5):
+        """
+        Stop shard process, which is terminated if not exited in timeout.
+        """
+        with self.call_lock:
+            active = self.active
+            self.active = False
+
+        if active:
+            try:
+                with self.send_lock:
+                    self.conn.send(None)
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+
+        self.thread.join(timeout)
+        self.conn.close()
+
+    def run(self):
+        """
+        Receive messages from shard until it exits.
+        """
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                self.process_exited()
+                break
+
+            try:
+                self.process_message(msg)
+            except Exception:
+                msg = f"策略进程{self.index}消息处理异常：\n{traceback.format_exc()}"
+                self.cta_engine.write_log(msg)
+
+    def process_message(self, msg: tuple):
+        """"""
+        type = msg[0]
+
+        if type == "return":
+            event = self.calls.pop(msg[1], None)
+            if event:
+                event.set()
+        elif type in {"send_order", "cancel_order", "cancel_all"}:
+            event = Event(EVENT_CTA_SHARD, (self, msg))
+            self.cta_engine.event_engine.put(event)
+        elif type in {"load_bar", "load_tick"}:
+            thread = Thread(target=self.process_history_request, args=(msg,))
+            thread.start()
+        elif type == "log":
+            _, strategy_name, text = msg
+            strategy = self.strategies.get(strategy_name, None)
+            self.cta_engine.write_log(text, strategy)
+        elif type == "email":
+            _, strategy_name, text = msg
+            strategy = self.strategies.get(strategy_name, None)
+            self.cta_engine.send_email(text, strategy)
+        else:
+            _, strategy_name, data = msg
+            strategy = self.strategies.get(strategy_name, None)
+            if not strategy:
+                return
+
+            if type == "error":
+                strategy.update_data({"inited": False, "trading": False})
+                self.cta_engine.write_log(data, strategy)
+            else:
+                strategy.update_data(data)
+
+                if type == "sync":
+                    self.cta_engine.sync_strategy_data(strategy)
+                    self.cta_engine.put_strategy_event(strategy)
+                elif type == "event":
+                    self.cta_engine.put_strategy_event(strategy)
+
+    def process_order_request(self, msg: tuple):
+        """
+        Process order request of strategy in event engine thread.
+        """
+        type = msg[0]
+
+        if type == "send_order":
+            _, reqid, strategy_name, direction, offset, price, volume, stop, lock = msg
+            strategy = self.strategies.get(strategy_name, None)
+
+            if strategy:
+                result = self.cta_engine.send_order(
+                    strategy, direction, offset, price, volume, stop, lock
+                )
+            else:
+                result = []
+            self.send(("reply", reqid, result))
+        else:
+            strategy = self.strategies.get(msg[1], None)
+            if not strategy:
+                return
+
+            if type == "cancel_order":
+                self.cta_engine.cancel_order(strategy, msg[2])
+            else:
+                self.cta_engine.cancel_all(strategy)
+
+    def process_history_request(self, msg: tuple):
+        """"""
+        if msg[0] == "load_bar":
+            _, reqid, vt_symbol, days, interval = msg
+            try:
+                data = self.cta_engine.get_history_bars(vt_symbol, days, interval)
+            except Exception:
+                msg = f"历史数据加载异常：\n{traceback.format_exc()}"
+                self.cta_engine.write_log(msg)
+                data = []
+        else:
+            _, reqid, vt_symbol, days = msg
+            data = []
+            self.cta_engine.load_tick(vt_symbol, days, data.append)
+
+        self.send(("reply", reqid, data))
+
+
+class ShardEngine:
+    """
+    Engine running strategies in shard process, with the same functions
+    called by CtaTemplate as CtaEngine.
+    """
+
+    engine_type = EngineType.LIVE
+
+    def __init__(self, conn: Any):
+        """"""
+        self.conn = conn
+
+        self.strategies = {}        # strategy_name: strategy
+        self.symbol_strategy_map = defaultdict(list)
+        self.bar_aggregators = {}   # vt_symbol: bar_aggregator
+        self.sent_variables = {}    # strategy_name: variables last sent
+
+        self.buffer = deque()       # messages received when waiting for reply
+        self.request_count = 0
+
+    def run(self):
+        """"""
+        while True:
+            if self.buffer:
+                msg = self.buffer.popleft()
+            else:
+                try:
+                    msg = self.conn.recv()
+                except EOFError:
+                    break
+
+            if msg is None:
+                break
+
+            self.process_message(msg)
+
+    def process_message(self, msg: tuple):
+        """"""
+        type = msg[0]
+
+        if type == "tick":
+            self.process_tick(msg[1])
+        elif type == "update":
+            _, strategy_name, name, value = msg
+            strategy = self.strategies.get(strategy_name, None)
+            if strategy:
+                setattr(strategy, name, value)
+        elif type == "callback":
+            _, strategy_name, func_name, data = msg
+            strategy = self.strategies.get(strategy_name, None)
+            if strategy:
+                self.call_strategy_func(strategy, getattr(strategy, func_name), data)
+
+                # Variables updated in on_trade are synced as CtaEngine does
+                if func_name == "on_trade":
+                    self.sync_strategy_data(strategy)
+        elif type == "call":
+            _, callid, strategy_name, func_name = msg
+            strategy = self.strategies.get(strategy_name, None)
+            if strategy:
+                self.call_strategy_func(strategy, getattr(strategy, func_name))
+            self.conn.send(("return", callid))
+        elif type == "add":
+            _, strategy_class, strategy_name, vt_symbol, setting = msg
+            self.add_strategy(strategy_class, strategy_name, vt_symbol, setting)
+        elif type == "remove":
+            self.remove_strategy(msg[1])
+
+    def process_tick(self, tick: TickData):
+        """"""
+        aggregator = self.bar_aggregators.get(tick.vt_symbol, None)
+        if aggregator:
+            aggregator.update_tick(tick)
+
+        for strategy in self.symbol_strategy_map[tick.vt_symbol]:
+            if strategy.inited:
+                self.call_strategy_func(strategy, strategy.on_tick, tick)
+
+    def request(self, type: str, *args):
+        """
+        Send request to main process and wait for reply.
+        """
+        self.request_count += 1
+        reqid = self.request_count
+        self.conn.send((type, reqid) + args)
+
+        while True:
+            msg = self.conn.recv()
+            if msg and msg[0] == "reply" and msg[1] == reqid:
+                return msg[2]
+            self.buffer.append(msg)
+
+    def add_strategy(
+        self, strategy_class: type, strategy_name: str, vt_symbol: str, setting: dict
+    ):
+        """"""
+        try:
+            strategy = strategy_class(self, strategy_name, vt_symbol, setting)
+        except Exception:
+            msg = f"创建策略失败，触发异常：\n{traceback.format_exc()}"
+            self.conn.send(("log", strategy_name, msg))
+            return
+
+        self.strategies[strategy_name] = strategy
+        self.symbol_strategy_map[vt_symbol].append(strategy)
+        self.sent_variables[strategy_name] = get_data_variables(strategy)
+
+    def remove_strategy(self, strategy_name: str):
+        """"""
+        strategy = self.strategies.pop(strategy_name, None)
+        if not strategy:
+            return
+
+        self.symbol_strategy_map[strategy.vt_symbol].remove(strategy)
+        self.sent_variables.pop(strategy_name)
+
+        aggregator = self.bar_aggregators.get(strategy.vt_symbol, None)
+        if aggregator:
+            aggregator.unsubscribe(strategy)
+
+    def call_strategy_func(
+        self, strategy: Any, func: Callable, params: Any = None
+    ):
+        """
+        Call function of a strategy and catch any exception raised, then
+        send variables to main process if changed.
+        """
+        try:
+            if params:
+                func(params)
+            else:
+                func()
+        except Exception:
+            strategy.trading = False
+            strategy.inited = False
+
+            msg = f"触发异常已停止\n{traceback.format_exc()}"
+            self.conn.send(("error", strategy.strategy_name, msg))
+
+        self.send_variables(strategy, "variables")
+
+    def send_variables(self, strategy: Any, type: str):
+        """"""
+        variables = get_data_variables(strategy)
+
+        if type == "variables" and variables == self.sent_variables[strategy.strategy_name]:
+            return
+        self.sent_variables[strategy.strategy_name] = variables
+
+        self.conn.send((type, strategy.strategy_name, variables))
+
+    def send_order(self, strategy: Any, direction, offset, price, volume, stop, lock):
+        """"""
+        return self.request(
+            "send_order",
+            strategy.strategy_name,
+            direction,
+            offset,
+            price,
+            volume,
+            stop,
+            lock
+        )
+
+    def cancel_order(self, strategy: Any, vt_orderid: str):
+        """"""
+        self.conn.send(("cancel_order", strategy.strategy_name, vt_orderid))
+
+    def cancel_all(self, strategy: Any):
+        """"""
+        self.conn.send(("cancel_all", strategy.strategy_name))
+
+    def get_engine_type(self):
+        """"""
+        return self.engine_type
+
+    def load_bar(
+        self,
+        vt_symbol: str,
+        days: int,
+        interval: Interval,
+        callback: Callable[[BarData], None]
+    ):
+        """
+        Load bars from main process, where history is shared by strategies.
+        """
+        bars = self.request("load_bar", vt_symbol, days, interval)
+
+        for bar in bars:
+            callback(bar)
+
+    def load_tick(
+        self,
+        vt_symbol: str,
+        days: int,
+        callback: Callable[[TickData], None]
+    ):
+        """"""
+        ticks = self.request("load_tick", vt_symbol, days)
+
+        for tick in ticks:
+            callback(tick)
+
+    def subscribe_bar(
+        self,
+        strategy: Any,
+        window: int = 0,
+        on_window_bar: Callable = None,
+        interval: Interval = Interval.MINUTE
+    ):
+        """"""
+        aggregator = self.bar_aggregators.get(strategy.vt_symbol, None)
+        if not aggregator:
+            aggregator = BarAggregator(self.push_bar)
+            self.bar_aggregators[strategy.vt_symbol] = aggregator
+
+        aggregator.subscribe(strategy, window, on_window_bar, interval)
+
+    def push_bar(self, strategy: Any, func: Callable, bar: BarData):
+        """"""
+        if strategy.inited:
+            self.call_strategy_func(strategy, func, bar)
+
+    def put_strategy_event(self, strategy: Any):
+        """"""
+        self.send_variables(strategy, "event")
+
+    def sync_strategy_data(self, strategy: Any):
+        """"""
+        self.send_variables(strategy, "sync")
+
+    def write_log(self, msg: str, strategy: Any = None):
+        """"""
+        strategy_name = strategy.strategy_name if strategy else ""
+        self.conn.send(("log", strategy_name, msg))
+
+    def send_email(self, msg: str, strategy: Any = None):
+        """"""
+        strategy_name = strategy.strategy_name if strategy else ""
+        self.conn.send(("email", strategy_name, msg))
+
+
+def run_shard(conn: Any):
+    """
+    Main function of shard process.
+    """
+    engine = ShardEngine(conn)
+    engine.run()
+    conn.close()
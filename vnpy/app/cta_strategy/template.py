@@ -7,7 +7,7 @@ from vnpy.trader.constant import Interval, Direction, Offset
 from vnpy.trader.object import BarData, TickData, OrderData, TradeData
 from vnpy.trader.utility import virtual
 
-from .base import StopOrder, EngineType
+from .base import BarAggregator, StopOrder, EngineType
 
 
 class CtaTemplate(ABC):
@@ -33,6 +33,9 @@ class CtaTemplate(ABC):
         self.trading = False
         self.pos = 0
 
+        self.bar_subscriptions = []     # (window, on_window_bar, interval)
+        self.history_aggregator = None
+
         # Copy a new variables list here to avoid duplicate insert when multiple 
         # strategy instances are created with the same strategy class.
         self.variables = copy(self.variables)
@@ -226,12 +229,38 @@ class CtaTemplate(ABC):
     ):
         """
         Load historical bar data for initializing strategy.
+
+        If bar is subscribed from engine, history bars are also used for
+        generating window bars as subscribed, and window unfinished at the
+        end of history is continued by live bars.
         """
         if not callback:
-            callback = self.on_bar
+            if self.bar_subscriptions:
+                aggregator = BarAggregator(lambda strategy, func, bar: func(bar))
+                for subscription in self.bar_subscriptions:
+                    aggregator.subscribe(self, *subscription)
+                self.history_aggregator = aggregator
+                callback = aggregator.update_bar
+            else:
+                callback = self.on_bar
 
         self.cta_engine.load_bar(self.vt_symbol, days, interval, callback)
 
+    def subscribe_bar(
+        self,
+        window: int = 0,
+        on_window_bar: Callable = None,
+        interval: Interval = Interval.MINUTE
+    ):
+        """
+        Subscribe bar data generated by engine from tick data, instead of
+        using BarGenerator of strategy itself. 1 minute bar is pushed to
+        on_bar, and x minute/hour bar is pushed to on_window_bar if window
+        is given. Generators are shared by strategies of the same symbol.
+        """
+        self.bar_subscriptions.append((window, on_window_bar, interval))
+        self.cta_engine.subscribe_bar(self, window, on_window_bar, interval)
+
     def load_tick(self, days: int):
         """
         Load historical tick data for initializing strategy.
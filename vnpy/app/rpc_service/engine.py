@@ -7,6 +7,7 @@ from vnpy.rpc import RpcServer
 from vnpy.trader.engine import BaseEngine, MainEngine
 from vnpy.trader.utility import load_json, save_json
 from vnpy.trader.object import LogData
+from vnpy.trader.event import EVENT_LATEST_TICK
 
 APP_NAME = "RpcService"
 
@@ -109,6 +110,11 @@ class RpcEngine(BaseEngine):
 
     def process_event(self, event: Event):
         """"""
+        # Latest tick event is conflated locally, client side will
+        # generate it again from tick event.
+        if event.type == EVENT_LATEST_TICK:
+            return
+
         if self.server.is_active():
             self.server.publish("", event)
 
@@ -2,13 +2,16 @@
 Event-driven framework of vn.py framework.
 """
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from math import ceil
 from queue import Empty, Queue
-from threading import Thread
-from time import sleep
-from typing import Any, Callable
+from threading import Condition, Lock, Thread
+from time import perf_counter
+from typing import Any, Callable, Dict, Hashable, List, Sequence
 
 EVENT_TIMER = "eTimer"
+EVENT_STATS = "eStats"
+EVENT_SCHEDULE = "eSchedule"
 
 
 class Event:
@@ -27,6 +30,230 @@ class Event:
 # Defines handler function to be used in event engine.
 HandlerType = Callable[[Event], None]
 
+# Defines function returning the shard key of an event in worker mode.
+ShardKeyType = Callable[[Event], Any]
+
+
+def get_vt_symbol_key(event: Event):
+    """
+    Default shard key: vt_symbol of event data if available.
+
+    Events without vt_symbol (timer, log, ...) all share the None key.
+    """
+    return getattr(event.data, "vt_symbol", None)
+
+
+def get_handler_name(handler: HandlerType) -> str:
+    """
+    Get readable name of handler function used in profiling stats.
+    """
+    return getattr(handler, "__qualname__", repr(handler))
+
+
+class LatencyStats:
+    """
+    Call count and recent latency samples (in seconds) of an event
+    type or a handler function.
+    """
+
+    def __init__(self, size: int = 1000):
+        """"""
+        self.count = 0
+        self.max = 0
+        self.samples = deque(maxlen=size)
+
+    def update(self, latency: float):
+        """
+        Add a new latency sample.
+        """
+        self.count += 1
+        self.samples.append(latency)
+
+        if latency > self.max:
+            self.max = latency
+
+    def get_result(self) -> dict:
+        """
+        Get count, p50/p99 of recent samples and max of all samples.
+        """
+        samples = sorted(self.samples)
+        if samples:
+            n = len(samples)
+            p50 = samples[int(n * 0.5)]
+            p99 = samples[min(int(n * 0.99), n - 1)]
+        else:
+            p50 = p99 = 0
+
+        return {
+            "count": self.count,
+            "p50": p50,
+            "p99": p99,
+            "max": self.max
+        }
+
+
+class Timer:
+    """
+    Timer scheduled in timer wheel. Expire time and interval
+    are both in milliseconds.
+    """
+
+    def __init__(
+        self,
+        timer_id: int,
+        expire: int,
+        interval: int,
+        callback: Callable[[], None]
+    ):
+        """"""
+        self.timer_id = timer_id
+        self.expire = expire
+        self.interval = interval
+        self.callback = callback
+        self.active = True
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel with 1 millisecond tick.
+
+    The lowest level has 2^8 slots of 1 millisecond, and every upper
+    level has 2^6 slots each covering one round of the level below.
+    Timers far in future are put in upper levels and cascaded down
+    when their slot comes, so adding and expiring a timer are both O(1).
+    """
+
+    def __init__(self, level_bits: Sequence[int] = (8, 6, 6, 6, 6)):
+        """"""
+        self.current = 0     # Next tick to be processed
+        self.count = 0       # Number of timers in wheel
+
+        self._levels = []
+        shift = 0
+        for bits in level_bits:
+            slots = [[] for _ in range(1 << bits)]
+            self._levels.append((shift, (1 << bits) - 1, slots))
+            shift += bits
+
+        self._max_delta = (1 << shift) - 1
+
+    def add(self, timer: Timer):
+        """
+        Add a timer into wheel.
+        """
+        self.count += 1
+        self._insert(timer)
+
+    def _insert(self, timer: Timer):
+        """
+        Put timer into the slot of level according to its expire time.
+        """
+        delta = timer.expire - self.current
+        if delta < 0:
+            delta = 0
+        elif delta > self._max_delta:
+            delta = self._max_delta
+        expire = self.current + delta
+
+        for shift, mask, slots in self._levels:
+            if delta < (mask + 1) << shift:
+                slots[(expire >> shift) & mask].append(timer)
+                return
+
+    def _cascade(self):
+        """
+        Move timers of current slots in upper levels down to lower levels.
+        """
+        for shift, mask, slots in self._levels[1:]:
+            index = (self.current >> shift) & mask
+
+            timers = slots[index]
+            slots[index] = []
+            for timer in timers:
+                self._insert(timer)
+
+            if index:
+                break
+
+    def advance(self, tick: int) -> List[Timer]:
+        """
+        Process all ticks until the tick specified, and return
+        timers expired.
+        """
+        expired = []
+        shift, mask, slots = self._levels[0]
+
+        while self.current <= tick:
+            index = self.current & mask
+            if not index:
+                self._cascade()
+
+            slot = slots[index]
+            if slot:
+                expired.extend(slot)
+                slot.clear()
+
+            self.current += 1
+
+        self.count -= len(expired)
+        return expired
+
+    def get_next_delay(self) -> int:
+        """
+        Get milliseconds before next tick which needs to be processed.
+        Return -1 if wheel is empty.
+        """
+        if not self.count:
+            return -1
+
+        shift, mask, slots = self._levels[0]
+        base = self.current & mask
+
+        for i in range(mask + 1 - base):
+            if slots[base + i]:
+                return i
+
+        # Wake up for cascading at next round of the lowest level.
+        return mask + 1 - base
+
+
+class EventBatchQueue:
+    """
+    Unbounded FIFO queue which can be drained in batches, so that
+    the consumer only needs to acquire the lock once for many events.
+    """
+
+    def __init__(self):
+        """"""
+        self._deque = deque()
+        self._condition = Condition()
+
+    def put(self, event: Event):
+        """
+        Put an event object into queue.
+        """
+        with self._condition:
+            self._deque.append(event)
+            self._condition.notify()
+
+    def get_batch(self, size: int, timeout: float) -> List[Event]:
+        """
+        Get at most size events from queue. Wait by timeout seconds
+        if queue is empty, then return empty list if still nothing.
+        """
+        with self._condition:
+            if not self._deque:
+                self._condition.wait(timeout)
+
+            count = min(size, len(self._deque))
+            return [self._deque.popleft() for _ in range(count)]
+
+    def qsize(self) -> int:
+        """
+        Return number of events waiting in queue.
+        """
+        return len(self._deque)
+
 
 class EventEngine:
     """
@@ -35,9 +262,43 @@ class EventEngine:
 
     It also generates timer event by every interval seconds,
     which can be used for timing purpose.
+
+    By default all events are processed one by one on a single
+    thread. If worker_count is larger than 0, events are sharded
+    by shard_key (vt_symbol of event data by default) into worker
+    threads, each of which drains its own queue in batches of at
+    most batch_size. Events with the same key are always processed
+    in order by the same worker, while events with different keys
+    may be processed in parallel, so handlers must be thread-safe
+    in this mode.
+
+    Events put by put_latest are conflated by key: if an event with
+    the same type and key is still waiting in queue, its data is
+    replaced by the new one instead of enqueuing another event, so
+    that slow handlers only see the latest data. The merged event keeps
+    its original position in queue, so its data may be newer than
+    events put after it.
+
+    If profile_interval is larger than 0, one of every profile_interval
+    events is sampled for enqueue-to-dispatch latency and execution time
+    of each handler. Stats snapshot can be got from get_stats, and is
+    also pushed as EVENT_STATS event on every timer event.
+
+    Callbacks can be scheduled with millisecond resolution by
+    schedule_once and schedule_every, which are driven by a timer
+    wheel together with the timer event. Scheduled callbacks are
+    called on the event processing thread (worker of None key in
+    worker mode), same as event handlers.
     """
 
-    def __init__(self, interval: int = 1):
+    def __init__(
+        self,
+        interval: int = 1,
+        worker_count: int = 0,
+        batch_size: int = 100,
+        shard_key: ShardKeyType = get_vt_symbol_key,
+        profile_interval: int = 0
+    ):
         """
         Timer event is generated every 1 second by default, if
         interval not specified.
@@ -47,9 +308,40 @@ class EventEngine:
         self._active = False
         self._thread = Thread(target=self._run)
         self._timer = Thread(target=self._run_timer)
+        self._timer_condition = Condition()
+        self._timer_wheel = TimerWheel()
+        self._timer_start = perf_counter()
+        self._timer_count = 0
+        self._timers: Dict[int, Timer] = {}
         self._handlers = defaultdict(list)
         self._general_handlers = []
 
+        self._batch_size = batch_size
+        self._shard_key = shard_key
+        self._worker_queues = [EventBatchQueue() for _ in range(worker_count)]
+        self._workers = [
+            Thread(target=self._run_worker, args=(queue,))
+            for queue in self._worker_queues
+        ]
+
+        self._latest_lock = Lock()
+        self._latest_types = set()
+        self._latest_events: Dict[tuple, Event] = {}
+        self._merged_counts = defaultdict(int)
+
+        self._profile_interval = profile_interval
+        self._stats_lock = Lock()       # stats are updated by all workers
+        self._profile_count = 0
+        self._max_queue_depth = 0
+        self._event_stats = defaultdict(LatencyStats)
+        self._handler_stats = defaultdict(lambda: defaultdict(LatencyStats))
+
+        if profile_interval:
+            self.register(EVENT_TIMER, self._process_stats_timer)
+
+        # Timer event is a periodic timer without callback.
+        self._add_timer(interval * 1000, interval * 1000, None)
+
     def _run(self):
         """
         Get event from queue and then process it.
@@ -61,6 +353,15 @@ class EventEngine:
             except Empty:
                 pass
 
+    def _run_worker(self, queue: EventBatchQueue):
+        """
+        Get batch of events from worker queue and then process them.
+        """
+        while self._active:
+            events = queue.get_batch(self._batch_size, 1)
+            for event in events:
+                self._process(event)
+
     def _process(self, event: Event):
         """
         First ditribute event to those handlers registered listening
@@ -69,27 +370,180 @@ class EventEngine:
         Then distrubute event to those general handlers which listens
         to all types.
         """
+        if event.type == EVENT_SCHEDULE:
+            self._process_schedule(event.data)
+            return
+
+        if event.type in self._latest_types:
+            self._release_latest(event)
+
+        if self._profile_interval:
+            with self._stats_lock:
+                self._profile_count += 1
+                sampled = not self._profile_count % self._profile_interval
+
+            if sampled:
+                self._process_profiled(event)
+                return
+
         if event.type in self._handlers:
             [handler(event) for handler in self._handlers[event.type]]
 
         if self._general_handlers:
             [handler(event) for handler in self._general_handlers]
 
+    def _process_profiled(self, event: Event):
+        """
+        Same as _process, but also record latency of event and
+        execution time of every handler.
+        """
+        start = perf_counter()
+
+        put_time = getattr(event, "put_time", start)
+        latency = start - put_time
+        depth = self.get_queue_depth()
+
+        # Handlers are called without lock, and costs are recorded after
+        handlers = self._handlers.get(event.type, []) + self._general_handlers
+        costs = []
+
+        for handler in handlers:
+            handler(event)
+
+            end = perf_counter()
+            costs.append((get_handler_name(handler), end - start))
+            start = end
+
+        with self._stats_lock:
+            self._event_stats[event.type].update(latency)
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+
+            handler_stats = self._handler_stats[event.type]
+            for name, cost in costs:
+                handler_stats[name].update(cost)
+
+    def _process_stats_timer(self, event: Event):
+        """
+        Push stats snapshot on timer event.
+        """
+        stats = self.get_stats()
+        self.put(Event(EVENT_STATS, stats))
+
+    def _process_schedule(self, timer: Timer):
+        """
+        Call callback of timer expired, unless cancelled after expiry.
+        """
+        if not timer.active:
+            return
+
+        if not timer.interval:
+            timer.active = False
+
+        timer.callback()
+
     def _run_timer(self):
         """
-        Sleep by interval second(s) and then generate a timer event.
+        Wait until next timer in timer wheel expires, then generate
+        timer event or scheduled callback event.
         """
-        while self._active:
-            sleep(self._interval)
-            event = Event(EVENT_TIMER)
-            self.put(event)
+        with self._timer_condition:
+            while self._active:
+                tick = self._get_tick()
+                timers = self._timer_wheel.advance(tick)
+
+                for timer in timers:
+                    if not timer.active:
+                        continue
+
+                    if timer.interval:
+                        # Skip missed rounds if timer thread lagged behind
+                        timer.expire = max(timer.expire + timer.interval, tick + 1)
+                        self._timer_wheel.add(timer)
+                    else:
+                        self._timers.pop(timer.timer_id, None)
+
+                    if timer.callback:
+                        self.put(Event(EVENT_SCHEDULE, timer))
+                    else:
+                        self.put(Event(EVENT_TIMER))
+
+                delay = self._timer_wheel.get_next_delay()
+                if delay < 0:
+                    self._timer_condition.wait(1)
+                else:
+                    wakeup = (self._timer_wheel.current + delay) / 1000
+                    timeout = wakeup - (perf_counter() - self._timer_start)
+                    if timeout > 0:
+                        self._timer_condition.wait(timeout)
+
+    def _get_tick(self) -> int:
+        """
+        Get milliseconds passed since event engine created.
+        """
+        return int((perf_counter() - self._timer_start) * 1000)
+
+    def _add_timer(
+        self,
+        delay: int,
+        interval: int,
+        callback: Callable[[], None]
+    ) -> int:
+        """
+        Add a new timer into timer wheel and wake up timer thread.
+        """
+        with self._timer_condition:
+            self._timer_count += 1
+            timer_id = self._timer_count
+
+            # Round up so that timer never expires earlier than delay
+            elapsed = (perf_counter() - self._timer_start) * 1000
+            expire = ceil(elapsed + max(delay, 1))
+            timer = Timer(timer_id, expire, interval, callback)
+
+            self._timers[timer_id] = timer
+            self._timer_wheel.add(timer)
+            self._timer_condition.notify()
+
+        return timer_id
+
+    def schedule_once(self, delay: int, callback: Callable[[], None]) -> int:
+        """
+        Call callback once after delay milliseconds.
+
+        :return: timer id which can be used for cancel_timer
+        """
+        return self._add_timer(delay, 0, callback)
+
+    def schedule_every(self, interval: int, callback: Callable[[], None]) -> int:
+        """
+        Call callback every interval milliseconds until cancelled.
+
+        :return: timer id which can be used for cancel_timer
+        """
+        return self._add_timer(interval, max(interval, 1), callback)
+
+    def cancel_timer(self, timer_id: int):
+        """
+        Cancel a scheduled timer. Callback will not be called any more,
+        even if timer already expired but not processed yet.
+        """
+        with self._timer_condition:
+            timer = self._timers.pop(timer_id, None)
+            if timer:
+                timer.active = False
 
     def start(self):
         """
         Start event engine to process events and generate timer events.
         """
         self._active = True
-        self._thread.start()
+
+        if self._workers:
+            for worker in self._workers:
+                worker.start()
+        else:
+            self._thread.start()
+
         self._timer.start()
 
     def stop(self):
@@ -97,14 +551,104 @@ class EventEngine:
         Stop event engine.
         """
         self._active = False
+
+        with self._timer_condition:
+            self._timer_condition.notify()
         self._timer.join()
-        self._thread.join()
+
+        if self._workers:
+            for worker in self._workers:
+                worker.join()
+        else:
+            self._thread.join()
 
     def put(self, event: Event):
         """
         Put an event object into event queue.
         """
-        self._queue.put(event)
+        if self._profile_interval:
+            event.put_time = perf_counter()
+
+        if self._worker_queues:
+            key = self._shard_key(event)
+            ix = hash(key) % len(self._worker_queues)
+            self._worker_queues[ix].put(event)
+        else:
+            self._queue.put(event)
+
+    def put_latest(self, event: Event, key: Hashable):
+        """
+        Put an event object into event queue, or merge it into the
+        pending one with the same type and key.
+        """
+        with self._latest_lock:
+            slot = (event.type, key)
+            pending = self._latest_events.get(slot, None)
+
+            if pending:
+                pending.data = event.data
+                self._merged_counts[event.type] += 1
+                return
+
+            event.key = key
+            self._latest_types.add(event.type)
+            self._latest_events[slot] = event
+
+        self.put(event)
+
+    def _release_latest(self, event: Event):
+        """
+        Remove conflated event from pending dict before it is processed,
+        so that later data of the same key is enqueued again. Events of
+        the same type put by put (without key) are not affected.
+        """
+        slot = (event.type, getattr(event, "key", None))
+
+        with self._latest_lock:
+            if self._latest_events.get(slot, None) is event:
+                self._latest_events.pop(slot)
+
+    def get_merged_count(self, type: str) -> int:
+        """
+        Get number of events merged (dropped) by put_latest for a
+        specific event type.
+        """
+        return self._merged_counts[type]
+
+    def get_queue_depth(self) -> int:
+        """
+        Get number of events waiting to be processed.
+        """
+        if self._worker_queues:
+            return sum(queue.qsize() for queue in self._worker_queues)
+        else:
+            return self._queue.qsize()
+
+    def get_stats(self) -> dict:
+        """
+        Get snapshot of profiling stats. All time values are in seconds,
+        and counts only include sampled events.
+        """
+        events = {}
+
+        with self._stats_lock:
+            for type, stats in self._event_stats.items():
+                data = stats.get_result()
+                data["merged"] = self._merged_counts[type]
+                data["handlers"] = {
+                    name: handler_stats.get_result()
+                    for name, handler_stats in self._handler_stats[type].items()
+                }
+                events[type] = data
+
+            max_queue_depth = self._max_queue_depth
+
+        return {
+            "profile_interval": self._profile_interval,
+            "queue_depth": self.get_queue_depth(),
+            "max_queue_depth": max_queue_depth,
+            "events": events
+        }
 
     def register(self, type: str, handler: HandlerType):
         """
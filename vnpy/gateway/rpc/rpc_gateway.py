@@ -1,6 +1,7 @@
 from vnpy.event import Event
 from vnpy.rpc import RpcClient
 from vnpy.trader.gateway import BaseGateway
+from vnpy.trader.event import EVENT_TICK, EVENT_LATEST_TICK
 from vnpy.trader.object import (
     SubscribeRequest,
     CancelRequest,
@@ -113,4 +114,8 @@ class RpcGateway(BaseGateway):
         if hasattr(data, "gateway_name"):
             data.gateway_name = self.gateway_name
 
+        if event.type == EVENT_TICK:
+            latest_event = Event(EVENT_LATEST_TICK, data)
+            self.event_engine.put_latest(latest_event, data.vt_symbol)
+
         self.event_engine.put(event)
@@ -1,12 +1,39 @@
-import os
+from threading import Lock
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from vnpy.trader.database.database import BaseDatabaseManager
 
-if "VNPY_TESTING" not in os.environ:
-    from vnpy.trader.setting import get_settings
-    from .initialize import init
 
-    settings = get_settings("database.")
-    database_manager: "BaseDatabaseManager" = init(settings=settings)
+class LazyDatabaseManager:
+    """
+    Database manager created from settings on first use.
+
+    Importing modules which use database_manager (e.g. strategy modules
+    imported by strategy shard processes) does not connect to database.
+    """
+
+    def __init__(self):
+        """"""
+        self.manager: "BaseDatabaseManager" = None
+        self.lock = Lock()
+
+    def get_manager(self) -> "BaseDatabaseManager":
+        """"""
+        if self.manager is None:
+            with self.lock:
+                if self.manager is None:
+                    from vnpy.trader.setting import get_settings
+                    from .initialize import init
+
+                    settings = get_settings("database.")
+                    self.manager = init(settings=settings)
+
+        return self.manager
+
+    def __getattr__(self, name: str):
+        """"""
+        return getattr(self.get_manager(), name)
+
+
+database_manager: "BaseDatabaseManager" = LazyDatabaseManager()
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Sequence, TYPE_CHECKING
+from itertools import islice
+from typing import Dict, Iterable, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+from pandas import DataFrame
 
 if TYPE_CHECKING:
     from vnpy.trader.constant import Interval, Exchange  # noqa
@@ -13,6 +17,41 @@ class Driver(Enum):
     MYSQL = "mysql"
     POSTGRESQL = "postgresql"
     MONGODB = "mongodb"
+    NUMPY = "numpy"
+
+
+# Columns returned by load_bar_arrays besides datetime
+BAR_ARRAY_FIELDS = [
+    "open_price",
+    "high_price",
+    "low_price",
+    "close_price",
+    "volume",
+    "open_interest",
+]
+
+
+def to_bar_arrays(columns: Dict[str, Sequence]) -> Dict[str, np.ndarray]:
+    """
+    Convert bar columns into numpy arrays: datetime64[us] for datetime
+    column and float64 for others.
+    """
+    arrays = {"datetime": np.array(columns["datetime"], dtype="datetime64[us]")}
+    for name in BAR_ARRAY_FIELDS:
+        arrays[name] = np.array(columns[name], dtype="float64")
+    return arrays
+
+
+def iter_batch(datas: Iterable, batch_size: int):
+    """
+    Split an iterable into lists of at most batch_size items.
+    """
+    iterator = iter(datas)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
 
 
 class BaseDatabaseManager(ABC):
@@ -28,6 +67,44 @@ class BaseDatabaseManager(ABC):
     ) -> Sequence["BarData"]:
         pass
 
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: "Exchange",
+        interval: "Interval",
+        start: datetime,
+        end: datetime
+    ) -> Dict[str, np.ndarray]:
+        """
+        Load bar data as column arrays keyed by datetime and BAR_ARRAY_FIELDS,
+        without creating BarData objects.
+
+        This default implementation converts result of load_bar_data,
+        drivers should override it with one reading directly from cursor.
+        """
+        bars = self.load_bar_data(symbol, exchange, interval, start, end)
+
+        columns = {"datetime": [bar.datetime for bar in bars]}
+        for name in BAR_ARRAY_FIELDS:
+            columns[name] = [getattr(bar, name) for bar in bars]
+
+        return to_bar_arrays(columns)
+
+    def load_bar_df(
+        self,
+        symbol: str,
+        exchange: "Exchange",
+        interval: "Interval",
+        start: datetime,
+        end: datetime
+    ) -> DataFrame:
+        """
+        Load bar data as DataFrame indexed by datetime.
+        """
+        arrays = self.load_bar_arrays(symbol, exchange, interval, start, end)
+        df = DataFrame(arrays).set_index("datetime")
+        return df
+
     @abstractmethod
     def load_tick_data(
         self,
@@ -52,6 +129,40 @@ class BaseDatabaseManager(ABC):
     ):
         pass
 
+    def save_bar_data_stream(
+        self,
+        datas: Iterable["BarData"],
+        batch_size: int = 10000
+    ) -> int:
+        """
+        Save bar data from an iterator batch by batch, so that
+        all data need not be held in memory at once.
+
+        :return: number of bars saved
+        """
+        count = 0
+        for batch in iter_batch(datas, batch_size):
+            self.save_bar_data(batch)
+            count += len(batch)
+        return count
+
+    def save_tick_data_stream(
+        self,
+        datas: Iterable["TickData"],
+        batch_size: int = 10000
+    ) -> int:
+        """
+        Save tick data from an iterator batch by batch, so that
+        all data need not be held in memory at once.
+
+        :return: number of ticks saved
+        """
+        count = 0
+        for batch in iter_batch(datas, batch_size):
+            self.save_tick_data(batch)
+            count += len(batch)
+        return count
+
     @abstractmethod
     def get_newest_bar_data(
         self,
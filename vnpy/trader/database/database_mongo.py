@@ -1,12 +1,15 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Sequence
+from typing import Dict, Optional, Sequence
+
+import numpy as np
 
 from mongoengine import DateTimeField, Document, FloatField, StringField, connect
+from pymongo import UpdateOne
 
 from vnpy.trader.constant import Exchange, Interval
 from vnpy.trader.object import BarData, TickData
-from .database import BaseDatabaseManager, Driver
+from .database import BaseDatabaseManager, Driver, BAR_ARRAY_FIELDS, to_bar_arrays
 
 
 def init(_: Driver, settings: dict):
@@ -31,7 +34,8 @@ def init(_: Driver, settings: dict):
         authentication_source=authentication_source,
     )
 
-    return MongoManager()
+    batch_size = settings.get("batch_size", 1000)
+    return MongoManager(batch_size)
 
 
 class DbBarData(Document):
@@ -262,6 +266,9 @@ class DbTickData(Document):
 
 class MongoManager(BaseDatabaseManager):
 
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+
     def load_bar_data(
         self,
         symbol: str,
@@ -280,6 +287,36 @@ class MongoManager(BaseDatabaseManager):
         data = [db_bar.to_bar() for db_bar in s]
         return data
 
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+    ) -> Dict[str, np.ndarray]:
+        names = ["datetime"] + BAR_ARRAY_FIELDS
+        projection = {name: 1 for name in names}
+        projection["_id"] = 0
+
+        cursor = DbBarData._get_collection().find(
+            {
+                "symbol": symbol,
+                "exchange": exchange.value,
+                "interval": interval.value,
+                "datetime": {"$gte": start, "$lte": end},
+            },
+            projection,
+        ).sort("datetime", 1)
+
+        columns = {name: [] for name in names}
+        appends = [(name, columns[name].append) for name in names]
+        for document in cursor:
+            for name, append in appends:
+                append(document.get(name, 0))
+
+        return to_bar_arrays(columns)
+
     def load_tick_data(
         self, symbol: str, exchange: Exchange, start: datetime, end: datetime
     ) -> Sequence[TickData]:
@@ -293,33 +330,47 @@ class MongoManager(BaseDatabaseManager):
         return data
 
     @staticmethod
-    def to_update_param(d):
-        return {
-            "set__" + k: v.value if isinstance(v, Enum) else v
+    def to_document(document_class, d):
+        """
+        Convert data into mongo document, with values converted by fields
+        of document class (e.g. str into float) as mongoengine does.
+        """
+        values = {
+            k: v.value if isinstance(v, Enum) else v
             for k, v in d.__dict__.items()
         }
+        values.pop("gateway_name")
+        values.pop("vt_symbol")
+        return document_class(**values).to_mongo().to_dict()
 
-    def save_bar_data(self, datas: Sequence[BarData]):
+    def bulk_upsert(self, document_class, datas: Sequence, keys: Sequence[str]):
+        """
+        Upsert data with unordered bulk write, batch_size requests per round trip.
+        """
+        collection = document_class._get_collection()
+
+        requests = []
         for d in datas:
-            updates = self.to_update_param(d)
-            updates.pop("set__gateway_name")
-            updates.pop("set__vt_symbol")
-            (
-                DbBarData.objects(
-                    symbol=d.symbol, interval=d.interval.value, datetime=d.datetime
-                ).update_one(upsert=True, **updates)
-            )
+            document = self.to_document(document_class, d)
+            key = {k: document[k] for k in keys}
+            requests.append(UpdateOne(key, {"$set": document}, upsert=True))
+
+            if len(requests) >= self.batch_size:
+                collection.bulk_write(requests, ordered=False)
+                requests = []
+
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+
+    def save_bar_data(self, datas: Sequence[BarData]):
+        self.bulk_upsert(
+            DbBarData, datas, ("symbol", "exchange", "interval", "datetime")
+        )
 
     def save_tick_data(self, datas: Sequence[TickData]):
-        for d in datas:
-            updates = self.to_update_param(d)
-            updates.pop("set__gateway_name")
-            updates.pop("set__vt_symbol")
-            (
-                DbTickData.objects(
-                    symbol=d.symbol, exchange=d.exchange.value, datetime=d.datetime
-                ).update_one(upsert=True, **updates)
-            )
+        self.bulk_upsert(
+            DbTickData, datas, ("symbol", "exchange", "datetime")
+        )
 
     def get_newest_bar_data(
         self, symbol: str, exchange: "Exchange", interval: "Interval"
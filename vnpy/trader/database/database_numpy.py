@@ -0,0 +1,454 @@
+""""""
+import os
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData, TickData
+from vnpy.trader.utility import get_folder_path
+from .database import BaseDatabaseManager, Driver, BAR_ARRAY_FIELDS
+
+
+def init(_: Driver, settings: dict):
+    database = settings["database"]
+    path = get_folder_path(database)
+    return NumpyManager(path)
+
+
+BAR_COLUMNS = [
+    ("datetime", "int64"),
+    ("volume", "float64"),
+    ("open_interest", "float64"),
+    ("open_price", "float64"),
+    ("high_price", "float64"),
+    ("low_price", "float64"),
+    ("close_price", "float64"),
+]
+
+TICK_COLUMNS = [
+    ("datetime", "int64"),
+    ("name", "U32"),
+    ("volume", "float64"),
+    ("open_interest", "float64"),
+    ("last_price", "float64"),
+    ("last_volume", "float64"),
+    ("limit_up", "float64"),
+    ("limit_down", "float64"),
+    ("open_price", "float64"),
+    ("high_price", "float64"),
+    ("low_price", "float64"),
+    ("pre_close", "float64"),
+    ("bid_price_1", "float64"),
+    ("bid_price_2", "float64"),
+    ("bid_price_3", "float64"),
+    ("bid_price_4", "float64"),
+    ("bid_price_5", "float64"),
+    ("ask_price_1", "float64"),
+    ("ask_price_2", "float64"),
+    ("ask_price_3", "float64"),
+    ("ask_price_4", "float64"),
+    ("ask_price_5", "float64"),
+    ("bid_volume_1", "float64"),
+    ("bid_volume_2", "float64"),
+    ("bid_volume_3", "float64"),
+    ("bid_volume_4", "float64"),
+    ("bid_volume_5", "float64"),
+    ("ask_volume_1", "float64"),
+    ("ask_volume_2", "float64"),
+    ("ask_volume_3", "float64"),
+    ("ask_volume_4", "float64"),
+    ("ask_volume_5", "float64"),
+]
+
+
+# Device names reserved by Windows, which can not be used as folder name
+RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL"} | {
+    f"{prefix}{i}" for prefix in ["COM", "LPT"] for i in range(1, 10)
+}
+
+
+def escape_symbol(symbol: str) -> str:
+    """
+    Convert symbol into folder name safe on all platforms. Characters
+    other than letters, digits, "_" and "-" (including "." and path
+    separators) are written as %XX of their utf-8 bytes.
+    """
+    def escape(match) -> str:
+        return "".join(f"%{b:02X}" for b in match.group().encode("utf-8"))
+
+    name = re.sub(r"[^A-Za-z0-9_\-]", escape, symbol)
+
+    if name.upper() in RESERVED_NAMES:
+        name = f"%{ord(name[0]):02X}" + name[1:]
+
+    return name
+
+
+def to_timestamp(dt: datetime) -> int:
+    """
+    Convert datetime into int64 microseconds used in datetime column.
+    Timezone info is dropped, same as sql database.
+    """
+    return np.datetime64(dt.replace(tzinfo=None), "us").astype("int64")
+
+
+def to_timestamps(dts: Sequence[datetime]) -> np.ndarray:
+    """
+    Convert list of datetime into datetime column.
+    """
+    dts = [dt.replace(tzinfo=None) for dt in dts]
+    return np.array(dts, dtype="datetime64[us]").astype("int64")
+
+
+def to_datetimes(timestamps: np.ndarray) -> List[datetime]:
+    """
+    Convert datetime column into list of datetime.
+    """
+    return timestamps.astype("datetime64[us]").tolist()
+
+
+def sort_unique(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Sort rows by datetime column and remove duplicated datetime,
+    rows later in arrays overwrite earlier ones.
+    """
+    dt = arrays["datetime"]
+    order = np.argsort(dt, kind="stable")
+
+    sorted_dt = dt[order]
+    keep = np.append(sorted_dt[1:] != sorted_dt[:-1], True)
+    index = order[keep]
+
+    return {name: array[index] for name, array in arrays.items()}
+
+
+class ColumnStore:
+    """
+    Columnar storage of one data series in a folder, with one raw
+    binary file for each column.
+
+    Rows are sorted and unique by datetime column. New rows after the
+    last one are appended to column files directly, otherwise all rows
+    are merged in memory and column files are rewritten.
+
+    Column files are memory-mapped for reading, and datetime column
+    is binary searched for range query.
+    """
+
+    def __init__(self, path: Path, columns: Sequence[Tuple[str, str]]):
+        """"""
+        self.path = path
+        self.columns = columns
+
+    def get_filepath(self, name: str) -> Path:
+        """"""
+        return self.path.joinpath(f"{name}.bin")
+
+    def get_count(self) -> int:
+        """
+        Get number of complete rows stored.
+        """
+        counts = []
+
+        for name, dtype in self.columns:
+            filepath = self.get_filepath(name)
+            if not filepath.exists():
+                return 0
+
+            size = filepath.stat().st_size
+            counts.append(size // np.dtype(dtype).itemsize)
+
+        return min(counts)
+
+    def read(self) -> Dict[str, np.ndarray]:
+        """
+        Get read-only memory-mapped arrays of all rows.
+        """
+        count = self.get_count()
+
+        arrays = {}
+        for name, dtype in self.columns:
+            if count:
+                arrays[name] = np.memmap(
+                    self.get_filepath(name),
+                    dtype=dtype,
+                    mode="r",
+                    shape=(count,)
+                )
+            else:
+                arrays[name] = np.empty(0, dtype=dtype)
+
+        return arrays
+
+    def read_range(self, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        """
+        Get memory-mapped arrays of rows with datetime between start and end.
+        """
+        arrays = self.read()
+        dt = arrays["datetime"]
+
+        left = np.searchsorted(dt, to_timestamp(start), "left")
+        right = np.searchsorted(dt, to_timestamp(end), "right")
+
+        return {name: array[left:right] for name, array in arrays.items()}
+
+    def read_last(self) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Get arrays of the newest row, or None if no data.
+        """
+        arrays = self.read()
+        if not len(arrays["datetime"]):
+            return None
+
+        return {name: array[-1:] for name, array in arrays.items()}
+
+    def write(self, arrays: Dict[str, np.ndarray]):
+        """
+        Insert rows into storage, update if datetime exists.
+        """
+        arrays = sort_unique(arrays)
+
+        count = self.get_count()
+        if count:
+            last = self.read_last()["datetime"][0]
+            append = arrays["datetime"][0] > last
+        else:
+            append = True
+
+        if append:
+            self.append(arrays, count)
+        else:
+            self.merge(arrays)
+
+    def append(self, arrays: Dict[str, np.ndarray], count: int):
+        """
+        Append rows to the end of column files.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        for name, dtype in self.columns:
+            filepath = self.get_filepath(name)
+
+            # Drop incomplete rows left by interrupted writing.
+            size = count * np.dtype(dtype).itemsize
+            if filepath.exists() and filepath.stat().st_size != size:
+                os.truncate(filepath, size)
+
+            with open(filepath, "ab") as f:
+                f.write(arrays[name].astype(dtype).tobytes())
+
+    def merge(self, arrays: Dict[str, np.ndarray]):
+        """
+        Merge rows with existing data and rewrite column files.
+        """
+        old_arrays = self.read()
+
+        merged = {}
+        for name, dtype in self.columns:
+            merged[name] = np.concatenate([
+                np.array(old_arrays[name]),
+                arrays[name].astype(dtype)
+            ])
+
+        # Release memory maps before replacing files.
+        del old_arrays
+
+        merged = sort_unique(merged)
+
+        for name, dtype in self.columns:
+            filepath = self.get_filepath(name)
+            temp_path = self.path.joinpath(f"{name}.tmp")
+
+            with open(temp_path, "wb") as f:
+                f.write(merged[name].tobytes())
+            os.replace(temp_path, filepath)
+
+
+class NumpyManager(BaseDatabaseManager):
+    """
+    Database manager which stores each symbol/interval as columnar
+    NumPy files under a folder.
+    """
+
+    def __init__(self, path: Path):
+        """"""
+        self.path = path
+
+    def get_symbol_path(self, symbol: str) -> Path:
+        """"""
+        return self.path.joinpath(escape_symbol(symbol))
+
+    def get_bar_store(self, symbol: str, exchange: Exchange, interval: Interval):
+        """"""
+        path = self.get_symbol_path(symbol).joinpath(
+            exchange.value, f"bar_{interval.value}"
+        )
+        return ColumnStore(path, BAR_COLUMNS)
+
+    def get_tick_store(self, symbol: str, exchange: Exchange):
+        """"""
+        path = self.get_symbol_path(symbol).joinpath(exchange.value, "tick")
+        return ColumnStore(path, TICK_COLUMNS)
+
+    def load_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+    ) -> Sequence[BarData]:
+        store = self.get_bar_store(symbol, exchange, interval)
+        arrays = store.read_range(start, end)
+        return self.to_bars(arrays, symbol, exchange, interval)
+
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+    ) -> Dict[str, np.ndarray]:
+        store = self.get_bar_store(symbol, exchange, interval)
+        arrays = store.read_range(start, end)
+
+        result = {"datetime": arrays["datetime"].astype("datetime64[us]")}
+        for name in BAR_ARRAY_FIELDS:
+            result[name] = np.array(arrays[name])
+        return result
+
+    def load_tick_data(
+        self, symbol: str, exchange: Exchange, start: datetime, end: datetime
+    ) -> Sequence[TickData]:
+        store = self.get_tick_store(symbol, exchange)
+        arrays = store.read_range(start, end)
+        return self.to_ticks(arrays, symbol, exchange)
+
+    def save_bar_data(self, datas: Sequence[BarData]):
+        groups = {}
+        for bar in datas:
+            key = (bar.symbol, bar.exchange, bar.interval)
+            groups.setdefault(key, []).append(bar)
+
+        for (symbol, exchange, interval), bars in groups.items():
+            store = self.get_bar_store(symbol, exchange, interval)
+            arrays = self.to_arrays(bars, BAR_COLUMNS)
+            store.write(arrays)
+
+    def save_tick_data(self, datas: Sequence[TickData]):
+        groups = {}
+        for tick in datas:
+            key = (tick.symbol, tick.exchange)
+            groups.setdefault(key, []).append(tick)
+
+        for (symbol, exchange), ticks in groups.items():
+            store = self.get_tick_store(symbol, exchange)
+            arrays = self.to_arrays(ticks, TICK_COLUMNS)
+            store.write(arrays)
+
+    def get_newest_bar_data(
+        self, symbol: str, exchange: "Exchange", interval: "Interval"
+    ) -> Optional["BarData"]:
+        store = self.get_bar_store(symbol, exchange, interval)
+        arrays = store.read_last()
+        if arrays:
+            return self.to_bars(arrays, symbol, exchange, interval)[0]
+        return None
+
+    def get_newest_tick_data(
+        self, symbol: str, exchange: "Exchange"
+    ) -> Optional["TickData"]:
+        store = self.get_tick_store(symbol, exchange)
+        arrays = store.read_last()
+        if arrays:
+            return self.to_ticks(arrays, symbol, exchange)[0]
+        return None
+
+    def clean(self, symbol: str):
+        path = self.get_symbol_path(symbol)
+        if path.exists():
+            shutil.rmtree(path)
+
+    @staticmethod
+    def to_arrays(datas: Sequence, columns: Sequence[Tuple[str, str]]):
+        """
+        Convert list of data objects into column arrays. String longer
+        than the fixed width of its column is rejected instead of being
+        truncated.
+        """
+        arrays = {"datetime": to_timestamps([d.datetime for d in datas])}
+
+        for name, dtype in columns[1:]:
+            values = [getattr(d, name) for d in datas]
+
+            if dtype.startswith("U"):
+                width = int(dtype[1:])
+                for value in values:
+                    if len(value) > width:
+                        raise ValueError(
+                            f"Value of {name} is longer than {width} characters: {value}"
+                        )
+
+            arrays[name] = np.array(values, dtype=dtype)
+
+        return arrays
+
+    @staticmethod
+    def to_bars(
+        arrays: Dict[str, np.ndarray],
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval
+    ) -> List[BarData]:
+        """
+        Convert column arrays into list of BarData.
+        """
+        dts = to_datetimes(arrays["datetime"])
+        names = [name for name, dtype in BAR_COLUMNS[1:]]
+        columns = [arrays[name].tolist() for name in names]
+
+        bars = []
+        for dt, values in zip(dts, zip(*columns)):
+            bar = BarData(
+                symbol=symbol,
+                exchange=exchange,
+                datetime=dt,
+                interval=interval,
+                gateway_name="DB",
+                **dict(zip(names, values))
+            )
+            bars.append(bar)
+
+        return bars
+
+    @staticmethod
+    def to_ticks(
+        arrays: Dict[str, np.ndarray],
+        symbol: str,
+        exchange: Exchange
+    ) -> List[TickData]:
+        """
+        Convert column arrays into list of TickData.
+        """
+        dts = to_datetimes(arrays["datetime"])
+        names = [name for name, dtype in TICK_COLUMNS[1:]]
+        columns = [arrays[name].tolist() for name in names]
+
+        ticks = []
+        for dt, values in zip(dts, zip(*columns)):
+            tick = TickData(
+                symbol=symbol,
+                exchange=exchange,
+                datetime=dt,
+                gateway_name="DB",
+                **dict(zip(names, values))
+            )
+            ticks.append(tick)
+
+        return ticks
@@ -1,6 +1,8 @@
 """"""
 from datetime import datetime
-from typing import List, Optional, Sequence, Type
+from typing import Dict, List, Optional, Sequence, Type
+
+import numpy as np
 
 from peewee import (
     AutoField,
@@ -18,7 +20,18 @@ from peewee import (
 from vnpy.trader.constant import Exchange, Interval
 from vnpy.trader.object import BarData, TickData
 from vnpy.trader.utility import get_file_path
-from .database import BaseDatabaseManager, Driver
+from .database import BaseDatabaseManager, Driver, BAR_ARRAY_FIELDS, to_bar_arrays
+
+
+# Rows in one multi-row insert statement
+DEFAULT_BATCH_SIZES = {
+    Driver.SQLITE: 50,
+    Driver.MYSQL: 50,
+    Driver.POSTGRESQL: 1000,
+}
+
+# Max number of parameters in one PostgreSQL statement
+POSTGRESQL_MAX_PARAMS = 32767
 
 
 def init(driver: Driver, settings: dict):
@@ -30,7 +43,8 @@ def init(driver: Driver, settings: dict):
     assert driver in init_funcs
 
     db = init_funcs[driver](settings)
-    bar, tick = init_models(db, driver)
+    batch_size = settings.get("batch_size", DEFAULT_BATCH_SIZES[driver])
+    bar, tick = init_models(db, driver, batch_size)
     return SqlManager(bar, tick)
 
 
@@ -61,7 +75,44 @@ class ModelBase(Model):
         return self.__data__
 
 
-def init_models(db: Database, driver: Driver):
+def upsert_all(
+    model: Type[Model],
+    dicts: List[dict],
+    driver: Driver,
+    batch_size: int,
+    conflict_target: tuple,
+):
+    """
+    Insert rows with multi-row insert statements of batch_size rows,
+    update if conflicts with unique index.
+    """
+    # Every row of multi-row insert must have the same columns
+    names = [field.name for field in model._meta.sorted_fields if field.name != "id"]
+    dicts = [{name: d.get(name, None) for name in names} for d in dicts]
+
+    if driver is Driver.POSTGRESQL:
+        keys = [field.name for field in conflict_target]
+        fields = [
+            field for field in model._meta.sorted_fields
+            if field.name != "id" and field.name not in keys
+        ]
+        batch_size = min(batch_size, POSTGRESQL_MAX_PARAMS // len(names))
+
+        # One statement cannot update the same row twice, keep the last one
+        unique = {tuple(d[key] for key in keys): d for d in dicts}
+        dicts = list(unique.values())
+
+        for c in chunked(dicts, batch_size):
+            model.insert_many(c).on_conflict(
+                conflict_target=conflict_target,
+                preserve=fields,
+            ).execute()
+    else:
+        for c in chunked(dicts, batch_size):
+            model.insert_many(c).on_conflict_replace().execute()
+
+
+def init_models(db: Database, driver: Driver, batch_size: int = 50):
     class DbBarData(ModelBase):
         """
         Candlestick bar data for database storage.
@@ -132,21 +183,18 @@ def init_models(db: Database, driver: Driver):
             """
             dicts = [i.to_dict() for i in objs]
             with db.atomic():
-                if driver is Driver.POSTGRESQL:
-                    for bar in dicts:
-                        DbBarData.insert(bar).on_conflict(
-                            update=bar,
-                            conflict_target=(
-                                DbBarData.symbol,
-                                DbBarData.exchange,
-                                DbBarData.interval,
-                                DbBarData.datetime,
-                            ),
-                        ).execute()
-                else:
-                    for c in chunked(dicts, 50):
-                        DbBarData.insert_many(
-                            c).on_conflict_replace().execute()
+                upsert_all(
+                    DbBarData,
+                    dicts,
+                    driver,
+                    batch_size,
+                    conflict_target=(
+                        DbBarData.symbol,
+                        DbBarData.exchange,
+                        DbBarData.interval,
+                        DbBarData.datetime,
+                    ),
+                )
 
     class DbTickData(ModelBase):
         """
@@ -305,19 +353,17 @@ def init_models(db: Database, driver: Driver):
         def save_all(objs: List["DbTickData"]):
             dicts = [i.to_dict() for i in objs]
             with db.atomic():
-                if driver is Driver.POSTGRESQL:
-                    for tick in dicts:
-                        DbTickData.insert(tick).on_conflict(
-                            update=tick,
-                            conflict_target=(
-                                DbTickData.symbol,
-                                DbTickData.exchange,
-                                DbTickData.datetime,
-                            ),
-                        ).execute()
-                else:
-                    for c in chunked(dicts, 50):
-                        DbTickData.insert_many(c).on_conflict_replace().execute()
+                upsert_all(
+                    DbTickData,
+                    dicts,
+                    driver,
+                    batch_size,
+                    conflict_target=(
+                        DbTickData.symbol,
+                        DbTickData.exchange,
+                        DbTickData.datetime,
+                    ),
+                )
 
     db.connect()
     db.create_tables([DbBarData, DbTickData])
@@ -352,6 +398,33 @@ class SqlManager(BaseDatabaseManager):
         data = [db_bar.to_bar() for db_bar in s]
         return data
 
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+    ) -> Dict[str, np.ndarray]:
+        names = ["datetime"] + BAR_ARRAY_FIELDS
+        fields = [getattr(self.class_bar, name) for name in names]
+
+        s = (
+            self.class_bar.select(*fields)
+                .where(
+                (self.class_bar.symbol == symbol)
+                & (self.class_bar.exchange == exchange.value)
+                & (self.class_bar.interval == interval.value)
+                & (self.class_bar.datetime >= start)
+                & (self.class_bar.datetime <= end)
+            )
+            .order_by(self.class_bar.datetime)
+            .tuples()
+        )
+
+        columns = list(zip(*s)) or [[] for name in names]
+        return to_bar_arrays(dict(zip(names, columns)))
+
     def load_tick_data(
         self, symbol: str, exchange: Exchange, start: datetime, end: datetime
     ) -> Sequence[TickData]:
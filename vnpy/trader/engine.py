@@ -14,7 +14,7 @@ from typing import Any, Sequence, Type
 from vnpy.event import Event, EventEngine
 from .app import BaseApp
 from .event import (
-    EVENT_TICK,
+    EVENT_LATEST_TICK,
     EVENT_ORDER,
     EVENT_TRADE,
     EVENT_POSITION,
@@ -358,7 +358,7 @@ class OmsEngine(BaseEngine):
 
     def register_event(self):
         """"""
-        self.event_engine.register(EVENT_TICK, self.process_tick_event)
+        self.event_engine.register(EVENT_LATEST_TICK, self.process_tick_event)
         self.event_engine.register(EVENT_ORDER, self.process_order_event)
         self.event_engine.register(EVENT_TRADE, self.process_trade_event)
         self.event_engine.register(EVENT_POSITION, self.process_position_event)
@@ -2,9 +2,10 @@
 Event type string used in VN Trader.
 """
 
-from vnpy.event import EVENT_TIMER  # noqa
+from vnpy.event import EVENT_TIMER, EVENT_STATS  # noqa
 
 EVENT_TICK = "eTick."
+EVENT_LATEST_TICK = "eLatestTick."
 EVENT_TRADE = "eTrade."
 EVENT_ORDER = "eOrder."
 EVENT_POSITION = "ePosition."
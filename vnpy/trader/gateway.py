@@ -9,6 +9,7 @@ from copy import copy
 from vnpy.event import Event, EventEngine
 from .event import (
     EVENT_TICK,
+    EVENT_LATEST_TICK,
     EVENT_ORDER,
     EVENT_TRADE,
     EVENT_POSITION,
@@ -92,7 +93,16 @@ class BaseGateway(ABC):
         """
         Tick event push.
         Tick event of a specific vt_symbol is also pushed.
+
+        Latest tick event conflated by vt_symbol is pushed first,
+        so that tick snapshot is updated before strategies see it.
+        Since merged latest tick event keeps its position in queue,
+        handlers of EVENT_LATEST_TICK (e.g. OmsEngine, TickMonitor) may
+        see a tick before EVENT_TICK of it is processed by strategies.
         """
+        event = Event(EVENT_LATEST_TICK, tick)
+        self.event_engine.put_latest(event, tick.vt_symbol)
+
         self.on_event(EVENT_TICK, tick)
         self.on_event(EVENT_TICK + tick.vt_symbol, tick)
 
@@ -13,7 +13,7 @@ from vnpy.event import Event, EventEngine
 from ..constant import Direction, Exchange, Offset, OrderType
 from ..engine import MainEngine
 from ..event import (
-    EVENT_TICK,
+    EVENT_LATEST_TICK,
     EVENT_TRADE,
     EVENT_ORDER,
     EVENT_POSITION,
@@ -341,7 +341,7 @@ class TickMonitor(BaseMonitor):
     Monitor for tick data.
     """
 
-    event_type = EVENT_TICK
+    event_type = EVENT_LATEST_TICK
     data_key = "vt_symbol"
     sorting = True
 
@@ -711,7 +711,7 @@ class TradingWidget(QtWidgets.QWidget):
     def register_event(self):
         """"""
         self.signal_tick.connect(self.process_tick_event)
-        self.event_engine.register(EVENT_TICK, self.signal_tick.emit)
+        self.event_engine.register(EVENT_LATEST_TICK, self.signal_tick.emit)
 
     def process_tick_event(self, event: Event):
         """"""
@@ -3,6 +3,8 @@ General utility functions.
 """
 
 import json
+import math
+from collections import deque
 from pathlib import Path
 from typing import Callable
 
@@ -266,24 +268,328 @@ class BarGenerator:
         self.bar = None
 
 
+class RollingSum:
+    """
+    Sum of latest n values, updated in O(1).
+
+    Sum is recalculated from window every n updates to avoid
+    accumulation of floating point error.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.n = n
+        self.window = deque(maxlen=n)
+        self.sum = 0
+        self.count = 0
+
+    def update(self, value: float):
+        """"""
+        if len(self.window) == self.n:
+            self.sum -= self.window[0]
+        self.window.append(value)
+        self.sum += value
+
+        self.count += 1
+        if not self.count % self.n:
+            self.sum = math.fsum(self.window)
+
+    @property
+    def full(self) -> bool:
+        """"""
+        return len(self.window) == self.n
+
+
+class WilderAverage:
+    """
+    Average seeded with simple average of first n values, and then
+    smoothed as (prev * (n - 1) + value) / n, same as talib ATR/RSI.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.n = n
+        self.count = 0
+        self.sum = 0
+        self.value = np.nan
+
+    def update(self, value: float):
+        """"""
+        self.count += 1
+
+        if self.count < self.n:
+            self.sum += value
+        elif self.count == self.n:
+            self.sum += value
+            self.value = self.sum / self.n
+        else:
+            self.value = (self.value * (self.n - 1) + value) / self.n
+
+
+class ExponentialAverage:
+    """
+    Exponential moving average with k = 2 / (n + 1), seeded with
+    simple average of first n values, same as talib EMA.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.n = n
+        self.k = 2 / (n + 1)
+        self.count = 0
+        self.sum = 0
+        self.value = np.nan
+
+    def update(self, value: float):
+        """"""
+        self.count += 1
+
+        if self.count < self.n:
+            self.sum += value
+        elif self.count == self.n:
+            self.sum += value
+            self.value = self.sum / self.n
+        else:
+            self.value = (value - self.value) * self.k + self.value
+
+
+class RollingExtreme:
+    """
+    Max (or min) of latest n values, using monotonic deque so that
+    each value is pushed and popped at most once.
+    """
+
+    def __init__(self, n: int, maximum: bool = True):
+        """"""
+        self.n = n
+        self.sign = 1 if maximum else -1
+        self.window = deque()     # (index, signed value)
+        self.count = 0
+
+    def update(self, value: float):
+        """"""
+        value *= self.sign
+        while self.window and self.window[-1][1] <= value:
+            self.window.pop()
+        self.window.append((self.count, value))
+
+        if self.window[0][0] <= self.count - self.n:
+            self.window.popleft()
+
+        self.count += 1
+
+    @property
+    def value(self) -> float:
+        """"""
+        if self.count < self.n:
+            return np.nan
+        return self.window[0][1] * self.sign
+
+
+class SmaIndicator:
+    """
+    Streaming simple moving average of close price.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.close_sum = RollingSum(n)
+
+    def update(self, high: float, low: float, close: float):
+        """"""
+        self.close_sum.update(close)
+
+    @property
+    def value(self) -> float:
+        """"""
+        if not self.close_sum.full:
+            return np.nan
+        return self.close_sum.sum / self.close_sum.n
+
+
+class StdIndicator:
+    """
+    Streaming population standard deviation of close price.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.close_sum = RollingSum(n)
+        self.square_sum = RollingSum(n)
+
+    def update(self, high: float, low: float, close: float):
+        """"""
+        self.close_sum.update(close)
+        self.square_sum.update(close * close)
+
+    @property
+    def value(self) -> float:
+        """"""
+        if not self.close_sum.full:
+            return np.nan
+
+        n = self.close_sum.n
+        mean = self.close_sum.sum / n
+        variance = self.square_sum.sum / n - mean * mean
+        return math.sqrt(max(variance, 0))
+
+
+class AtrIndicator:
+    """
+    Streaming average true range with Wilder smoothing.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.average = WilderAverage(n)
+        self.last_close = None
+
+    def update(self, high: float, low: float, close: float):
+        """"""
+        if self.last_close is not None:
+            tr = max(high, self.last_close) - min(low, self.last_close)
+            self.average.update(tr)
+        self.last_close = close
+
+    @property
+    def value(self) -> float:
+        """"""
+        return self.average.value
+
+
+class RsiIndicator:
+    """
+    Streaming relative strength index with Wilder smoothing.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.gain = WilderAverage(n)
+        self.loss = WilderAverage(n)
+        self.last_close = None
+
+    def update(self, high: float, low: float, close: float):
+        """"""
+        if self.last_close is not None:
+            change = close - self.last_close
+            self.gain.update(max(change, 0))
+            self.loss.update(max(-change, 0))
+        self.last_close = close
+
+    @property
+    def value(self) -> float:
+        """"""
+        gain = self.gain.value
+        total = gain + self.loss.value
+        if not total:
+            return 0
+        return 100 * gain / total
+
+
+class MacdIndicator:
+    """
+    Streaming MACD. Fast EMA starts (slow - fast) values later than
+    slow EMA, so that both are seeded at the same value as talib does.
+    """
+
+    def __init__(self, fast_period: int, slow_period: int, signal_period: int):
+        """"""
+        if slow_period < fast_period:
+            fast_period, slow_period = slow_period, fast_period
+
+        self.skip = slow_period - fast_period
+        self.fast = ExponentialAverage(fast_period)
+        self.slow = ExponentialAverage(slow_period)
+        self.signal = ExponentialAverage(signal_period)
+        self.count = 0
+
+    def update(self, high: float, low: float, close: float):
+        """"""
+        self.count += 1
+
+        self.slow.update(close)
+        if self.count > self.skip:
+            self.fast.update(close)
+
+        if self.slow.count >= self.slow.n:
+            self.signal.update(self.fast.value - self.slow.value)
+
+    @property
+    def value(self) -> tuple:
+        """"""
+        signal = self.signal.value
+        if math.isnan(signal):
+            return np.nan, np.nan, np.nan
+
+        macd = self.fast.value - self.slow.value
+        return macd, signal, macd - signal
+
+
+class DonchianIndicator:
+    """
+    Streaming highest high and lowest low.
+    """
+
+    def __init__(self, n: int):
+        """"""
+        self.high_max = RollingExtreme(n, True)
+        self.low_min = RollingExtreme(n, False)
+
+    def update(self, high: float, low: float, close: float):
+        """"""
+        self.high_max.update(high)
+        self.low_min.update(low)
+
+    @property
+    def value(self) -> tuple:
+        """"""
+        return self.high_max.value, self.low_min.value
+
+
 class ArrayManager(object):
     """
     For:
     1. time series container of bar data
     2. calculating technical indicator value
+
+    Data is kept in ring buffers of double size, and every value is
+    written twice (at index and index + size). So update_bar is O(1)
+    and the latest size values are always a contiguous view of the
+    buffer, which can be passed to talib without copying.
+
+    Indicator values (array=False) are memoized until next bar, so
+    repeated calls within one on_bar are free. If incremental is True,
+    sma/std/atr/rsi/macd/boll/keltner/donchian values are calculated by
+    streaming indicators updated in O(1) per bar, instead of talib over
+    the whole window. Streaming indicators of recursive type (atr, rsi,
+    macd) are smoothed over all bars received rather than only the
+    latest size bars, so they differ slightly from talib result when
+    window size is not large enough compared with indicator period.
+
+    Arrays like close_array are views of the buffer. To change values,
+    assign a new array (am.close_array = values), which rewrites both
+    copies in buffer. In-place write into a view only changes one copy,
+    and is lost when the ring buffer wraps around.
     """
 
-    def __init__(self, size=100):
+    def __init__(self, size=100, incremental=False):
         """Constructor"""
         self.count = 0
         self.size = size
         self.inited = False
+        self.index = 0          # Next position to write in ring buffer
+
+        self.incremental = incremental
+        self.indicators = {}    # Streaming indicators registered
+        self.cache = {}         # Indicator values of current bar
 
-        self.open_array = np.zeros(size)
-        self.high_array = np.zeros(size)
-        self.low_array = np.zeros(size)
-        self.close_array = np.zeros(size)
-        self.volume_array = np.zeros(size)
+        self.open_buffer = np.zeros(size * 2)
+        self.high_buffer = np.zeros(size * 2)
+        self.low_buffer = np.zeros(size * 2)
+        self.close_buffer = np.zeros(size * 2)
+        self.volume_buffer = np.zeros(size * 2)
+        self.open_interest_buffer = np.zeros(size * 2)
+        self.datetime_buffer = np.full(size * 2, None, dtype=object)
 
     def update_bar(self, bar):
         """
@@ -293,17 +599,140 @@ class ArrayManager(object):
         if not self.inited and self.count >= self.size:
             self.inited = True
 
-        self.open_array[:-1] = self.open_array[1:]
-        self.high_array[:-1] = self.high_array[1:]
-        self.low_array[:-1] = self.low_array[1:]
-        self.close_array[:-1] = self.close_array[1:]
-        self.volume_array[:-1] = self.volume_array[1:]
+        i = self.index
+        j = i + self.size
+
+        self.open_buffer[i] = self.open_buffer[j] = bar.open_price
+        self.high_buffer[i] = self.high_buffer[j] = bar.high_price
+        self.low_buffer[i] = self.low_buffer[j] = bar.low_price
+        self.close_buffer[i] = self.close_buffer[j] = bar.close_price
+        self.volume_buffer[i] = self.volume_buffer[j] = bar.volume
+        self.open_interest_buffer[i] = self.open_interest_buffer[j] = bar.open_interest
+        self.datetime_buffer[i] = self.datetime_buffer[j] = bar.datetime
+
+        i += 1
+        if i == self.size:
+            i = 0
+        self.index = i
+
+        self.cache.clear()
+        for indicator in self.indicators.values():
+            indicator.update(bar.high_price, bar.low_price, bar.close_price)
+
+    def get_value(self, key: tuple, indicator_class: type, func: Callable):
+        """
+        Get memoized indicator value of current bar. Value is calculated
+        by streaming indicator in incremental mode, otherwise by func.
+        """
+        value = self.cache.get(key, None)
+        if value is not None:
+            return value
+
+        if self.incremental:
+            indicator = self.indicators.get(key, None)
+
+            # Register new indicator and warm it up with current window
+            if not indicator:
+                indicator = indicator_class(*key[1:])
+                for high, low, close in zip(self.high, self.low, self.close):
+                    indicator.update(high, low, close)
+                self.indicators[key] = indicator
+
+            value = indicator.value
+        else:
+            value = func()
+
+        self.cache[key] = value
+        return value
+
+    def get_view(self, buffer: np.ndarray):
+        """
+        Get time series of latest size values from ring buffer.
+        """
+        return buffer[self.index:self.index + self.size]
+
+    def set_view(self, buffer: np.ndarray, values):
+        """
+        Set time series of latest size values, by writing both copies of
+        every value in ring buffer. Memoized and streaming indicator values
+        are dropped since data is changed.
+        """
+        values = np.roll(np.broadcast_to(values, self.size), self.index)
+        buffer[:self.size] = values
+        buffer[self.size:] = values
+
+        self.cache.clear()
+        self.indicators.clear()
+
+    @property
+    def open_array(self):
+        """"""
+        return self.get_view(self.open_buffer)
+
+    @open_array.setter
+    def open_array(self, values):
+        """"""
+        self.set_view(self.open_buffer, values)
+
+    @property
+    def high_array(self):
+        """"""
+        return self.get_view(self.high_buffer)
+
+    @high_array.setter
+    def high_array(self, values):
+        """"""
+        self.set_view(self.high_buffer, values)
+
+    @property
+    def low_array(self):
+        """"""
+        return self.get_view(self.low_buffer)
+
+    @low_array.setter
+    def low_array(self, values):
+        """"""
+        self.set_view(self.low_buffer, values)
+
+    @property
+    def close_array(self):
+        """"""
+        return self.get_view(self.close_buffer)
+
+    @close_array.setter
+    def close_array(self, values):
+        """"""
+        self.set_view(self.close_buffer, values)
+
+    @property
+    def volume_array(self):
+        """"""
+        return self.get_view(self.volume_buffer)
+
+    @volume_array.setter
+    def volume_array(self, values):
+        """"""
+        self.set_view(self.volume_buffer, values)
+
+    @property
+    def open_interest_array(self):
+        """"""
+        return self.get_view(self.open_interest_buffer)
 
-        self.open_array[-1] = bar.open_price
-        self.high_array[-1] = bar.high_price
-        self.low_array[-1] = bar.low_price
-        self.close_array[-1] = bar.close_price
-        self.volume_array[-1] = bar.volume
+    @open_interest_array.setter
+    def open_interest_array(self, values):
+        """"""
+        self.set_view(self.open_interest_buffer, values)
+
+    @property
+    def datetime_array(self):
+        """"""
+        return self.get_view(self.datetime_buffer)
+
+    @datetime_array.setter
+    def datetime_array(self, values):
+        """"""
+        self.set_view(self.datetime_buffer, values)
 
     @property
     def open(self):
@@ -340,23 +769,45 @@ class ArrayManager(object):
         """
         return self.volume_array
 
+    @property
+    def open_interest(self):
+        """
+        Get open interest time series.
+        """
+        return self.open_interest_array
+
+    @property
+    def datetime(self):
+        """
+        Get datetime time series.
+        """
+        return self.datetime_array
+
     def sma(self, n, array=False):
         """
         Simple moving average.
         """
-        result = talib.SMA(self.close, n)
         if array:
-            return result
-        return result[-1]
+            return talib.SMA(self.close, n)
+
+        return self.get_value(
+            ("sma", n),
+            SmaIndicator,
+            lambda: talib.SMA(self.close, n)[-1]
+        )
 
     def std(self, n, array=False):
         """
         Standard deviation
         """
-        result = talib.STDDEV(self.close, n)
         if array:
-            return result
-        return result[-1]
+            return talib.STDDEV(self.close, n)
+
+        return self.get_value(
+            ("std", n),
+            StdIndicator,
+            lambda: talib.STDDEV(self.close, n)[-1]
+        )
 
     def cci(self, n, array=False):
         """
@@ -371,30 +822,48 @@ class ArrayManager(object):
         """
         Average True Range (ATR).
         """
-        result = talib.ATR(self.high, self.low, self.close, n)
         if array:
-            return result
-        return result[-1]
+            return talib.ATR(self.high, self.low, self.close, n)
+
+        return self.get_value(
+            ("atr", n),
+            AtrIndicator,
+            lambda: talib.ATR(self.high, self.low, self.close, n)[-1]
+        )
 
     def rsi(self, n, array=False):
         """
         Relative Strenght Index (RSI).
         """
-        result = talib.RSI(self.close, n)
         if array:
-            return result
-        return result[-1]
+            return talib.RSI(self.close, n)
+
+        return self.get_value(
+            ("rsi", n),
+            RsiIndicator,
+            lambda: talib.RSI(self.close, n)[-1]
+        )
 
     def macd(self, fast_period, slow_period, signal_period, array=False):
         """
         MACD.
         """
-        macd, signal, hist = talib.MACD(
-            self.close, fast_period, slow_period, signal_period
-        )
         if array:
-            return macd, signal, hist
-        return macd[-1], signal[-1], hist[-1]
+            return talib.MACD(
+                self.close, fast_period, slow_period, signal_period
+            )
+
+        def calculate():
+            macd, signal, hist = talib.MACD(
+                self.close, fast_period, slow_period, signal_period
+            )
+            return macd[-1], signal[-1], hist[-1]
+
+        return self.get_value(
+            ("macd", fast_period, slow_period, signal_period),
+            MacdIndicator,
+            calculate
+        )
 
     def adx(self, n, array=False):
         """
@@ -433,12 +902,21 @@ class ArrayManager(object):
         """
         Donchian Channel.
         """
-        up = talib.MAX(self.high, n)
-        down = talib.MIN(self.low, n)
-
         if array:
+            up = talib.MAX(self.high, n)
+            down = talib.MIN(self.low, n)
             return up, down
-        return up[-1], down[-1]
+
+        def calculate():
+            up = talib.MAX(self.high, n)
+            down = talib.MIN(self.low, n)
+            return up[-1], down[-1]
+
+        return self.get_value(
+            ("donchian", n),
+            DonchianIndicator,
+            calculate
+        )
 
 
 def virtual(func: "callable"):